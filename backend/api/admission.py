@@ -0,0 +1,309 @@
+"""
+Admission control for the heavy generation endpoints.
+
+Each stage has a node-wide concurrency budget and a bounded wait queue:
+
+- up to ``limit`` requests of a stage run at once on the node
+- up to ``queue`` more wait for a slot (for ADMISSION_WAIT_SECONDS)
+- anything beyond that is rejected at once with 429 and Retry-After;
+  a request that waited too long gets 503 and Retry-After
+
+Slots and queue tickets are files locked with flock() in
+ADMISSION_LOCK_DIR, so the budget holds across all worker processes on
+the node, and a worker that dies releases its slot with its file
+descriptors. Where fcntl is unavailable (Windows dev setups) the budget
+is per process.
+
+Budgets come from ADMISSION_LIMITS, e.g.
+``"instrumental=2:8,vocals=2:8,mix=2:8"`` (stage=concurrency:queue).
+"""
+
+import asyncio
+import functools
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.http import JsonResponse
+
+from .metrics import observe_admission, track_admission
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+
+DEFAULT_LIMITS = 'transcribe=1:4,lyrics=16:64,instrumental=2:8,vocals=2:8,mix=2:8,song=1:4'
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted (queue full or wait timed out)."""
+
+    def __init__(self, stage: str, reason: str, retry_after: int, status_code: int):
+        super().__init__(f"Server busy: {stage} {reason}")
+        self.stage = stage
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+
+def parse_limits(value: str) -> dict:
+    """Parse "stage=limit:queue,..." into {stage: (limit, queue)}."""
+    limits = {}
+    for item in (value or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        stage, _, budget = item.partition('=')
+        limit, _, queue = budget.partition(':')
+        limits[stage.strip()] = (max(1, int(limit)), max(0, int(queue or 0)))
+    return limits
+
+
+class _FileSlots:
+    """N slots shared by every process on the node, one flock()ed file each."""
+
+    def __init__(self, directory: str, name: str, size: int):
+        self._paths = [os.path.join(directory, f"{name}.{index}.lock") for index in range(size)]
+
+    def try_acquire(self):
+        for path in self._paths:
+            fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except OSError:
+                os.close(fd)
+        return None
+
+    def release(self, fd):
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def in_use(self) -> int:
+        """Count held slots (probes with a shared lock)."""
+        held = 0
+        for path in self._paths:
+            fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            except OSError:
+                held += 1
+            finally:
+                os.close(fd)
+        return held
+
+
+class _ThreadSlots:
+    """Per-process fallback for _FileSlots."""
+
+    def __init__(self, size: int):
+        self._size = size
+        self._used = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            if self._used >= self._size:
+                return None
+            self._used += 1
+            return True
+
+    def release(self, token):
+        with self._lock:
+            self._used -= 1
+
+    def in_use(self) -> int:
+        return self._used
+
+
+class StageBudget:
+    """Concurrency slots plus a bounded wait queue for one stage."""
+
+    def __init__(self, stage: str, limit: int, queue: int, directory: str = None):
+        self.stage = stage
+        self.limit = limit
+        self.queue = queue
+        if FCNTL_AVAILABLE:
+            directory = directory or getattr(settings, 'ADMISSION_LOCK_DIR', None) \
+                or os.path.join(tempfile.gettempdir(), 'auralynx-admission')
+            os.makedirs(directory, exist_ok=True)
+            self._slots = _FileSlots(directory, f"{stage}.slot", limit)
+            self._tickets = _FileSlots(directory, f"{stage}.queue", queue)
+        else:
+            self._slots = _ThreadSlots(limit)
+            self._tickets = _ThreadSlots(queue)
+        self._stats_lock = threading.Lock()
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_seconds = 0.0
+
+    def _count(self, field: str, amount=1):
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def _ticket(self, retry_after: int):
+        ticket = self._tickets.try_acquire() if self.queue else None
+        if ticket is None:
+            self._count('rejected')
+            observe_admission(self.stage, 'rejected')
+            raise AdmissionRejected(self.stage, 'queue is full', retry_after, 429)
+        track_admission(self.stage, queued=1)
+        return ticket
+
+    def _release_ticket(self, ticket):
+        self._tickets.release(ticket)
+        track_admission(self.stage, queued=-1)
+
+    def _admitted(self, slot, started: float):
+        waited = time.monotonic() - started
+        self._count('admitted')
+        self._count('wait_seconds', waited)
+        observe_admission(self.stage, 'admitted', waited)
+        track_admission(self.stage, running=1)
+        return slot
+
+    def _timed_out(self, retry_after: int):
+        self._count('timed_out')
+        observe_admission(self.stage, 'timed_out')
+        return AdmissionRejected(self.stage, 'wait timed out', retry_after, 503)
+
+    def acquire(self, timeout: float, retry_after: int):
+        """Take a slot, waiting in the queue up to timeout seconds."""
+        started = time.monotonic()
+        slot = self._slots.try_acquire()
+        if slot is not None:
+            return self._admitted(slot, started)
+
+        ticket = self._ticket(retry_after)
+        try:
+            poll = getattr(settings, 'ADMISSION_POLL_SECONDS', 0.05)
+            while time.monotonic() - started < timeout:
+                time.sleep(poll)
+                slot = self._slots.try_acquire()
+                if slot is not None:
+                    return self._admitted(slot, started)
+            raise self._timed_out(retry_after)
+        finally:
+            self._release_ticket(ticket)
+
+    async def aacquire(self, timeout: float, retry_after: int):
+        """Async version of acquire; waits without blocking the event loop."""
+        started = time.monotonic()
+        slot = self._slots.try_acquire()
+        if slot is not None:
+            return self._admitted(slot, started)
+
+        ticket = self._ticket(retry_after)
+        try:
+            poll = getattr(settings, 'ADMISSION_POLL_SECONDS', 0.05)
+            while time.monotonic() - started < timeout:
+                await asyncio.sleep(poll)
+                slot = self._slots.try_acquire()
+                if slot is not None:
+                    return self._admitted(slot, started)
+            raise self._timed_out(retry_after)
+        finally:
+            self._release_ticket(ticket)
+
+    def release(self, slot):
+        self._slots.release(slot)
+        track_admission(self.stage, running=-1)
+
+    def snapshot(self) -> dict:
+        """Node-wide running/queued gauges plus this process's counters."""
+        return {
+            'limit': self.limit,
+            'queue_size': self.queue,
+            'running': self._slots.in_use(),
+            'queued': self._tickets.in_use() if self.queue else 0,
+            'admitted': self.admitted,
+            'rejected': self.rejected,
+            'timed_out': self.timed_out,
+            'wait_seconds': round(self.wait_seconds, 3),
+        }
+
+
+_budgets = {}
+_budgets_lock = threading.Lock()
+
+
+def get_budget(stage: str) -> StageBudget:
+    """Process-wide budget for a stage (None when the stage has no limit)."""
+    with _budgets_lock:
+        if stage not in _budgets:
+            limits = parse_limits(getattr(settings, 'ADMISSION_LIMITS', DEFAULT_LIMITS))
+            _budgets[stage] = StageBudget(stage, *limits[stage]) if stage in limits else None
+        return _budgets[stage]
+
+
+def admission_metrics() -> dict:
+    limits = parse_limits(getattr(settings, 'ADMISSION_LIMITS', DEFAULT_LIMITS))
+    return {stage: get_budget(stage).snapshot() for stage in limits}
+
+
+def _rejection_response(rejected: AdmissionRejected):
+    response = JsonResponse({
+        'error': str(rejected),
+        'stage': rejected.stage,
+        'retry_after': rejected.retry_after,
+    }, status=rejected.status_code)
+    response['Retry-After'] = str(rejected.retry_after)
+    return response
+
+
+def admit(stage: str):
+    """
+    Decorator limiting how many requests of ``stage`` run at once.
+
+    Works on sync (DRF) and async views. Rejected requests get 429 (queue
+    full) or 503 (waited longer than ADMISSION_WAIT_SECONDS), both with
+    Retry-After.
+    """
+    def decorator(view):
+        def settings_for_stage():
+            enabled = getattr(settings, 'ADMISSION_ENABLED', True)
+            budget = get_budget(stage) if enabled else None
+            timeout = getattr(settings, 'ADMISSION_WAIT_SECONDS', 30)
+            retry_after = getattr(settings, 'ADMISSION_RETRY_AFTER_SECONDS', 10)
+            return budget, timeout, retry_after
+
+        if asyncio.iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                budget, timeout, retry_after = settings_for_stage()
+                if budget is None:
+                    return await view(request, *args, **kwargs)
+                try:
+                    slot = await budget.aacquire(timeout, retry_after)
+                except AdmissionRejected as rejected:
+                    return _rejection_response(rejected)
+                try:
+                    return await view(request, *args, **kwargs)
+                finally:
+                    budget.release(slot)
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            budget, timeout, retry_after = settings_for_stage()
+            if budget is None:
+                return view(request, *args, **kwargs)
+            try:
+                slot = budget.acquire(timeout, retry_after)
+            except AdmissionRejected as rejected:
+                return _rejection_response(rejected)
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                budget.release(slot)
+        return wrapper
+
+    return decorator
@@ -0,0 +1,235 @@
+"""
+Async versions of the provider-bound generation endpoints.
+
+Served under ASGI (config/asgi.py) when settings.ASYNC_VIEWS is on. A
+worker awaits OpenAI/Groq/Together, Mubert and ElevenLabs without
+blocking, so it can keep hundreds of provider waits in flight; CPU work
+(synthetic fallbacks, decoding, mixing) runs on the shared CPU pool from
+api.utils. Request fields and response bodies match api.views.
+"""
+
+import functools
+import json
+import os
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, QueryDict
+
+from .admission import admit
+from .audio_store import store_audio_file
+from .coalesce import asingle_flight, mix_inputs
+from .mastering import amaster_audio_tracks
+from .progress import get_progress_reporter
+from .scheduling import stage_priority
+from .temp_audio import public_audio_url
+from .utils import (
+    agenerate_song_lyrics,
+    agenerate_music_track,
+    agenerate_singing_vocals,
+    MIX_MODES,
+    mix_audio_tracks,
+    run_cpu_bound,
+    temp_audio_path,
+)
+from .variants import schedule_variants
+from .waveform import waveform_payload
+
+
+def async_post_view(view):
+    """
+    csrf_exempt + require_POST for async views (the Django 4.2 decorators
+    wrap views in sync functions, which would hide the coroutine).
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            return JsonResponse({'error': 'Method not allowed'}, status=405)
+        return await view(request, *args, **kwargs)
+
+    # Same exemption api_view gives the sync views (JWT auth, no cookies)
+    wrapper.csrf_exempt = True
+    return wrapper
+
+
+def _request_data(request) -> dict:
+    """Parse a JSON or form body, like DRF's request.data."""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+    if isinstance(request.POST, QueryDict):
+        return request.POST.dict()
+    return {}
+
+
+async def _audio_url(request, path: str) -> str:
+    # public_audio_url and temp_audio_path use the ORM, which is sync-only
+    return request.build_absolute_uri(await sync_to_async(public_audio_url)(path))
+
+
+async def _waveform(request, audio_url: str) -> dict:
+    return await sync_to_async(waveform_payload)(audio_url, request.build_absolute_uri)
+
+
+async def _stored(result) -> tuple:
+    """Await a (path, duration) stage and store the file under its content hash."""
+    path, duration = await result
+    return await run_cpu_bound(store_audio_file, path), duration
+
+
+@async_post_view
+@admit('lyrics')
+async def generate_lyrics(request):
+    """Async version of api.views.generate_lyrics."""
+    try:
+        data = _request_data(request)
+        input_text = data.get('input_text', '')
+        genre = data.get('genre', 'pop')
+
+        if not input_text:
+            return JsonResponse({'error': 'input_text is required'}, status=400)
+
+        lyrics = await asingle_flight(
+            'lyrics', {'input_text': input_text, 'genre': genre},
+            lambda: agenerate_song_lyrics(input_text, genre),
+        )
+
+        return JsonResponse({
+            'success': True,
+            'lyrics': lyrics,
+            'genre': genre,
+        }, status=200)
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@async_post_view
+@admit('instrumental')
+async def generate_instrumental(request):
+    """Async version of api.views.generate_instrumental."""
+    data = _request_data(request)
+    progress = get_progress_reporter(data.get('progress_id', ''))
+    try:
+        lyrics = data.get('lyrics', '')
+        genre = data.get('genre', 'pop')
+
+        if not lyrics:
+            return JsonResponse({'error': 'lyrics is required'}, status=400)
+
+        audio_path, duration = await asingle_flight(
+            'instrumental', {'lyrics': lyrics, 'genre': genre},
+            lambda: _stored(agenerate_music_track(lyrics, genre, progress=progress)),
+        )
+        audio_url = await _audio_url(request, audio_path)
+
+        progress.done(url=audio_url, duration=duration)
+        return JsonResponse({
+            'success': True,
+            'url': audio_url,
+            'duration': duration,
+            'format': 'wav',
+            'waveform': await _waveform(request, audio_url),
+        }, status=200)
+
+    except Exception as e:
+        progress.error(str(e))
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@async_post_view
+@admit('vocals')
+async def generate_vocals(request):
+    """Async version of api.views.generate_vocals."""
+    data = _request_data(request)
+    progress = get_progress_reporter(data.get('progress_id', ''))
+    try:
+        lyrics = data.get('lyrics', '')
+        genre = data.get('genre', 'pop')
+
+        if not lyrics:
+            return JsonResponse({'error': 'lyrics is required'}, status=400)
+
+        audio_path, duration = await asingle_flight(
+            'vocals', {'lyrics': lyrics, 'genre': genre},
+            lambda: _stored(agenerate_singing_vocals(lyrics, genre, progress=progress)),
+        )
+        audio_url = await _audio_url(request, audio_path)
+
+        progress.done(url=audio_url, duration=duration)
+        return JsonResponse({
+            'success': True,
+            'url': audio_url,
+            'duration': duration,
+            'format': 'wav',
+            'waveform': await _waveform(request, audio_url),
+        }, status=200)
+
+    except Exception as e:
+        progress.error(str(e))
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@async_post_view
+@admit('mix')
+async def mix_audio(request):
+    """
+    Async version of api.views.mix_audio.
+
+    Master mode awaits the FFmpeg subprocess directly; the other modes mix
+    in Python and run on the CPU pool.
+    """
+    data = _request_data(request)
+    progress = get_progress_reporter(data.get('progress_id', ''))
+    try:
+        instrumental_url = data.get('instrumental_url')
+        vocals_url = data.get('vocals_url')
+        genre = data.get('genre', 'pop')
+        mode = str(data.get('mode') or getattr(settings, 'AUDIO_MIX_MODE', 'auto')).lower()
+        output_format = data.get('format', 'wav')
+
+        if not instrumental_url or not vocals_url:
+            return JsonResponse({'error': 'instrumental_url and vocals_url are required'}, status=400)
+        if mode not in MIX_MODES:
+            return JsonResponse({'error': f"mode must be one of: {', '.join(MIX_MODES)}"}, status=400)
+
+        instrumental_path = await sync_to_async(temp_audio_path)(instrumental_url)
+        vocals_path = await sync_to_async(temp_audio_path)(vocals_url)
+
+        async def mix():
+            if mode == 'master':
+                progress.stage_started('mix', mode='master')
+                result = await amaster_audio_tracks(
+                    [instrumental_path, vocals_path],
+                    output_format=output_format,
+                    gains_db=[-3.0, -1.5],  # Same gains as mix_audio_tracks
+                )
+                progress.stage_finished('mix', mode='master', duration=result[1])
+                return result
+            return await run_cpu_bound(
+                mix_audio_tracks, instrumental_path, vocals_path, genre, mode=mode,
+                output_format=output_format, progress=progress, priority=stage_priority('mix'),
+            )
+
+        output_path, duration = await asingle_flight(
+            'mix', mix_inputs(instrumental_path, vocals_path, genre, mode, output_format),
+            lambda: _stored(mix()),
+        )
+        audio_url = await _audio_url(request, output_path)
+        schedule_variants(audio_url)
+
+        progress.done(url=audio_url, duration=duration)
+        return JsonResponse({
+            'success': True,
+            'url': audio_url,
+            'duration': duration,
+            'format': os.path.splitext(output_path)[1].lstrip('.') or 'wav',
+            'waveform': await _waveform(request, audio_url),
+        }, status=200)
+
+    except Exception as e:
+        progress.error(str(e))
+        return JsonResponse({'error': str(e)}, status=500)
@@ -0,0 +1,222 @@
+"""
+Serving generated audio from TEMP_AUDIO_DIR.
+
+Django only decides whether a request may have a file; the bytes are moved
+by the web server:
+
+- behind nginx (AUDIO_ACCEL_REDIRECT_PREFIX set) the response is an empty
+  X-Accel-Redirect to an internal location, and nginx streams the file
+  with sendfile and handles Range itself
+- standalone, the response wraps the open file, so gunicorn sends it with
+  sendfile(); Range requests get 206 with only the requested bytes
+
+``?format=``/``?bitrate=`` or the Accept header select a compressed
+variant (api.variants) instead of the WAV master; until the variant is
+built, the master is sent with ``Cache-Control: no-cache``.
+
+With AUDIO_SIGNED_URLS on, URLs carry a signature of the file name
+(stable per file, so immutable caching still works) and requests without
+a valid one get 403.
+"""
+
+import logging
+import os
+import re
+
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.crypto import constant_time_compare
+
+from .audio_store import REVALIDATE_CACHE_CONTROL, audio_etag, cache_control
+from .variants import cached_variant, negotiate_variant, parse_variant_request, schedule_variant
+
+logger = logging.getLogger(__name__)
+
+
+SIGNATURE_SALT = 'auralynx.audio'
+BLOCK_SIZE = 64 * 1024
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+AUDIO_CONTENT_TYPES = {
+    '.wav': 'audio/wav',
+    '.mp3': 'audio/mpeg',
+    '.opus': 'audio/ogg',
+    '.ogg': 'audio/ogg',
+    '.m4a': 'audio/mp4',
+    '.aac': 'audio/aac',
+    '.flac': 'audio/flac',
+    '.webm': 'audio/webm',
+    # Waveform sidecars (api.waveform)
+    '.json': 'application/json',
+}
+
+
+def audio_signature(name: str) -> str:
+    return signing.Signer(salt=SIGNATURE_SALT).signature(name)
+
+
+def signed_query(name: str) -> str:
+    """Query string authorizing a file ('' when signed URLs are off)."""
+    if not getattr(settings, 'AUDIO_SIGNED_URLS', False):
+        return ''
+    return f'?sig={audio_signature(name)}'
+
+
+def is_authorized(request, name: str) -> bool:
+    if not getattr(settings, 'AUDIO_SIGNED_URLS', False):
+        return True
+    return constant_time_compare(request.GET.get('sig', ''), audio_signature(name))
+
+
+def content_type(name: str) -> str:
+    return AUDIO_CONTENT_TYPES.get(os.path.splitext(name)[1].lower(), 'application/octet-stream')
+
+
+def parse_range(header: str, size: int):
+    """
+    Parse a single-range Range header.
+
+    Returns:
+        (start, end) inclusive, None to send the whole file (no header,
+        multiple ranges, other units), or False when unsatisfiable
+    """
+    match = _RANGE.match((header or '').strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            return False
+        return max(0, size - length), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        # Invalid spec: ignore the header
+        return None
+    if start >= size:
+        return False
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+class RangeFile:
+    """
+    Read-only view of ``length`` bytes of an open file from its current
+    position. Keeps fileno() so WSGI servers can still use sendfile().
+    """
+
+    def __init__(self, f, length: int):
+        self._file = f
+        self._remaining = length
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def read(self, size: int = -1) -> bytes:
+        if self._remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+def _range_applies(request, etag: str) -> bool:
+    """If-Range: only honour Range when the validator still matches."""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    return not if_range or if_range.strip() == etag
+
+
+def select_variant(request, name: str) -> tuple:
+    """
+    Name (relative to TEMP_AUDIO_DIR) of the rendition to send for a master.
+
+    A variant that is not built yet is scheduled and the master is sent in
+    its place, so the request never waits on FFmpeg.
+
+    Returns:
+        (name, negotiated, final): negotiated means the Accept header chose;
+        final is False when the master stands in for a pending variant
+
+    Raises:
+        ValueError: unknown ?format= or ?bitrate=
+    """
+    if name.endswith('.json'):
+        return name, False, True
+    negotiated = 'format' not in request.GET
+    if negotiated:
+        variant = negotiate_variant(request.META.get('HTTP_ACCEPT', ''))
+    else:
+        variant = parse_variant_request(request.GET.get('format', ''), request.GET.get('bitrate', ''))
+    if variant is None:
+        return name, negotiated, True
+    served = cached_variant(name, *variant)
+    if served is not None:
+        return served, negotiated, True
+    schedule_variant(name, *variant)
+    return name, negotiated, False
+
+
+def audio_response(request, name: str, path: str, negotiated: bool = False, final: bool = True):
+    """
+    Response for a file the caller has already found and authorized.
+
+    name may be a variant (variants/...); negotiated adds Vary: Accept.
+    final=False (the master standing in for a variant) makes clients
+    revalidate, so they pick up the variant once it is built.
+    """
+    etag = audio_etag(name, path)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        prefix = getattr(settings, 'AUDIO_ACCEL_REDIRECT_PREFIX', '')
+        if prefix:
+            response = _accel_response(prefix, name)
+        else:
+            response = _file_response(request, path, etag)
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control(name) if final else REVALIDATE_CACHE_CONTROL
+    if response.status_code in (200, 206):
+        response['Content-Type'] = content_type(name)
+    if negotiated:
+        patch_vary_headers(response, ['Accept'])
+    return response
+
+
+def _accel_response(prefix: str, name: str):
+    # nginx serves the file from its internal location, Range included
+    response = HttpResponse()
+    response['X-Accel-Redirect'] = f"{prefix.rstrip('/')}/{name}"
+    return response
+
+
+def _file_response(request, path: str, etag: str):
+    size = os.path.getsize(path)
+    byte_range = parse_range(request.META.get('HTTP_RANGE', ''), size) \
+        if _range_applies(request, etag) else None
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    f = open(path, 'rb')
+    if byte_range is None:
+        response = FileResponse(f, content_type=content_type(path))
+    else:
+        start, end = byte_range
+        f.seek(start)
+        response = FileResponse(RangeFile(f, end - start + 1), content_type=content_type(path), status=206)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    response.block_size = BLOCK_SIZE
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,122 @@
+"""
+Content-addressed storage for generated audio.
+
+Files handed to clients are renamed to ``<sha256>.<ext>`` inside
+TEMP_AUDIO_DIR. Identical renders (the same fallback instrumental for a
+genre, say) collapse into one file, and since a name can never point at
+different bytes, the file is served with a strong ETag and
+``Cache-Control: immutable`` so browsers and CDNs keep it for good.
+"""
+
+import hashlib
+import os
+import re
+
+from django.conf import settings
+
+
+HASH_CHUNK_BYTES = 1024 * 1024
+_CONTENT_NAME = re.compile(r'^[0-9a-f]{64}\.[a-z0-9]{1,8}$')
+# Masters plus their transcoded variants (api.variants) and sidecars
+_IMMUTABLE_NAME = re.compile(r'^[0-9a-f]{64}(?:-\d+k|\.peaks)?\.[a-z0-9]{1,8}$')
+
+# Files derived from a master, stored as <master stem><suffix> and moved
+# along with it (waveform peaks, api.waveform)
+WAVEFORM_SUFFIX = '.peaks.json'
+SIDECAR_SUFFIXES = (WAVEFORM_SUFFIX,)
+
+
+def is_content_addressed(name: str) -> bool:
+    return bool(_CONTENT_NAME.match(name))
+
+
+def is_immutable(name: str) -> bool:
+    """True for content-addressed masters and variants (name may include a directory)."""
+    return bool(_IMMUTABLE_NAME.match(os.path.basename(name)))
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sidecar_path(path: str, suffix: str) -> str:
+    return os.path.splitext(str(path))[0] + suffix
+
+
+def _store_sidecars(path: str, target: str):
+    for suffix in SIDECAR_SUFFIXES:
+        source, destination = sidecar_path(path, suffix), sidecar_path(target, suffix)
+        if not os.path.exists(source):
+            continue
+        if os.path.exists(destination):
+            os.remove(source)
+        else:
+            os.replace(source, destination)
+
+
+def remove_sidecars(name: str):
+    """Delete a master's sidecars (called when the master is swept)."""
+    for suffix in SIDECAR_SUFFIXES:
+        try:
+            os.remove(sidecar_path(os.path.join(settings.TEMP_AUDIO_DIR, name), suffix))
+        except OSError:
+            pass
+
+
+def store_audio_file(path: str) -> str:
+    """
+    Move a file in TEMP_AUDIO_DIR to its content-addressed name.
+
+    If a file with the same content is already stored, the new copy is
+    deleted instead. Sidecars (SIDECAR_SUFFIXES) move with the file.
+    Already content-addressed files are returned as is.
+
+    Returns:
+        Path of the stored file
+    """
+    path = str(path)
+    name = os.path.basename(path)
+    if is_content_addressed(name):
+        return path
+    if not os.path.exists(path):
+        raise RuntimeError(f"Audio file not found: {name}")
+
+    extension = (os.path.splitext(name)[1].lstrip('.') or 'bin').lower()
+    target = os.path.join(settings.TEMP_AUDIO_DIR, f"{file_digest(path)}.{extension}")
+    if os.path.exists(target):
+        os.remove(path)
+    else:
+        # Same directory, so the rename is atomic
+        os.replace(path, target)
+    _store_sidecars(path, target)
+    return target
+
+
+def content_addressed(result: tuple) -> tuple:
+    """Store the path of a (path, duration) stage result under its content hash."""
+    path, duration = result
+    return store_audio_file(path), duration
+
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+
+def audio_etag(name: str, path: str) -> str:
+    """
+    Strong ETag for a stored file: the content hash (plus the variant
+    bitrate), or size and mtime for files named before content addressing.
+    """
+    if is_immutable(name):
+        return f'"{os.path.splitext(os.path.basename(name))[0]}"'
+    stat = os.stat(path)
+    return f'"{stat.st_size:x}-{int(stat.st_mtime_ns):x}"'
+
+
+def cache_control(name: str) -> str:
+    return IMMUTABLE_CACHE_CONTROL if is_immutable(name) else REVALIDATE_CACHE_CONTROL
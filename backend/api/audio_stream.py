@@ -0,0 +1,435 @@
+"""
+Block-based audio streaming for constant-memory mixing.
+
+This module provides:
+- Block readers for PCM WAV files (wave module), any other container
+  (decoded through an FFmpeg pipe) and in-memory AudioBuffers
+- On-the-fly channel up/down-mixing and linear resampling between blocks
+- A streaming mixer that renders N tracks in aligned blocks, with an
+  optional analyse-then-render pass for per-track peak normalization
+
+Only one block per track is held in memory at a time, so memory use does
+not grow with song duration or with the number of stems. Server-side
+pipelines can hand rendered stems to the mixer as AudioBuffers, so no
+intermediate WAV is written or decoded again.
+"""
+
+import io
+import os
+import subprocess
+import wave
+
+import numpy as np
+from django.conf import settings
+
+
+DEFAULT_BLOCK_FRAMES = 65536
+
+# pydub's AudioSegment.normalize() leaves 0.1 dB of headroom; match it so
+# the streaming path produces the same levels as the in-memory path.
+NORMALIZE_HEADROOM_DB = 0.1
+
+_PCM_DTYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+
+
+def _pcm_to_float(raw: bytes, sample_width: int, channels: int) -> np.ndarray:
+    """Convert interleaved little-endian PCM bytes to float32 frames."""
+    if sample_width == 3:
+        # 24-bit PCM has no numpy dtype; widen each sample to int32
+        packed = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
+        widened = np.zeros((packed.shape[0], 4), dtype=np.uint8)
+        widened[:, 1:] = packed
+        samples = widened.view('<i4').reshape(-1).astype(np.float32) / 2147483648.0
+    elif sample_width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    else:
+        dtype = np.dtype(_PCM_DTYPES[sample_width]).newbyteorder('<')
+        scale = float(2 ** (8 * sample_width - 1))
+        samples = np.frombuffer(raw, dtype=dtype).astype(np.float32) / scale
+    return samples.reshape(-1, channels)
+
+
+def float_to_int16(block: np.ndarray) -> np.ndarray:
+    """Clip float frames to [-1, 1] and convert them to int16 PCM."""
+    return (np.clip(block, -1.0, 1.0) * 32767).astype('<i2')
+
+
+class AudioBuffer:
+    """
+    Decoded audio held in memory: float32 frames shaped (frames, channels).
+
+    Used to pass rendered stems straight from a generation stage to the
+    mixer without a round-trip through TEMP_AUDIO_DIR.
+    """
+
+    def __init__(self, samples: np.ndarray, sample_rate: int):
+        samples = np.asarray(samples, dtype=np.float32)
+        self.samples = samples.reshape(-1, 1) if samples.ndim == 1 else samples
+        self.sample_rate = int(sample_rate)
+
+    @classmethod
+    def from_int16(cls, samples: np.ndarray, sample_rate: int) -> 'AudioBuffer':
+        return cls(np.asarray(samples, dtype=np.float32) / 32768.0, sample_rate)
+
+    @property
+    def channels(self) -> int:
+        return self.samples.shape[1]
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / float(self.sample_rate)
+
+    def write_wav(self, path: str) -> str:
+        """Write the buffer as a 16-bit PCM WAV file."""
+        with wave.open(path, 'wb') as wav_file:
+            wav_file.setnchannels(self.channels)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(self.sample_rate)
+            wav_file.writeframes(float_to_int16(self.samples).tobytes())
+        return path
+
+
+def decode_audio_bytes(data: bytes, sample_rate: int = 44100, channels: int = 1) -> AudioBuffer:
+    """
+    Decode an encoded audio payload (e.g. a provider response) in memory.
+
+    PCM WAV is parsed directly; other containers (MP3 from ElevenLabs, ...)
+    are piped through FFmpeg without touching the disk.
+    """
+    try:
+        with wave.open(io.BytesIO(data), 'rb') as wav_file:
+            raw = wav_file.readframes(wav_file.getnframes())
+            samples = _pcm_to_float(raw, wav_file.getsampwidth(), wav_file.getnchannels())
+            return AudioBuffer(samples, wav_file.getframerate())
+    except (wave.Error, EOFError, KeyError):
+        pass
+
+    cmd = [
+        getattr(settings, 'FFMPEG_PATH', 'ffmpeg'), '-v', 'error',
+        '-i', 'pipe:0',
+        '-f', 's16le', '-acodec', 'pcm_s16le',
+        '-ar', str(sample_rate), '-ac', str(channels),
+        'pipe:1',
+    ]
+    try:
+        result = subprocess.run(cmd, input=data, capture_output=True,
+                                timeout=getattr(settings, 'FFMPEG_TIMEOUT_SECONDS', 240))
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise RuntimeError(f"Cannot decode audio in memory: {e}")
+    if result.returncode != 0 or not result.stdout:
+        raise RuntimeError("Cannot decode audio in memory: FFmpeg rejected the payload.")
+    usable = len(result.stdout) - len(result.stdout) % (channels * 2)
+    return AudioBuffer(_pcm_to_float(result.stdout[:usable], 2, channels), sample_rate)
+
+
+class ArrayBlockReader:
+    """Read an AudioBuffer block by block (views into the array, no copies)."""
+
+    def __init__(self, buffer: AudioBuffer):
+        self._samples = buffer.samples
+        self._position = 0
+        self.sample_rate = buffer.sample_rate
+        self.channels = buffer.channels
+        self.sample_width = 2
+        self.frames = len(buffer.samples)
+
+    def read(self, frames: int) -> np.ndarray:
+        block = self._samples[self._position:self._position + frames]
+        self._position += len(block)
+        return block
+
+    def close(self):
+        self._samples = None
+
+
+class WavBlockReader:
+    """
+    Read a PCM WAV file block by block as float32 frames in [-1, 1].
+
+    Args:
+        path: Path to a PCM WAV file (8, 16, 24 or 32-bit integer)
+    """
+
+    def __init__(self, path: str):
+        self._wav = wave.open(path, 'rb')
+        self.sample_rate = self._wav.getframerate()
+        self.channels = self._wav.getnchannels()
+        self.sample_width = self._wav.getsampwidth()
+        self.frames = self._wav.getnframes()
+
+    def read(self, frames: int) -> np.ndarray:
+        raw = self._wav.readframes(frames)
+        return _pcm_to_float(raw, self.sample_width, self.channels)
+
+    def close(self):
+        self._wav.close()
+
+
+class FFmpegBlockReader:
+    """
+    Decode any FFmpeg-readable file (MP3, M4A, float WAV, ...) through a pipe.
+
+    FFmpeg converts to the requested sample rate and channel count itself,
+    so blocks come out already in the mix format.
+    """
+
+    def __init__(self, path: str, sample_rate: int, channels: int):
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.sample_width = 2
+        self.frames = None
+        cmd = [
+            getattr(settings, 'FFMPEG_PATH', 'ffmpeg'), '-v', 'error', '-nostdin',
+            '-i', path,
+            '-f', 's16le', '-acodec', 'pcm_s16le',
+            '-ar', str(sample_rate), '-ac', str(channels),
+            'pipe:1',
+        ]
+        try:
+            self._process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        except OSError as e:
+            raise RuntimeError(f"Cannot decode {os.path.basename(path)}: FFmpeg unavailable ({e})")
+
+    def read(self, frames: int) -> np.ndarray:
+        raw = self._process.stdout.read(frames * self.channels * 2)
+        # Drop a trailing partial frame if the pipe closed mid-frame
+        usable = len(raw) - len(raw) % (self.channels * 2)
+        return _pcm_to_float(raw[:usable], 2, self.channels)
+
+    def close(self):
+        self._process.stdout.close()
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
+
+
+def _map_channels(block: np.ndarray, channels: int) -> np.ndarray:
+    """Up-mix or down-mix a block of frames to the given channel count."""
+    source_channels = block.shape[1]
+    if source_channels == channels:
+        return block
+    if source_channels == 1:
+        return np.repeat(block, channels, axis=1)
+    mono = block.mean(axis=1, keepdims=True)
+    return mono if channels == 1 else np.repeat(mono, channels, axis=1)
+
+
+class StreamingResampler:
+    """
+    Linear-interpolation resampler that carries its phase across blocks.
+
+    The last input frame of each block is kept so interpolation is
+    continuous over block boundaries and output does not click.
+    """
+
+    def __init__(self, source_rate: int, target_rate: int):
+        self.step = source_rate / float(target_rate)
+        self._previous = None
+        self._position = 0.0
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        if self.step == 1.0:
+            return block
+        data = block if self._previous is None else np.concatenate([self._previous, block])
+        last = len(data) - 1
+        if last < 1 or self._position > last:
+            self._previous = data[-1:] if len(data) else self._previous
+            self._position -= max(last, 0)
+            return np.zeros((0, block.shape[1]), dtype=np.float32)
+
+        count = int(np.floor((last - self._position) / self.step)) + 1
+        positions = self._position + self.step * np.arange(count)
+        index = positions.astype(np.int64)
+        fraction = (positions - index)[:, None].astype(np.float32)
+        upper = np.minimum(index + 1, last)
+        out = data[index] * (1.0 - fraction) + data[upper] * fraction
+
+        # Re-base the phase on the frame we keep for the next block
+        self._previous = data[-1:]
+        self._position = self._position + self.step * count - last
+        return out.astype(np.float32)
+
+
+class ConformedReader:
+    """
+    Wrap a block reader so it yields exactly N frames per read in a target
+    sample rate and channel layout, converting on the fly.
+    """
+
+    def __init__(self, reader, sample_rate: int, channels: int, block_frames: int = DEFAULT_BLOCK_FRAMES):
+        self._reader = reader
+        self._channels = channels
+        self._block_frames = block_frames
+        self._resampler = StreamingResampler(reader.sample_rate, sample_rate)
+        self._pending = np.zeros((0, channels), dtype=np.float32)
+        self.exhausted = False
+        # Output length, when the source knows its own length
+        self.frames = None if reader.frames is None else int(reader.frames * sample_rate / reader.sample_rate)
+
+    def read(self, frames: int) -> np.ndarray:
+        """Return up to ``frames`` frames; fewer only once the source is done."""
+        while len(self._pending) < frames and not self.exhausted:
+            block = self._reader.read(self._block_frames)
+            if len(block) == 0:
+                self.exhausted = True
+                break
+            block = self._resampler.process(_map_channels(block, self._channels))
+            self._pending = np.concatenate([self._pending, block])
+        out, self._pending = self._pending[:frames], self._pending[frames:]
+        return out
+
+    def close(self):
+        self._reader.close()
+
+
+def open_block_reader(path, sample_rate: int = 44100, channels: int = 1):
+    """
+    Open a block reader for an audio file or an in-memory AudioBuffer.
+
+    PCM WAV files are read directly; anything else (MP3 vocals from
+    ElevenLabs, float WAVs, ...) is decoded through FFmpeg at the given
+    sample rate and channel count.
+    """
+    if isinstance(path, AudioBuffer):
+        return ArrayBlockReader(path)
+    if not os.path.exists(path):
+        raise RuntimeError(f"Audio file not found: {os.path.basename(path)}")
+    try:
+        return WavBlockReader(path)
+    except (wave.Error, EOFError, KeyError):
+        return FFmpegBlockReader(path, sample_rate, channels)
+
+
+def _probe_format(paths: list) -> tuple:
+    """Pick the mix format: highest WAV/buffer sample rate and channel count."""
+    sample_rate, channels = 0, 0
+    for path in paths:
+        if isinstance(path, AudioBuffer):
+            sample_rate = max(sample_rate, path.sample_rate)
+            channels = max(channels, path.channels)
+            continue
+        try:
+            with wave.open(path, 'rb') as wav_file:
+                sample_rate = max(sample_rate, wav_file.getframerate())
+                channels = max(channels, wav_file.getnchannels())
+        except (wave.Error, EOFError, OSError):
+            continue
+    return sample_rate or 44100, channels or 2
+
+
+def _open_sources(sources: list, sample_rate: int, channels: int, block_frames: int) -> list:
+    readers = []
+    try:
+        for source in sources:
+            reader = open_block_reader(source, sample_rate, channels)
+            readers.append(ConformedReader(reader, sample_rate, channels, block_frames))
+    except Exception:
+        for reader in readers:
+            reader.close()
+        raise
+    return readers
+
+
+def analyse_peaks(sources: list, sample_rate: int, channels: int,
+                  block_frames: int = DEFAULT_BLOCK_FRAMES) -> list:
+    """
+    First pass: measure the absolute peak of every source, block by block.
+
+    Returns:
+        List of peak amplitudes in [0, 1], one per source
+    """
+    peaks = []
+    for reader in _open_sources(sources, sample_rate, channels, block_frames):
+        peak = 0.0
+        try:
+            while True:
+                block = reader.read(block_frames)
+                if len(block) == 0:
+                    break
+                peak = max(peak, float(np.max(np.abs(block))))
+        finally:
+            reader.close()
+        peaks.append(peak)
+    return peaks
+
+
+def stream_mix(sources: list, output_path: str, gains_db: list = None,
+               sample_rate: int = None, channels: int = None,
+               block_frames: int = None, normalize: bool = False, on_progress=None,
+               peaks=None) -> tuple:
+    """
+    Mix N audio files into a 16-bit WAV using constant memory.
+
+    Args:
+        sources: Paths of the input tracks (any format FFmpeg can decode)
+            or AudioBuffers handed over from an in-process stage
+        output_path: Path of the WAV file to write
+        gains_db: Per-track gain in dB (defaults to 0 dB for every track)
+        sample_rate: Output sample rate (defaults to the highest input rate)
+        channels: Output channel count (defaults to the widest input)
+        block_frames: Frames rendered per block
+        normalize: Run an analysis pass first and peak-normalize every track
+            before applying ``gains_db`` (same levels as pydub's normalize())
+        on_progress: Optional callable receiving the rendered fraction
+            (0-1) after each block, when input lengths are known
+        peaks: Optional api.waveform.PeakAccumulator fed every rendered
+            block (its sample rate is set to the output rate)
+
+    Returns:
+        Tuple of (output_path, duration_in_seconds)
+    """
+    if not sources:
+        raise RuntimeError("At least one track is required for mixing.")
+
+    gains_db = list(gains_db) if gains_db is not None else [0.0] * len(sources)
+    if len(gains_db) != len(sources):
+        raise RuntimeError("gains_db must provide one gain per track.")
+
+    block_frames = block_frames or getattr(settings, 'AUDIO_STREAM_BLOCK_FRAMES', DEFAULT_BLOCK_FRAMES)
+    probed_rate, probed_channels = _probe_format(sources)
+    sample_rate = sample_rate or probed_rate
+    channels = channels or probed_channels
+
+    if normalize:
+        track_peaks = analyse_peaks(sources, sample_rate, channels, block_frames)
+        gains_db = [
+            gain - NORMALIZE_HEADROOM_DB - 20 * np.log10(peak) if peak > 0 else gain
+            for gain, peak in zip(gains_db, track_peaks)
+        ]
+
+    gains = np.array([10 ** (gain / 20.0) for gain in gains_db], dtype=np.float32)
+    readers = _open_sources(sources, sample_rate, channels, block_frames)
+    frames_written = 0
+    if peaks is not None:
+        peaks.sample_rate = sample_rate
+    lengths = [reader.frames for reader in readers]
+    total_frames = max(lengths) if lengths and None not in lengths else None
+
+    try:
+        with wave.open(output_path, 'wb') as wav_file:
+            wav_file.setnchannels(channels)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(sample_rate)
+
+            mix = np.zeros((block_frames, channels), dtype=np.float32)
+            while True:
+                mix[:] = 0.0
+                longest = 0
+                for gain, reader in zip(gains, readers):
+                    block = reader.read(block_frames)
+                    if len(block):
+                        mix[:len(block)] += block * gain
+                        longest = max(longest, len(block))
+                if longest == 0:
+                    break
+                wav_file.writeframes(float_to_int16(mix[:longest]).tobytes())
+                if peaks is not None:
+                    peaks.add(mix[:longest])
+                frames_written += longest
+                if on_progress and total_frames:
+                    on_progress(min(1.0, frames_written / float(total_frames)))
+    finally:
+        for reader in readers:
+            reader.close()
+
+    return output_path, frames_written / float(sample_rate)
@@ -0,0 +1,359 @@
+"""
+Offline benchmarks for the audio and API hot paths.
+
+Run with ``python manage.py benchmark`` (see the command for options).
+Every case runs without network access: provider keys are cleared so the
+generators take their synthetic/template fallbacks, audio is written to a
+scratch TEMP_AUDIO_DIR, and song rows live in a throwaway test database.
+
+Each case reports:
+
+- ``wall_median`` / ``wall_min``: seconds over ``repeat`` timed runs
+- ``peak_rss_mb``: highest resident set size above the starting RSS,
+  sampled every few milliseconds during the timed runs (psutil)
+- ``alloc_peak_mb`` / ``alloc_blocks``: peak Python allocations during
+  the run and the blocks still allocated when it returns, from one extra
+  run under tracemalloc (not timed; tracing slows the code down)
+
+Results are compared against a saved baseline; a case is a regression when
+its median wall time or allocation peak grows by more than the threshold.
+Baselines are machine-specific: record one on the machine that compares.
+"""
+
+import contextlib
+import logging
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+import wave
+from dataclasses import dataclass, field
+from unittest import mock
+
+from django.conf import settings
+from django.test.utils import override_settings
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+
+RENDER_DURATIONS = (10, 30, 120)
+MIX_DURATIONS = (30, 180)
+LISTING_SIZES = (10, 1_000, 100_000)
+RSS_SAMPLE_SECONDS = 0.005
+
+# Provider credentials cleared while benchmarking, so no case leaves the machine
+PROVIDER_SETTINGS = ('OPENAI_API_KEY', 'GROQ_API_KEY', 'TOGETHER_API_KEY', 'MUBERT_API_KEY', 'SUNO_API_KEY')
+PROVIDER_ENV = ('ELEVENLABS_API_KEY', 'UBERDUCK_API_KEY', 'UBERDUCK_API_SECRET')
+
+SAMPLE_LYRICS = "\n".join([
+    "Verse 1:", "Walking through the city lights", "Every window burning bright",
+    "Chorus:", "Hold on, hold on to the night", "We are young and we are right",
+    "Bridge:", "When the morning comes around", "We will never make a sound",
+])
+
+
+@dataclass
+class Case:
+    """A benchmark: ``setup()`` returns the argument passed to ``run``."""
+    name: str
+    run: object
+    setup: object = None
+    teardown: object = None
+    requires: str = ''
+
+
+@dataclass
+class Result:
+    name: str
+    wall_median: float = 0.0
+    wall_min: float = 0.0
+    peak_rss_mb: float = None
+    alloc_peak_mb: float = 0.0
+    alloc_blocks: int = 0
+    skipped: str = ''
+    samples: list = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        if self.skipped:
+            return {'skipped': self.skipped}
+        return {
+            'wall_median': round(self.wall_median, 6),
+            'wall_min': round(self.wall_min, 6),
+            'peak_rss_mb': None if self.peak_rss_mb is None else round(self.peak_rss_mb, 2),
+            'alloc_peak_mb': round(self.alloc_peak_mb, 3),
+            'alloc_blocks': self.alloc_blocks,
+        }
+
+
+class RSSSampler:
+    """Track the peak RSS of this process, above its value at start, in a thread."""
+
+    def __init__(self, interval: float = RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        if not PSUTIL_AVAILABLE:
+            return self
+        process = psutil.Process()
+        self._start = process.memory_info().rss
+
+        def sample():
+            while not self._stop.is_set():
+                self.peak = max(self.peak, process.memory_info().rss - self._start)
+                self._stop.wait(self.interval)
+        self._thread = threading.Thread(target=sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+
+    @property
+    def peak_mb(self):
+        return self.peak / (1024 * 1024) if PSUTIL_AVAILABLE else None
+
+
+def measure(case: Case, repeat: int) -> Result:
+    """Run a case ``repeat`` times for timing and RSS, then once under tracemalloc."""
+    if case.requires:
+        return Result(case.name, skipped=case.requires)
+    argument = case.setup() if case.setup else None
+    try:
+        case.run(argument)  # warm-up: imports, caches, first-touch allocations
+        samples = []
+        with RSSSampler() as rss:
+            for _ in range(repeat):
+                started = time.perf_counter()
+                case.run(argument)
+                samples.append(time.perf_counter() - started)
+
+        tracemalloc.start()
+        try:
+            case.run(argument)
+            _, peak = tracemalloc.get_traced_memory()
+            blocks = len(tracemalloc.take_snapshot().traces)
+        finally:
+            tracemalloc.stop()
+    finally:
+        if case.teardown:
+            case.teardown(argument)
+
+    return Result(
+        case.name,
+        wall_median=statistics.median(samples),
+        wall_min=min(samples),
+        peak_rss_mb=rss.peak_mb,
+        alloc_peak_mb=peak / (1024 * 1024),
+        alloc_blocks=blocks,
+        samples=samples,
+    )
+
+
+def environment() -> dict:
+    """Facts that make results comparable (or not) between runs."""
+    import numpy as np
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'database': settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1],
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """
+    Regressions of ``current`` against ``baseline`` (both ``{case: result dict}``).
+
+    Returns:
+        List of (case, metric, baseline value, current value, ratio) for
+        every median wall time or allocation peak that grew by more than
+        ``threshold`` (0.2 = 20%)
+    """
+    regressions = []
+    for name, result in current.items():
+        before = baseline.get(name)
+        if not before or 'skipped' in result or 'skipped' in before:
+            continue
+        for metric in ('wall_median', 'alloc_peak_mb'):
+            old, new = before.get(metric), result.get(metric)
+            if old and new is not None and new > old * (1 + threshold):
+                regressions.append((name, metric, old, new, new / old))
+    return regressions
+
+
+# -- fixtures ---------------------------------------------------------------
+
+@contextlib.contextmanager
+def offline_environment():
+    """Scratch audio directory, local cache and no provider credentials."""
+    scratch = tempfile.mkdtemp(prefix='auralynx-bench-')
+    cleared = {name: None for name in PROVIDER_SETTINGS}
+    env = {name: value for name, value in os.environ.items() if name not in PROVIDER_ENV}
+    caches = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    previous_disable = logging.root.manager.disable
+    # The fallbacks log a warning per call; keep the report readable
+    logging.disable(logging.WARNING)
+    try:
+        with override_settings(TEMP_AUDIO_DIR=scratch, CACHES=caches, **cleared), \
+                mock.patch.dict(os.environ, env, clear=True):
+            yield scratch
+    finally:
+        logging.disable(previous_disable)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+def write_fixture_wav(path: str, seconds: float, frequency: float, seed: int, sample_rate: int = 44100):
+    """Deterministic 16-bit mono WAV: a tone plus seeded noise."""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    signal = 0.5 * np.sin(2 * np.pi * frequency * t) + 0.05 * rng.standard_normal(t.size)
+    with wave.open(path, 'w') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes((signal * 0.8 * 32767).astype(np.int16).tobytes())
+
+
+def _clear_outputs(directory: str, keep: tuple = ()):
+    """Delete renders between runs so the scratch directory does not grow."""
+    for entry in os.scandir(directory):
+        if entry.is_file() and entry.path not in keep:
+            os.remove(entry.path)
+
+
+# -- cases ------------------------------------------------------------------
+
+def render_cases(scratch: str) -> list:
+    from .progress import NULL_PROGRESS
+    from .utils import _synthetic_instrumental, _synthetic_vocals, generate_music_track, generate_singing_vocals
+
+    def public(func):
+        def run(_):
+            func(SAMPLE_LYRICS, 'pop')
+            _clear_outputs(scratch)
+        return run
+
+    def synthetic(func, *args, duration, in_memory):
+        def run(_):
+            func(*args, in_memory, NULL_PROGRESS, duration=duration)
+            _clear_outputs(scratch)
+        return run
+
+    cases = [
+        Case('instrumental.fallback', public(generate_music_track)),
+        Case('vocals.fallback', public(generate_singing_vocals)),
+    ]
+    for seconds in RENDER_DURATIONS:
+        for in_memory in (False, True):
+            suffix = f'{seconds}s' + ('.memory' if in_memory else '')
+            cases.append(Case(f'instrumental.synthetic.{suffix}',
+                              synthetic(_synthetic_instrumental, 'pop', duration=seconds, in_memory=in_memory)))
+            cases.append(Case(f'vocals.synthetic.{suffix}',
+                              synthetic(_synthetic_vocals, SAMPLE_LYRICS, 'pop', duration=seconds,
+                                        in_memory=in_memory)))
+    return cases
+
+
+def mix_cases(scratch: str) -> list:
+    from .utils import PYDUB_AVAILABLE, mix_audio_tracks
+
+    def fixtures(seconds):
+        def setup():
+            paths = (os.path.join(scratch, f'fixture_instrumental_{seconds}.wav'),
+                     os.path.join(scratch, f'fixture_vocals_{seconds}.wav'))
+            write_fixture_wav(paths[0], seconds, 220.0, seed=1)
+            write_fixture_wav(paths[1], seconds, 440.0, seed=2)
+            return paths
+
+        def teardown(paths):
+            for path in paths:
+                os.remove(path)
+        return setup, teardown
+
+    def mix(mode):
+        def run(paths):
+            mix_audio_tracks(paths[0], paths[1], 'pop', mode=mode)
+            _clear_outputs(scratch, keep=paths)
+        return run
+
+    have_ffmpeg = shutil.which('ffmpeg') is not None
+    requirements = {
+        'stream': '',
+        'pydub': '' if PYDUB_AVAILABLE and have_ffmpeg else 'pydub and ffmpeg',
+        'master': '' if have_ffmpeg else 'ffmpeg',
+    }
+    cases = []
+    for seconds in MIX_DURATIONS:
+        setup, teardown = fixtures(seconds)
+        for mode, missing in requirements.items():
+            cases.append(Case(f'mix.{mode}.{seconds}s', mix(mode), setup, teardown,
+                              requires=f'needs {missing}' if missing else ''))
+    return cases
+
+
+def lyrics_cases() -> list:
+    from .utils import _template_lyrics, generate_song_lyrics
+
+    return [
+        Case('lyrics.template', lambda _: _template_lyrics('love and dreams', 'pop')),
+        Case('lyrics.fallback', lambda _: generate_song_lyrics('love and dreams', 'pop')),
+    ]
+
+
+def listing_cases(sizes=LISTING_SIZES) -> list:
+    """
+    Serialize all of a user's songs: SongSerializer (nested user, lyrics)
+    and the slim SongListSerializer projection the listing endpoint uses.
+    Needs a database (the command sets up a test database).
+    """
+    from django.contrib.auth import get_user_model
+
+    from .models import Song
+    from .serializers import SongListSerializer, SongSerializer
+
+    owners = {}
+
+    def rows(count):
+        # Both serializers of a size read the same rows, created once
+        def setup():
+            if count not in owners:
+                user = get_user_model().objects.create_user(username=f'bench{count}', password='unused-password')
+                lyrics = '\n'.join(SAMPLE_LYRICS.split('\n') * 4)
+                Song.objects.bulk_create(
+                    (Song(user=user, title=f'Song {i}', genre='pop', lyrics=lyrics,
+                          mix_url=f'https://example.com/temp-audio/mixed_{i}.wav',
+                          mix_file=f'mixed_{i}.wav', duration_seconds=55)
+                     for i in range(count)),
+                    batch_size=1_000,
+                )
+                owners[count] = user
+            return owners[count]
+        return setup
+
+    def full(user):
+        SongSerializer(Song.objects.filter(user=user).select_related('user'), many=True).data
+
+    def slim(user):
+        SongListSerializer(Song.objects.filter(user=user).defer('lyrics'), many=True).data
+
+    cases = []
+    for count in sizes:
+        cases.append(Case(f'songs.serialize.{count}', full, rows(count)))
+        cases.append(Case(f'songs.list.{count}', slim, rows(count)))
+    return cases
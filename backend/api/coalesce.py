@@ -0,0 +1,184 @@
+"""
+Single-flight coalescing of identical generation requests.
+
+Identical requests to a generation endpoint (a double-click, or a frontend
+retry while the first render is still running) share one computation: the
+first request takes a lock in the cache and computes, later ones wait for
+its result instead of calling the provider again.
+
+The key is a SHA-256 of the endpoint name and its canonical JSON inputs.
+Lock and result live in the default Django cache, so coalescing works
+across workers that share it (the file cache on one node, Redis across
+nodes). The result is kept for COALESCE_RESULT_TTL_SECONDS so a retry that
+arrives just after the first request finished gets it too.
+
+The file cache has no atomic add; two requests racing on the very first
+lock may both compute, which costs a duplicate render but never a wrong
+result.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import count_cache
+
+
+def request_key(endpoint: str, inputs: dict) -> str:
+    """Canonical hash of an endpoint and its inputs."""
+    canonical = json.dumps({'endpoint': endpoint, 'inputs': inputs},
+                           sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def mix_inputs(instrumental_path: str, vocals_path: str, genre: str, mode: str = None,
+               output_format: str = None) -> dict:
+    """Key inputs for a mix; mode and format default like mix_audio_tracks."""
+    return {
+        'instrumental': os.path.basename(instrumental_path),
+        'vocals': os.path.basename(vocals_path),
+        'genre': genre,
+        'mode': (mode or getattr(settings, 'AUDIO_MIX_MODE', 'auto')).lower(),
+        'format': (output_format or 'wav').lower(),
+    }
+
+
+def _keys(endpoint: str, inputs: dict) -> tuple:
+    prefix = getattr(settings, 'COALESCE_CACHE_PREFIX', 'auralynx:coalesce')
+    digest = request_key(endpoint, inputs)
+    return f"{prefix}:lock:{digest}", f"{prefix}:result:{digest}"
+
+
+def _settings() -> tuple:
+    return (
+        getattr(settings, 'COALESCE_LOCK_TTL_SECONDS', 300),
+        getattr(settings, 'COALESCE_RESULT_TTL_SECONDS', 30),
+        getattr(settings, 'COALESCE_POLL_SECONDS', 0.25),
+    )
+
+
+def _shared_result(entry, token):
+    """Unpack a stored entry: a value, or the leader's error re-raised."""
+    if 'error' in entry:
+        if entry.get('token') == token:
+            raise RuntimeError(entry['error'])
+        return None
+    return entry
+
+
+def single_flight(endpoint: str, inputs: dict, compute):
+    """
+    Run compute() once for concurrent identical requests and share its result.
+
+    Args:
+        endpoint: Name of the endpoint (part of the key)
+        inputs: JSON-serializable inputs that determine the result
+        compute: Zero-argument callable producing the result (must be
+            picklable for the cache)
+
+    Returns:
+        compute()'s result, possibly computed by another request
+
+    Raises:
+        RuntimeError: If the request being waited on failed (with its message)
+    """
+    if not getattr(settings, 'COALESCE_ENABLED', True):
+        return compute()
+
+    lock_key, result_key = _keys(endpoint, inputs)
+    lock_ttl, result_ttl, poll = _settings()
+
+    entry = cache.get(result_key)
+    if entry is not None and 'value' in entry:
+        count_cache('coalesce', 'hit')
+        return entry['value']
+
+    deadline = time.monotonic() + lock_ttl
+    while True:
+        token = uuid.uuid4().hex
+        if cache.add(lock_key, token, lock_ttl):
+            count_cache('coalesce', 'miss')
+            try:
+                value = compute()
+            except Exception as e:
+                cache.set(result_key, {'error': str(e), 'token': token}, result_ttl)
+                raise
+            else:
+                cache.set(result_key, {'value': value}, result_ttl)
+                return value
+            finally:
+                cache.delete(lock_key)
+
+        # Someone else is computing: wait for their result, or take over
+        # if their lock goes away without one. The result is written before
+        # the lock is released, so reading the lock and then the result
+        # never misses it.
+        leader = waited_on = cache.get(lock_key)
+        while time.monotonic() < deadline:
+            entry = cache.get(result_key)
+            if entry is not None:
+                shared = _shared_result(entry, waited_on)
+                if shared is not None:
+                    count_cache('coalesce', 'shared')
+                    return shared['value']
+            if leader is None:
+                break
+            time.sleep(poll)
+            leader = cache.get(lock_key)
+            waited_on = leader or waited_on
+
+        if time.monotonic() >= deadline:
+            return compute()
+
+
+async def asingle_flight(endpoint: str, inputs: dict, acompute):
+    """Async version of single_flight; acompute is a zero-argument coroutine function."""
+    if not getattr(settings, 'COALESCE_ENABLED', True):
+        return await acompute()
+
+    lock_key, result_key = _keys(endpoint, inputs)
+    lock_ttl, result_ttl, poll = _settings()
+
+    entry = await cache.aget(result_key)
+    if entry is not None and 'value' in entry:
+        count_cache('coalesce', 'hit')
+        return entry['value']
+
+    deadline = time.monotonic() + lock_ttl
+    while True:
+        token = uuid.uuid4().hex
+        if await cache.aadd(lock_key, token, lock_ttl):
+            count_cache('coalesce', 'miss')
+            try:
+                value = await acompute()
+            except Exception as e:
+                await cache.aset(result_key, {'error': str(e), 'token': token}, result_ttl)
+                raise
+            else:
+                await cache.aset(result_key, {'value': value}, result_ttl)
+                return value
+            finally:
+                await cache.adelete(lock_key)
+
+        leader = waited_on = await cache.aget(lock_key)
+        while time.monotonic() < deadline:
+            entry = await cache.aget(result_key)
+            if entry is not None:
+                shared = _shared_result(entry, waited_on)
+                if shared is not None:
+                    count_cache('coalesce', 'shared')
+                    return shared['value']
+            if leader is None:
+                break
+            await asyncio.sleep(poll)
+            leader = await cache.aget(lock_key)
+            waited_on = leader or waited_on
+
+        if time.monotonic() >= deadline:
+            return await acompute()
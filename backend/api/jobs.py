@@ -0,0 +1,693 @@
+"""
+Asynchronous job queue for long-running generation.
+
+Submitting a job returns a job ID immediately; workers run the stages from
+api/utils.py in the background and clients poll (or long-poll) the status
+endpoint instead of holding a gunicorn worker for the whole render.
+
+Two backends share the same worker logic:
+- InProcessJobQueue: worker threads inside the current process (dev, tests)
+- RedisJobQueue: jobs stored in Redis and drained by
+  `python manage.py run_job_worker`
+
+Jobs support retries with backoff, cancellation, result TTLs and
+queue-depth metrics. Each job has a priority class (high, normal, low;
+defaulting by task) and workers pick between the per-class queues by
+weight (see api.scheduling).
+"""
+
+import abc
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from urllib.parse import urljoin
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from .log import current_request_id, request_id_context
+from .metrics import count_job
+from .progress import ProgressReporter
+from .scheduling import PRIORITIES, WeightedPicker, stage_priority, validate_priority
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobCancelled(Exception):
+    """Raised inside a task when its job has been cancelled."""
+
+
+class JobContext:
+    """What a running task knows about its job."""
+
+    def __init__(self, queue, job: dict):
+        self.job_id = job['id']
+        self.user_id = job.get('user_id')
+        self.base_url = job.get('base_url') or ''
+        self.progress = ProgressReporter(job['id'])
+        self._queue = queue
+
+    def should_cancel(self) -> bool:
+        return self._queue._cancel_requested(self.job_id)
+
+    def audio_url(self, path: str) -> str:
+        if not path:
+            return ''
+        from .temp_audio import public_audio_url
+        return urljoin(self.base_url, public_audio_url(path))
+
+    def waveform(self, audio_url: str) -> dict:
+        from .waveform import waveform_payload
+        return waveform_payload(audio_url, lambda url: urljoin(self.base_url, url))
+
+
+# ---------------------------------------------------------------------------
+# Tasks: thin wrappers around the generation stages. Each takes the job
+# params and a JobContext and returns a JSON-serializable result.
+# ---------------------------------------------------------------------------
+
+def _task_lyrics(params: dict, context: JobContext) -> dict:
+    from .utils import generate_song_lyrics
+    genre = params.get('genre', 'pop')
+    context.progress.stage_started('lyrics')
+    lyrics = generate_song_lyrics(params['input_text'], genre)
+    context.progress.stage_finished('lyrics')
+    return {'lyrics': lyrics, 'genre': genre}
+
+
+def _task_instrumental(params: dict, context: JobContext) -> dict:
+    from .utils import generate_music_track
+    path, duration = generate_music_track(params['lyrics'], params.get('genre', 'pop'), progress=context.progress)
+    url = context.audio_url(path)
+    return {'url': url, 'duration': duration, 'format': 'wav', 'waveform': context.waveform(url)}
+
+
+def _task_vocals(params: dict, context: JobContext) -> dict:
+    from .utils import generate_singing_vocals
+    path, duration = generate_singing_vocals(params['lyrics'], params.get('genre', 'pop'), progress=context.progress)
+    url = context.audio_url(path)
+    return {'url': url, 'duration': duration, 'format': 'wav', 'waveform': context.waveform(url)}
+
+
+def _task_mix(params: dict, context: JobContext) -> dict:
+    from .utils import mix_audio_tracks, temp_audio_path
+    from .variants import schedule_variants
+    path, duration = mix_audio_tracks(
+        temp_audio_path(params['instrumental_url']),
+        temp_audio_path(params['vocals_url']),
+        params.get('genre', 'pop'),
+        mode=params.get('mode'),
+        output_format=params.get('format', 'wav'),
+        progress=context.progress,
+    )
+    url = context.audio_url(path)
+    schedule_variants(url)
+    return {'url': url, 'duration': duration,
+            'format': os.path.splitext(path)[1].lstrip('.') or 'wav', 'waveform': context.waveform(url)}
+
+
+def _task_song(params: dict, context: JobContext) -> dict:
+    from .pipeline import run_song_pipeline, save_generated_song, StageGraphCancelled
+    genre = params.get('genre', 'pop')
+    try:
+        result = run_song_pipeline(
+            params.get('input_text', ''), genre,
+            lyrics=params.get('lyrics') or None,
+            keep_stems=bool(params.get('keep_stems')),
+            should_cancel=context.should_cancel,
+            progress=context.progress,
+        )
+    except StageGraphCancelled as e:
+        raise JobCancelled(str(e))
+
+    user = get_user_model().objects.filter(pk=context.user_id).first() if context.user_id else None
+    song = save_generated_song(
+        result, user=user, genre=genre,
+        title=params.get('title') or params.get('input_text', ''),
+        build_url=lambda url: urljoin(context.base_url, url),
+    )
+    return {'song_id': song.id, 'url': song.mix_url, 'duration': result['duration'],
+            'lyrics': result['lyrics'], 'timings': result['timings'], 'format': 'wav',
+            'waveform': context.waveform(song.mix_url)}
+
+
+# name -> (callable, required params)
+TASKS = {
+    'lyrics': (_task_lyrics, ('input_text',)),
+    'instrumental': (_task_instrumental, ('lyrics',)),
+    'vocals': (_task_vocals, ('lyrics',)),
+    'mix': (_task_mix, ('instrumental_url', 'vocals_url')),
+    'song': (_task_song, ()),
+}
+
+
+def validate_job(task: str, params: dict) -> str:
+    """Return an error message for an invalid submission, or '' if valid."""
+    if task not in TASKS:
+        return f"Unknown task '{task}'. Use one of: {', '.join(TASKS)}"
+    missing = [name for name in TASKS[task][1] if not params.get(name)]
+    if missing:
+        return f"{', '.join(missing)} is required"
+    if task == 'song' and not (params.get('input_text') or params.get('lyrics')):
+        return 'input_text or lyrics is required'
+    return ''
+
+
+# ---------------------------------------------------------------------------
+# Queue backends
+# ---------------------------------------------------------------------------
+
+class JobQueue(abc.ABC):
+    """
+    Backend-independent job lifecycle.
+
+    Subclasses provide storage primitives (_save, _load, _enqueue,
+    _dequeue, ...); submission, retries, cancellation and the worker loop
+    live here.
+    """
+
+    def __init__(self, max_retries: int = None, result_ttl: int = None, retry_backoff: float = None):
+        self.max_retries = max_retries if max_retries is not None else getattr(settings, 'JOB_MAX_RETRIES', 2)
+        self.result_ttl = result_ttl or getattr(settings, 'JOB_RESULT_TTL_SECONDS', 3600)
+        self.retry_backoff = retry_backoff if retry_backoff is not None else getattr(
+            settings, 'JOB_RETRY_BACKOFF_SECONDS', 5)
+
+    # -- public API ---------------------------------------------------------
+
+    def submit(self, task: str, params: dict, user_id: int = None, base_url: str = '',
+               max_retries: int = None, priority: str = None) -> dict:
+        error = validate_job(task, params) or validate_priority(priority)
+        if error:
+            raise ValueError(error)
+        job = {
+            'id': uuid.uuid4().hex,
+            'task': task,
+            'params': params,
+            'priority': priority or stage_priority(task),
+            'status': QUEUED,
+            'attempts': 0,
+            'max_retries': self.max_retries if max_retries is None else max_retries,
+            'user_id': user_id,
+            'base_url': base_url,
+            # Logged with the job's records, to trace it back to the request
+            'request_id': current_request_id(),
+            'result': None,
+            'error': None,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+        }
+        self._save(job)
+        self._count('submitted')
+        count_job(task, 'submitted')
+        self._enqueue(job['id'], job['priority'])
+        return job
+
+    def get(self, job_id: str) -> dict:
+        return self._load(job_id)
+
+    def wait(self, job_id: str, timeout: float) -> dict:
+        """Block until the job finishes or ``timeout`` seconds pass (long poll)."""
+        deadline = time.monotonic() + timeout
+        job = self._load(job_id)
+        while job and job['status'] not in FINISHED_STATUSES and time.monotonic() < deadline:
+            self._wait_for_change(job_id, min(1.0, deadline - time.monotonic()))
+            job = self._load(job_id)
+        return job
+
+    def cancel(self, job_id: str) -> dict:
+        """
+        Cancel a job. Queued jobs never start; running jobs stop at the next
+        stage boundary.
+        """
+        job = self._load(job_id)
+        if job is None or job['status'] in FINISHED_STATUSES:
+            return job
+        self._request_cancel(job_id)
+        if job['status'] == QUEUED:
+            self._finish(job, CANCELLED, error='Cancelled before start')
+        return self._load(job_id)
+
+    @abc.abstractmethod
+    def metrics(self) -> dict:
+        """Queue depth, running jobs and lifecycle counters."""
+
+    # -- worker -------------------------------------------------------------
+
+    def run_worker(self, stop_event: threading.Event = None, poll_timeout: float = 1.0):
+        """Run jobs until stop_event is set."""
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            job_id = self._dequeue(poll_timeout)
+            if job_id:
+                try:
+                    self.run_job(job_id)
+                finally:
+                    self._ack(job_id)
+
+    def run_job(self, job_id: str):
+        job = self._load(job_id)
+        if job is None or job['status'] != QUEUED:
+            return
+        with request_id_context(job.get('request_id') or job_id):
+            self._run_loaded(job)
+
+    def _run_loaded(self, job: dict):
+        job_id = job['id']
+        if self._cancel_requested(job_id):
+            self._finish(job, CANCELLED, error='Cancelled before start')
+            return
+
+        job.update(status=RUNNING, attempts=job['attempts'] + 1, started_at=time.time())
+        self._save(job)
+        self._mark_running(job_id, True)
+        func = TASKS[job['task']][0]
+        try:
+            result = func(job['params'], JobContext(self, job))
+        except JobCancelled as e:
+            self._finish(job, CANCELLED, error=str(e))
+        except Exception as e:
+            if self._cancel_requested(job_id):
+                self._finish(job, CANCELLED, error=str(e))
+            elif job['attempts'] <= job['max_retries']:
+                logger.warning("Job %s attempt %s failed, retrying: %s", job_id, job['attempts'], e)
+                job.update(status=QUEUED, error=str(e))
+                self._save(job)
+                self._count('retried')
+                count_job(job['task'], 'retried')
+                self._enqueue(job_id, job['priority'], delay=self.retry_backoff * job['attempts'])
+            else:
+                self._finish(job, FAILED, error=str(e))
+        else:
+            self._finish(job, SUCCEEDED, result=result)
+        finally:
+            self._mark_running(job_id, False)
+
+    def _finish(self, job: dict, status: str, result=None, error=None):
+        job.update(status=status, result=result, error=error, finished_at=time.time())
+        self._save(job, ttl=self.result_ttl)
+        self._count(status)
+        count_job(job['task'], status)
+        self._notify(job['id'])
+        # Job channels end with a terminal event so SSE subscribers disconnect
+        reporter = ProgressReporter(job['id'])
+        if status == SUCCEEDED:
+            reporter.done(job_id=job['id'], status=status, result=result)
+        else:
+            reporter.error(error or status)
+
+    # -- storage primitives -------------------------------------------------
+
+    @abc.abstractmethod
+    def _save(self, job: dict, ttl: int = None):
+        """Store a job record, expiring ``ttl`` seconds later if given."""
+
+    @abc.abstractmethod
+    def _load(self, job_id: str) -> dict:
+        """The stored job record, or None when missing or expired."""
+
+    @abc.abstractmethod
+    def _enqueue(self, job_id: str, priority: str, delay: float = 0):
+        """Make a job ready to run, after ``delay`` seconds if given."""
+
+    @abc.abstractmethod
+    def _dequeue(self, timeout: float) -> str:
+        """Next ready job ID, waiting up to ``timeout`` seconds (None if none)."""
+
+    @abc.abstractmethod
+    def _request_cancel(self, job_id: str):
+        """Flag a job as cancelled and drop it from the ready queues."""
+
+    @abc.abstractmethod
+    def _cancel_requested(self, job_id: str) -> bool:
+        """Whether the job has been flagged as cancelled."""
+
+    @abc.abstractmethod
+    def _mark_running(self, job_id: str, running: bool):
+        """Track the job as running (or no longer running) for metrics."""
+
+    @abc.abstractmethod
+    def _count(self, event: str):
+        """Increment a lifecycle counter."""
+
+    def _wait_for_change(self, job_id: str, timeout: float):
+        time.sleep(max(timeout, 0))
+
+    def _notify(self, job_id: str):
+        pass
+
+    def _ack(self, job_id: str):
+        """Called once a dequeued job has been handled."""
+
+
+class InProcessJobQueue(JobQueue):
+    """
+    Job queue held in process memory, run by daemon worker threads.
+
+    Suitable for development and tests; jobs do not survive a restart and
+    are not shared between gunicorn workers. With ``autostart=False`` no
+    threads are started and the caller runs jobs itself (run_job, _dequeue),
+    which keeps tests deterministic.
+    """
+
+    def __init__(self, workers: int = None, autostart: bool = True, **kwargs):
+        super().__init__(**kwargs)
+        self._autostart = autostart
+        self._jobs = {}
+        self._expiry = {}
+        self._queues = {priority: deque() for priority in PRIORITIES}
+        self._picker = WeightedPicker()
+        self._delayed = []
+        self._cancelled = set()
+        self._running = set()
+        self._counters = {}
+        self._condition = threading.Condition()
+        self._workers = workers or getattr(settings, 'JOB_WORKERS', 2)
+        self._threads = []
+        self._stop = threading.Event()
+
+    def _ensure_workers(self):
+        if self._threads or not self._autostart:
+            return
+        for index in range(self._workers):
+            thread = threading.Thread(target=self.run_worker, args=(self._stop,),
+                                      name=f'job-worker-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, *args, **kwargs) -> dict:
+        self._ensure_workers()
+        return super().submit(*args, **kwargs)
+
+    def shutdown(self):
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+
+    def metrics(self) -> dict:
+        with self._condition:
+            self._purge_expired()
+            return {
+                'backend': 'inprocess',
+                'queue_depth': sum(len(queue) for queue in self._queues.values()) + len(self._delayed),
+                'queue_depth_by_priority': {priority: len(queue) for priority, queue in self._queues.items()},
+                'running': len(self._running),
+                'workers': self._workers,
+                'counters': dict(self._counters),
+            }
+
+    def _purge_expired(self):
+        now = time.time()
+        for job_id in [job_id for job_id, expires in self._expiry.items() if expires <= now]:
+            self._jobs.pop(job_id, None)
+            self._expiry.pop(job_id, None)
+            self._cancelled.discard(job_id)
+
+    def _save(self, job: dict, ttl: int = None):
+        with self._condition:
+            self._jobs[job['id']] = json.loads(json.dumps(job))
+            if ttl:
+                self._expiry[job['id']] = time.time() + ttl
+            self._condition.notify_all()
+
+    def _load(self, job_id: str) -> dict:
+        with self._condition:
+            self._purge_expired()
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def _enqueue(self, job_id: str, priority: str, delay: float = 0):
+        with self._condition:
+            if delay > 0:
+                self._delayed.append((time.monotonic() + delay, job_id, priority))
+            else:
+                self._queues[priority].append(job_id)
+            self._condition.notify_all()
+
+    def _dequeue(self, timeout: float) -> str:
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                due = [item for item in self._delayed if item[0] <= now]
+                for item in due:
+                    self._delayed.remove(item)
+                    self._queues[item[2]].append(item[1])
+                priority = self._picker.pick([p for p, queue in self._queues.items() if queue])
+                if priority is not None:
+                    return self._queues[priority].popleft()
+                if now >= deadline:
+                    return None
+                # Wake up for the next retry that falls due, too
+                wake = min([deadline] + [item[0] for item in self._delayed])
+                self._condition.wait(max(wake - now, 0.001))
+        return None
+
+    def _request_cancel(self, job_id: str):
+        with self._condition:
+            self._cancelled.add(job_id)
+            for queue in self._queues.values():
+                if job_id in queue:
+                    queue.remove(job_id)
+            self._delayed = [item for item in self._delayed if item[1] != job_id]
+
+    def _cancel_requested(self, job_id: str) -> bool:
+        with self._condition:
+            return job_id in self._cancelled
+
+    def _mark_running(self, job_id: str, running: bool):
+        with self._condition:
+            if running:
+                self._running.add(job_id)
+            else:
+                self._running.discard(job_id)
+
+    def _count(self, event: str):
+        with self._condition:
+            self._counters[event] = self._counters.get(event, 0) + 1
+
+    def _wait_for_change(self, job_id: str, timeout: float):
+        with self._condition:
+            self._condition.wait(max(timeout, 0))
+
+
+class RedisJobQueue(JobQueue):
+    """
+    Job queue stored in Redis and shared by every web and worker process.
+
+    Keys (all under settings.JOB_REDIS_PREFIX):
+        job:<id>         JSON job record (expires result_ttl after finishing)
+        job:<id>:cancel  cancellation flag
+        queue:<priority> list of ready job IDs per priority class
+        delayed          sorted set of job IDs waiting for a retry
+        running          set of job IDs being executed
+        stats            hash of lifecycle counters
+        processing:<worker>  job IDs a worker process has taken (BLMOVE)
+        worker:<worker>  heartbeat of a live worker process
+
+    A job stays in its worker's processing list until it has been handled,
+    so a job taken by a worker that crashed or was killed is not lost:
+    workers starting up requeue the processing lists of workers whose
+    heartbeat has expired.
+    """
+
+    HEARTBEAT_SECONDS = 10
+    HEARTBEAT_TTL_SECONDS = 60
+
+    def __init__(self, url: str = None, prefix: str = None, **kwargs):
+        super().__init__(**kwargs)
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("redis library not available. Install it or set JOB_BACKEND=inprocess.")
+        self._redis = redis.Redis.from_url(url or settings.REDIS_URL, decode_responses=True)
+        self._prefix = prefix or getattr(settings, 'JOB_REDIS_PREFIX', 'auralynx:jobs')
+        self._picker = WeightedPicker()
+        self._picker_lock = threading.Lock()
+        self._worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._worker_started = False
+        self._worker_lock = threading.Lock()
+
+    def _key(self, *parts) -> str:
+        return ':'.join((self._prefix,) + parts)
+
+    @property
+    def _processing(self) -> str:
+        return self._key('processing', self._worker_id)
+
+    # -- worker liveness ------------------------------------------------------
+
+    def run_worker(self, stop_event: threading.Event = None, poll_timeout: float = 1.0):
+        stop_event = stop_event or threading.Event()
+        with self._worker_lock:
+            if not self._worker_started:
+                self._worker_started = True
+                self._beat()
+                threading.Thread(target=self._heartbeat, args=(stop_event,),
+                                 name='job-worker-heartbeat', daemon=True).start()
+                self.requeue_stale()
+        super().run_worker(stop_event, poll_timeout)
+
+    def _beat(self):
+        self._redis.set(self._key('worker', self._worker_id), time.time(), ex=self.HEARTBEAT_TTL_SECONDS)
+
+    def _heartbeat(self, stop_event: threading.Event):
+        while not stop_event.wait(self.HEARTBEAT_SECONDS):
+            try:
+                self._beat()
+            except Exception as e:
+                logger.warning("Job worker heartbeat failed: %s", e)
+
+    def requeue_stale(self) -> int:
+        """
+        Requeue jobs taken by worker processes that are no longer alive.
+
+        A job that was running counts the lost run as an attempt, and fails
+        once it is out of retries (a job that kills its worker must not
+        take down every worker in turn). Returns the number of jobs found.
+        """
+        found = 0
+        for key in self._redis.scan_iter(match=self._key('processing', '*')):
+            worker = key[len(self._key('processing', '')):]
+            if worker == self._worker_id or self._redis.exists(self._key('worker', worker)):
+                continue
+            # RPOP hands each entry to exactly one recovering worker
+            while True:
+                job_id = self._redis.rpop(key)
+                if job_id is None:
+                    break
+                found += 1
+                self._redis.srem(self._key('running'), job_id)
+                job = self._load(job_id)
+                if job is None or job['status'] in FINISHED_STATUSES:
+                    continue
+                with request_id_context(job.get('request_id') or job_id):
+                    if job['status'] == RUNNING and job['attempts'] > job['max_retries']:
+                        logger.warning("Job %s was lost with its worker %s and is out of retries", job_id, worker)
+                        self._finish(job, FAILED, error='Worker stopped while running the job')
+                        continue
+                    logger.warning("Requeueing job %s lost with worker %s", job_id, worker)
+                    job.update(status=QUEUED)
+                    self._save(job)
+                    self._count('requeued')
+                    self._enqueue(job_id, job.get('priority', 'normal'))
+        return found
+
+    def metrics(self) -> dict:
+        pipe = self._redis.pipeline()
+        for priority in PRIORITIES:
+            pipe.llen(self._key('queue', priority))
+        pipe.zcard(self._key('delayed'))
+        pipe.scard(self._key('running'))
+        pipe.hgetall(self._key('stats'))
+        *ready, delayed, running, counters = pipe.execute()
+        return {
+            'backend': 'redis',
+            'queue_depth': sum(ready) + delayed,
+            'queue_depth_by_priority': dict(zip(PRIORITIES, ready)),
+            'running': running,
+            'counters': {name: int(value) for name, value in counters.items()},
+        }
+
+    def _save(self, job: dict, ttl: int = None):
+        self._redis.set(self._key('job', job['id']), json.dumps(job), ex=ttl)
+
+    def _load(self, job_id: str) -> dict:
+        data = self._redis.get(self._key('job', job_id))
+        return json.loads(data) if data else None
+
+    def _enqueue(self, job_id: str, priority: str, delay: float = 0):
+        if delay > 0:
+            self._redis.zadd(self._key('delayed'), {job_id: time.time() + delay})
+        else:
+            self._redis.lpush(self._key('queue', priority), job_id)
+
+    def _promote_delayed(self):
+        now = time.time()
+        for job_id in self._redis.zrangebyscore(self._key('delayed'), 0, now):
+            # Only the worker that removes the entry re-queues it
+            if self._redis.zrem(self._key('delayed'), job_id):
+                job = self._load(job_id)
+                if job:
+                    self._redis.lpush(self._key('queue', job.get('priority', 'normal')), job_id)
+
+    def _dequeue(self, timeout: float) -> str:
+        self._promote_delayed()
+        pipe = self._redis.pipeline()
+        for priority in PRIORITIES:
+            pipe.llen(self._key('queue', priority))
+        ready = [priority for priority, depth in zip(PRIORITIES, pipe.execute()) if depth]
+        while ready:
+            with self._picker_lock:
+                priority = self._picker.pick(ready)
+            # Moved, not popped: the job stays listed until _ack
+            job_id = self._redis.lmove(self._key('queue', priority), self._processing, 'RIGHT', 'LEFT')
+            if job_id:
+                return job_id
+            # Another worker emptied it first
+            ready.remove(priority)
+        # Nothing ready: BLMOVE waits on one list, so block on each queue in
+        # turn (highest priority first) for a share of the timeout
+        share = max(timeout, 0.3) / len(PRIORITIES)
+        for priority in PRIORITIES:
+            job_id = self._redis.blmove(self._key('queue', priority), self._processing, share, 'RIGHT', 'LEFT')
+            if job_id:
+                return job_id
+        return None
+
+    def _ack(self, job_id: str):
+        self._redis.lrem(self._processing, 1, job_id)
+
+    def _request_cancel(self, job_id: str):
+        self._redis.set(self._key('job', job_id, 'cancel'), '1', ex=self.result_ttl)
+        for priority in PRIORITIES:
+            self._redis.lrem(self._key('queue', priority), 0, job_id)
+        self._redis.zrem(self._key('delayed'), job_id)
+
+    def _cancel_requested(self, job_id: str) -> bool:
+        return bool(self._redis.exists(self._key('job', job_id, 'cancel')))
+
+    def _mark_running(self, job_id: str, running: bool):
+        if running:
+            self._redis.sadd(self._key('running'), job_id)
+        else:
+            self._redis.srem(self._key('running'), job_id)
+
+    def _count(self, event: str):
+        self._redis.hincrby(self._key('stats'), event, 1)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Return the process-wide job queue for settings.JOB_BACKEND."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            backend = getattr(settings, 'JOB_BACKEND', 'inprocess').lower()
+            if backend == 'redis':
+                _queue = RedisJobQueue()
+            elif backend == 'inprocess':
+                _queue = InProcessJobQueue()
+            else:
+                raise RuntimeError(f"Unknown JOB_BACKEND '{backend}'. Use 'inprocess' or 'redis'.")
+        return _queue
@@ -0,0 +1,123 @@
+"""
+Conditional GET and a response cache for a user's song library.
+
+Listing validators come from the user's song count and latest
+``updated_at``: the ETag changes when a song is added, edited or deleted,
+so a client revalidating an unchanged page gets 304 without the page
+being queried or serialized.
+
+Each user also has a library version in the Django cache, the time of
+their last change. The Song signals (api.signals) replace it on every
+save and delete, and rendered pages are cached under it, so one write
+invalidates all of a user's cached pages at once; the old entries just
+expire. A cached page answers without touching the database at all. The
+version also moves Last-Modified forward on deletes, which leave the
+latest ``updated_at`` unchanged.
+"""
+
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .metrics import count_cache
+from .models import Song
+
+
+CACHE_PREFIX = 'auralynx:songs'
+# Revalidate on every use; only this user's browser may store it
+LIBRARY_CACHE_CONTROL = 'private, no-cache'
+
+
+def _version_key(user_id) -> str:
+    return f'{CACHE_PREFIX}:version:{user_id}'
+
+
+def library_version(user_id) -> float:
+    """
+    Time of the user's last library change.
+
+    A missing version (never set, or evicted from a bounded cache) is
+    seeded with the current time rather than read as a fixed default, so
+    pages cached under an earlier version are never served again.
+    """
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        seeded = time.time()
+        # add() keeps a version another request stored in the meantime
+        cache.add(key, seeded, None)
+        version = cache.get(key, seeded)
+    return version
+
+
+def bump_library_version(user_id):
+    """Invalidate every cached listing of a user's songs."""
+    if user_id is None:
+        return
+    cache.set(_version_key(user_id), time.time(), None)
+
+
+def library_validators(user, version: float, variant: str) -> tuple:
+    """
+    (etag, last_modified) of a user's library as one representation.
+
+    variant distinguishes representations of the same library (page URL
+    and media type).
+    """
+    stats = Song.objects.filter(user=user).aggregate(count=Count('id'), latest=Max('updated_at'))
+    latest = stats['latest'].timestamp() if stats['latest'] else 0.0
+    digest = hashlib.sha256(f"{stats['count']}:{latest}:{variant}".encode('utf-8')).hexdigest()[:32]
+    return f'W/"{digest}"', max(latest, version)
+
+
+def _with_validators(response, entry: dict):
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    response['Cache-Control'] = LIBRARY_CACHE_CONTROL
+    return response
+
+
+def library_response(request, build):
+    """
+    GET response for one listing of the requesting user's songs.
+
+    Args:
+        request: DRF request (after content negotiation)
+        build: Zero-argument callable returning the payload; only called
+            when the page is neither unchanged for the client nor cached
+
+    Returns:
+        304 when the client's copy is current, else a Response
+    """
+    variant = f'{request.build_absolute_uri()}|{request.accepted_media_type}'
+    version = library_version(request.user.id)
+    key = f"{CACHE_PREFIX}:page:{request.user.id}:{version}:" \
+          f"{hashlib.sha256(variant.encode('utf-8')).hexdigest()}"
+    ttl = getattr(settings, 'SONG_CACHE_TTL_SECONDS', 300)
+
+    entry = cache.get(key) if ttl else None
+    if entry is None:
+        etag, last_modified = library_validators(request.user, version, variant)
+        entry = {'etag': etag, 'last_modified': last_modified}
+
+    not_modified = get_conditional_response(
+        request, etag=entry['etag'], last_modified=int(entry['last_modified'])
+    )
+    if not_modified is not None:
+        count_cache('library', 'not_modified')
+        return _with_validators(not_modified, entry)
+
+    if 'data' in entry:
+        count_cache('library', 'hit')
+    else:
+        count_cache('library', 'miss')
+        entry['data'] = build()
+        if ttl:
+            cache.set(key, entry, ttl)
+    return _with_validators(Response(entry['data']), entry)
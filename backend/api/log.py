@@ -0,0 +1,73 @@
+"""
+Request IDs and structured log records.
+
+RequestIDMiddleware (api.middleware) puts each request's ID in a context
+variable; RequestIDFilter copies it onto every log record, so lines logged
+anywhere while serving the request (including CPU-pool threads, which
+inherit the context, and background jobs, which carry the ID of the
+request that submitted them) can be correlated.
+
+With LOG_FORMAT=json, JSONFormatter writes one JSON object per line with
+the standard fields plus anything passed in ``extra=``.
+"""
+
+import contextlib
+import contextvars
+import json
+import logging
+
+
+_request_id = contextvars.ContextVar('auralynx_request_id', default=None)
+
+# LogRecord attributes that are not user-supplied extras
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+
+def current_request_id() -> str:
+    return _request_id.get()
+
+
+def set_request_id(request_id: str):
+    """Set the current request ID; returns a token for reset_request_id."""
+    return _request_id.set(request_id)
+
+
+def reset_request_id(token):
+    _request_id.reset(token)
+
+
+@contextlib.contextmanager
+def request_id_context(request_id: str):
+    token = set_request_id(request_id)
+    try:
+        yield
+    finally:
+        reset_request_id(token)
+
+
+class RequestIDFilter(logging.Filter):
+    """Adds ``request_id`` ('-' outside a request) to every record."""
+
+    def filter(self, record):
+        record.request_id = _request_id.get() or '-'
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, request_id and extras."""
+
+    def format(self, record):
+        payload = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None) or '-',
+            'process': record.process,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info:
+            payload['exception'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
@@ -0,0 +1,97 @@
+import fnmatch
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, teardown_databases
+
+from api import benchmarks
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the audio and API hot paths offline (wall time, peak RSS, allocations) "
+            "and compare against a saved baseline.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('patterns', nargs='*',
+                            help='Only run cases matching these glob patterns, e.g. "mix.*" "songs.*.1000".')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Timed runs per case (after one warm-up run).')
+        parser.add_argument('--quick', action='store_true',
+                            help='Skip the largest sizes (120 s renders, 100k-row listings).')
+        parser.add_argument('--baseline', default=str(settings.BASE_DIR / 'benchmarks' / 'baseline.json'),
+                            help='Baseline file to compare against or save to.')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Store these results as the baseline instead of comparing.')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Relative growth that counts as a regression (0.2 = 20%%).')
+        parser.add_argument('--output', help='Also write the results as JSON to this file.')
+
+    def handle(self, *args, **options):
+        skip = ('*.120s*', '*.100000') if options['quick'] else ()
+
+        with benchmarks.offline_environment() as scratch:
+            cases = (benchmarks.lyrics_cases() + benchmarks.render_cases(scratch)
+                     + benchmarks.mix_cases(scratch) + benchmarks.listing_cases())
+            cases = [case for case in cases
+                     if (not options['patterns'] or any(fnmatch.fnmatch(case.name, p) for p in options['patterns']))
+                     and not any(fnmatch.fnmatch(case.name, p) for p in skip)]
+            if not cases:
+                raise CommandError("No benchmark matches the given patterns.")
+
+            old_config = None
+            if any(case.name.startswith('songs.') for case in cases):
+                old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+            try:
+                results = {}
+                for case in cases:
+                    result = benchmarks.measure(case, max(1, options['repeat']))
+                    results[case.name] = result.as_dict()
+                    self.stdout.write(self._format(result))
+            finally:
+                if old_config is not None:
+                    teardown_databases(old_config, verbosity=0)
+
+        report = {'environment': benchmarks.environment(), 'repeat': options['repeat'], 'results': results}
+        if options['output']:
+            self._write(options['output'], report)
+
+        path = options['baseline']
+        if options['save_baseline']:
+            if os.path.exists(path):
+                # Keep cases that were not part of this run
+                with open(path) as f:
+                    report['results'] = {**json.load(f).get('results', {}), **results}
+            self._write(path, report)
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline for {len(results)} case(s) to {path}."))
+            return
+
+        if not os.path.exists(path):
+            self.stdout.write(f"No baseline at {path}; run with --save-baseline to record one.")
+            return
+        with open(path) as f:
+            baseline = json.load(f)
+        if baseline.get('environment') != report['environment']:
+            self.stdout.write(self.style.WARNING(
+                "Baseline was recorded in a different environment; differences may not be regressions."
+            ))
+        regressions = benchmarks.compare(results, baseline.get('results', {}), options['threshold'])
+        for name, metric, old, new, ratio in regressions:
+            self.stdout.write(self.style.ERROR(f"  {name}: {metric} {old:g} -> {new:g} (x{ratio:.2f})"))
+        if regressions:
+            raise CommandError(f"{len(regressions)} regression(s) beyond {options['threshold']:.0%}.")
+        self.stdout.write(self.style.SUCCESS(f"No regressions beyond {options['threshold']:.0%} against {path}."))
+
+    def _format(self, result) -> str:
+        if result.skipped:
+            return f"{result.name:<36} skipped ({result.skipped})"
+        rss = '-' if result.peak_rss_mb is None else f"{result.peak_rss_mb:.1f}"
+        return (f"{result.name:<36} median {result.wall_median * 1000:10.2f} ms  "
+                f"min {result.wall_min * 1000:10.2f} ms  rss +{rss} MB  "
+                f"alloc {result.alloc_peak_mb:.2f} MB / {result.alloc_blocks} blocks")
+
+    def _write(self, path: str, report: dict):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.search import search_backend
+
+
+class Command(BaseCommand):
+    help = "Re-create the song full-text search index from every song."
+
+    def handle(self, *args, **options):
+        backend = search_backend()
+        with transaction.atomic():
+            indexed = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {indexed} song(s) with {type(backend).__name__}."
+        ))
@@ -0,0 +1,40 @@
+import os
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from api.jobs import get_job_queue
+
+
+class Command(BaseCommand):
+    help = "Run background generation jobs from the configured job queue (JOB_BACKEND)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=1,
+                            help='Number of jobs to run concurrently in this process.')
+        parser.add_argument('--nice', type=int, default=0,
+                            help='Lower this process\'s CPU priority by this much (renders yield to web workers).')
+
+    def handle(self, *args, **options):
+        if options['nice']:
+            os.nice(options['nice'])
+        queue = get_job_queue()
+        stop_event = threading.Event()
+
+        def request_stop(signum, frame):
+            self.stdout.write("Stopping after the current job...")
+            stop_event.set()
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        threads = [
+            threading.Thread(target=queue.run_worker, args=(stop_event,), name=f'job-worker-{index}')
+            for index in range(max(1, options['threads']))
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(self.style.SUCCESS(f"Job worker running with {len(threads)} thread(s)."))
+        for thread in threads:
+            thread.join()
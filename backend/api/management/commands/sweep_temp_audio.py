@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from api.temp_audio import index_untracked_files, sweep
+
+
+class Command(BaseCommand):
+    help = "Expire and evict generated audio in TEMP_AUDIO_DIR (TTL and byte quota)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=None,
+                            help='Maximum files to delete (defaults to TEMP_AUDIO_SWEEP_BATCH).')
+        parser.add_argument('--index', action='store_true',
+                            help='First index files missing from the tracking table (walks the directory).')
+
+    def handle(self, *args, **options):
+        if options['index']:
+            added = index_untracked_files()
+            self.stdout.write(f"Indexed {added} untracked file(s).")
+        result = sweep(batch=options['batch'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {result['expired']}, evicted {result['evicted']}, "
+            f"freed {result['freed_bytes']} bytes; {result['total_bytes']} bytes tracked."
+        ))
@@ -0,0 +1,194 @@
+"""
+Single-pass FFmpeg mastering: mix, loudness normalization, limiting and
+encoding in one filtergraph.
+
+Every input is decoded once and the master is encoded once, so a
+delivery-ready WAV, MP3 or Opus file comes out of a single FFmpeg run.
+The duration is read back from FFmpeg's own progress output instead of
+being estimated. ``amaster_audio_tracks`` awaits the same FFmpeg run from
+async views without holding a thread.
+"""
+
+import asyncio
+import os
+import re
+import subprocess
+import uuid
+
+from django.conf import settings
+
+
+# Output targets: file extension, encoder arguments and sample rate
+MASTER_FORMATS = {
+    'wav': {'extension': 'wav', 'codec': ['-c:a', 'pcm_s16le'], 'sample_rate': 44100},
+    'mp3': {'extension': 'mp3', 'codec': ['-c:a', 'libmp3lame', '-b:a', '192k'], 'sample_rate': 44100},
+    # Opus only runs at 48 kHz
+    'opus': {'extension': 'opus', 'codec': ['-c:a', 'libopus', '-b:a', '128k'], 'sample_rate': 48000},
+}
+
+_OUT_TIME_US = re.compile(r'^out_time_us=(\d+)$', re.MULTILINE)
+_OUT_TIME = re.compile(r'^out_time=(\d+):(\d+):(\d+(?:\.\d+)?)$', re.MULTILINE)
+_STDERR_TIME = re.compile(r'time=(\d+):(\d+):(\d+(?:\.\d+)?)')
+
+
+def _ffmpeg_command(args: list) -> list:
+    return [getattr(settings, 'FFMPEG_PATH', 'ffmpeg'), '-hide_banner', '-nostdin', '-y'] + list(args)
+
+
+def _ffmpeg_output(returncode: int, stdout: bytes, stderr: bytes) -> tuple:
+    stdout = stdout.decode('utf-8', errors='replace')
+    stderr = stderr.decode('utf-8', errors='replace')
+    if returncode != 0:
+        tail = stderr.strip().splitlines()[-1:] or ['unknown error']
+        raise RuntimeError(f"FFmpeg failed ({returncode}): {tail[0]}")
+    return stdout, stderr
+
+
+def run_ffmpeg(args: list, timeout: float = None) -> tuple:
+    """
+    Run FFmpeg as a subprocess with a timeout.
+
+    Stdout and stderr are drained while the process runs, so long renders
+    cannot dead-lock on a full pipe. The process is killed on timeout.
+
+    Args:
+        args: FFmpeg arguments (without the executable)
+        timeout: Seconds before the process is killed
+            (defaults to settings.FFMPEG_TIMEOUT_SECONDS)
+
+    Returns:
+        Tuple of (stdout, stderr) as text
+    """
+    timeout = timeout or getattr(settings, 'FFMPEG_TIMEOUT_SECONDS', 240)
+    try:
+        process = subprocess.Popen(_ffmpeg_command(args), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as e:
+        raise RuntimeError(f"FFmpeg is not available: {e}")
+
+    try:
+        stdout, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.communicate()
+        raise RuntimeError(f"FFmpeg timed out after {timeout} seconds.")
+
+    return _ffmpeg_output(process.returncode, stdout, stderr)
+
+
+async def arun_ffmpeg(args: list, timeout: float = None) -> tuple:
+    """Async version of run_ffmpeg: awaits the subprocess on the event loop."""
+    timeout = timeout or getattr(settings, 'FFMPEG_TIMEOUT_SECONDS', 240)
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *_ffmpeg_command(args), stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+    except OSError as e:
+        raise RuntimeError(f"FFmpeg is not available: {e}")
+
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.communicate()
+        raise RuntimeError(f"FFmpeg timed out after {timeout} seconds.")
+
+    return _ffmpeg_output(process.returncode, stdout, stderr)
+
+
+def parse_ffmpeg_duration(progress: str, stderr: str = '') -> float:
+    """
+    Read the rendered duration from FFmpeg's ``-progress`` output.
+
+    Falls back to the last ``time=`` stat line on stderr.
+    """
+    matches = _OUT_TIME_US.findall(progress)
+    if matches:
+        return int(matches[-1]) / 1_000_000.0
+    for pattern, text in ((_OUT_TIME, progress), (_STDERR_TIME, stderr)):
+        matches = pattern.findall(text)
+        if matches:
+            hours, minutes, seconds = matches[-1]
+            return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    return 0.0
+
+
+def build_master_filtergraph(gains_db: list, target_lufs: float, true_peak_db: float,
+                             sample_rate: int) -> str:
+    """
+    Build the mix -> loudnorm -> limiter filtergraph for N inputs.
+
+    loudnorm upsamples internally, so the graph ends with an explicit
+    resample to the delivery rate.
+    """
+    chains = [f"[{index}:a]volume={gain}dB[a{index}]" for index, gain in enumerate(gains_db)]
+    mix_inputs = ''.join(f"[a{index}]" for index in range(len(gains_db)))
+    limit = round(10 ** (true_peak_db / 20.0), 4)
+    chains.append(
+        f"{mix_inputs}amix=inputs={len(gains_db)}:duration=longest:normalize=0,"
+        f"loudnorm=I={target_lufs}:TP={true_peak_db}:LRA=11,"
+        f"alimiter=limit={limit},"
+        f"aresample={sample_rate}[out]"
+    )
+    return ';'.join(chains)
+
+
+def _master_command(input_paths: list, output_format: str, gains_db: list,
+                    target_lufs: float, true_peak_db: float) -> tuple:
+    """Validate inputs and build (ffmpeg args, output_path) for a master."""
+    output_format = (output_format or 'wav').lower()
+    if output_format not in MASTER_FORMATS:
+        raise RuntimeError(f"Unsupported output format '{output_format}'. Use one of: {', '.join(MASTER_FORMATS)}.")
+    for path in input_paths:
+        if not os.path.exists(path):
+            raise RuntimeError(f"Audio file not found: {os.path.basename(path)}")
+
+    target = MASTER_FORMATS[output_format]
+    gains_db = list(gains_db) if gains_db is not None else [0.0] * len(input_paths)
+    if target_lufs is None:
+        target_lufs = getattr(settings, 'MASTER_TARGET_LUFS', -14.0)
+    if true_peak_db is None:
+        true_peak_db = getattr(settings, 'MASTER_TRUE_PEAK_DB', -1.5)
+
+    output_path = os.path.join(settings.TEMP_AUDIO_DIR, f"mixed_{uuid.uuid4()}.{target['extension']}")
+    args = []
+    for path in input_paths:
+        args += ['-i', path]
+    args += [
+        '-filter_complex', build_master_filtergraph(gains_db, target_lufs, true_peak_db, target['sample_rate']),
+        '-map', '[out]',
+        *target['codec'],
+        '-progress', 'pipe:1', '-nostats',
+        output_path,
+    ]
+    return args, output_path
+
+
+def master_audio_tracks(input_paths: list, output_format: str = 'wav', gains_db: list = None,
+                        target_lufs: float = None, true_peak_db: float = None,
+                        timeout: float = None) -> tuple:
+    """
+    Mix, loudness-normalize (EBU R128), limit and encode in one FFmpeg run.
+
+    Args:
+        input_paths: Paths of the tracks to mix (any format FFmpeg reads)
+        output_format: 'wav', 'mp3' or 'opus'
+        gains_db: Per-track gain in dB applied before mixing
+        target_lufs: Integrated loudness target (settings.MASTER_TARGET_LUFS)
+        true_peak_db: True-peak ceiling in dBTP (settings.MASTER_TRUE_PEAK_DB)
+        timeout: Seconds before FFmpeg is killed
+
+    Returns:
+        Tuple of (output_path, duration_in_seconds)
+    """
+    args, output_path = _master_command(input_paths, output_format, gains_db, target_lufs, true_peak_db)
+    progress, stderr = run_ffmpeg(args, timeout=timeout)
+    return output_path, round(parse_ffmpeg_duration(progress, stderr), 2)
+
+
+async def amaster_audio_tracks(input_paths: list, output_format: str = 'wav', gains_db: list = None,
+                               target_lufs: float = None, true_peak_db: float = None,
+                               timeout: float = None) -> tuple:
+    """Async version of master_audio_tracks (same arguments and result)."""
+    args, output_path = _master_command(input_paths, output_format, gains_db, target_lufs, true_peak_db)
+    progress, stderr = await arun_ffmpeg(args, timeout=timeout)
+    return output_path, round(parse_ffmpeg_duration(progress, stderr), 2)
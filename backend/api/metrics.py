@@ -0,0 +1,228 @@
+"""
+Prometheus metrics for the generation stages and the machinery around them.
+
+Exported at /api/metrics/ (text exposition format):
+
+- ``auralynx_stage_duration_seconds{stage, step}``: whole stages
+  (step="total") and their parts: provider wait, synthesis, WAV write,
+  decode, waveform, and the mix by mode
+- ``auralynx_stage_in_progress{stage}``: renders running now
+- ``auralynx_provider_request_duration_seconds{provider, outcome}``
+- ``auralynx_fallbacks_total{stage, reason}``: template lyrics, synthetic
+  stems, mixer fallbacks
+- ``auralynx_cache_requests_total{cache, result}``: coalescing, variants,
+  song library pages
+- ``auralynx_admission_total{stage, outcome}`` and
+  ``auralynx_admission_wait_seconds{stage}``
+- ``auralynx_admission_running{stage}`` and ``auralynx_admission_queued{stage}``:
+  requests holding a slot and waiting for one now
+- ``auralynx_jobs_total{task, status}``
+- ``auralynx_http_request_duration_seconds{view, method, status}``
+
+Under gunicorn every worker is a separate process. With
+PROMETHEUS_MULTIPROC_DIR set (before the app is imported; gunicorn.conf.py
+clears it at startup and marks exited workers dead), each process writes
+its samples to files there and the endpoint aggregates them, so a scrape
+of any worker sees the whole server.
+
+prometheus_client is optional: without it every function here is a no-op
+and the endpoint answers 503.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import functools
+import os
+import time
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+        generate_latest, multiprocess,
+    )
+    PROMETHEUS_AVAILABLE = True
+except ImportError:
+    PROMETHEUS_AVAILABLE = False
+
+
+# Renders run from tens of milliseconds (lyrics templates) to minutes
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+class _NoopMetric:
+    """Stands in for a metric when prometheus_client is not installed."""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+
+if PROMETHEUS_AVAILABLE:
+    STAGE_SECONDS = Histogram('auralynx_stage_duration_seconds', 'Time spent in a generation stage or step',
+                              ['stage', 'step'], buckets=STAGE_BUCKETS)
+    STAGE_IN_PROGRESS = Gauge('auralynx_stage_in_progress', 'Stage renders running now',
+                              ['stage'], multiprocess_mode='livesum')
+    PROVIDER_SECONDS = Histogram('auralynx_provider_request_duration_seconds', 'External provider calls',
+                                 ['provider', 'outcome'], buckets=STAGE_BUCKETS)
+    FALLBACKS = Counter('auralynx_fallbacks_total', 'Fallbacks taken instead of the preferred path',
+                        ['stage', 'reason'])
+    CACHE_REQUESTS = Counter('auralynx_cache_requests_total', 'Cache lookups by result', ['cache', 'result'])
+    ADMISSIONS = Counter('auralynx_admission_total', 'Admission control decisions', ['stage', 'outcome'])
+    ADMISSION_WAIT = Histogram('auralynx_admission_wait_seconds', 'Queue wait before admission',
+                               ['stage'], buckets=REQUEST_BUCKETS)
+    ADMISSION_RUNNING = Gauge('auralynx_admission_running', 'Requests holding an admission slot',
+                              ['stage'], multiprocess_mode='livesum')
+    ADMISSION_QUEUED = Gauge('auralynx_admission_queued', 'Requests waiting for an admission slot',
+                             ['stage'], multiprocess_mode='livesum')
+    JOBS = Counter('auralynx_jobs_total', 'Background job lifecycle events', ['task', 'status'])
+    HTTP_SECONDS = Histogram('auralynx_http_request_duration_seconds', 'HTTP requests by view',
+                             ['view', 'method', 'status'], buckets=REQUEST_BUCKETS)
+else:
+    STAGE_SECONDS = STAGE_IN_PROGRESS = PROVIDER_SECONDS = FALLBACKS = CACHE_REQUESTS = \
+        ADMISSIONS = ADMISSION_WAIT = ADMISSION_RUNNING = ADMISSION_QUEUED = JOBS = HTTP_SECONDS = _NoopMetric()
+
+
+# Stages being tracked in this context, so a stage that calls another
+# implementation of itself (async -> sync fallback) is counted once
+_active_stages = contextvars.ContextVar('auralynx_active_stages', default=frozenset())
+
+
+@contextlib.contextmanager
+def track_stage(stage: str):
+    """Time a whole stage (step="total") and count it as in progress."""
+    active = _active_stages.get()
+    if stage in active:
+        yield
+        return
+    token = _active_stages.set(active | {stage})
+    STAGE_IN_PROGRESS.labels(stage).inc()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage, 'total').observe(time.perf_counter() - started)
+        STAGE_IN_PROGRESS.labels(stage).dec()
+        _active_stages.reset(token)
+
+
+def staged(stage: str):
+    """Decorator form of track_stage for sync and async functions."""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with track_stage(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with track_stage(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observe_step(stage: str, step: str, seconds: float):
+    STAGE_SECONDS.labels(stage, step).observe(seconds)
+
+
+@contextlib.contextmanager
+def timed_step(stage: str, step: str):
+    """Time one step of a stage (recorded whether or not it raises)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_step(stage, step, time.perf_counter() - started)
+
+
+class ProviderCall:
+    """Outcome of a provider call: ok, http_<status> or error."""
+
+    def __init__(self):
+        self.outcome = 'ok'
+
+    def status(self, status_code: int):
+        self.outcome = 'ok' if 200 <= status_code < 300 else f'http_{status_code}'
+
+
+@contextlib.contextmanager
+def provider_call(provider: str, stage: str):
+    """
+    Time a request to an external provider, also as the stage's
+    "provider" step.
+
+        with provider_call('mubert', 'instrumental') as call:
+            response = requests.post(...)
+            call.status(response.status_code)
+    """
+    call = ProviderCall()
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        call.outcome = 'error'
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        PROVIDER_SECONDS.labels(provider, call.outcome).observe(elapsed)
+        observe_step(stage, 'provider', elapsed)
+
+
+def count_fallback(stage: str, reason: str):
+    FALLBACKS.labels(stage, reason).inc()
+
+
+def count_cache(cache: str, result: str):
+    CACHE_REQUESTS.labels(cache, result).inc()
+
+
+def observe_admission(stage: str, outcome: str, wait_seconds: float = None):
+    ADMISSIONS.labels(stage, outcome).inc()
+    if wait_seconds is not None:
+        ADMISSION_WAIT.labels(stage).observe(wait_seconds)
+
+
+def track_admission(stage: str, running: int = 0, queued: int = 0):
+    """Move a stage's running/queued gauges (+1 on entry, -1 on exit)."""
+    if running:
+        ADMISSION_RUNNING.labels(stage).inc(running)
+    if queued:
+        ADMISSION_QUEUED.labels(stage).inc(queued)
+
+
+def count_job(task: str, status: str):
+    JOBS.labels(task, status).inc()
+
+
+def observe_request(view: str, method: str, status: int, seconds: float):
+    HTTP_SECONDS.labels(view, method, str(status)).observe(seconds)
+
+
+def render_metrics() -> tuple:
+    """
+    (body, content type) in the Prometheus text format, aggregated over
+    every worker process in multiprocess mode.
+
+    Raises:
+        RuntimeError: prometheus_client is not installed
+    """
+    if not PROMETHEUS_AVAILABLE:
+        raise RuntimeError("prometheus_client is not installed")
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
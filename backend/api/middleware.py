@@ -0,0 +1,158 @@
+"""
+Request middleware: request IDs, per-view latency metrics and opt-in
+profiling of single requests.
+"""
+
+import logging
+import random
+import re
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.crypto import constant_time_compare
+
+from . import profiling
+from .log import reset_request_id, set_request_id
+from .metrics import observe_request
+
+logger = logging.getLogger(__name__)
+
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+# IDs accepted from the client or proxy; anything else is replaced
+_VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+class RequestIDMiddleware:
+    """
+    Give every request an ID and time it.
+
+    The ID comes from X-Request-ID when the client or nginx sent a sane one
+    ($request_id in nginx.conf), otherwise a new UUID. It is stored for
+    log records (api.log), set on ``request.request_id`` and echoed in the
+    response header. Latency is recorded per URL name
+    (auralynx_http_request_duration_seconds).
+
+    Works under WSGI and ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started, token = self._begin(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            reset_request_id(token)
+        return self._finish(request, response, started)
+
+    async def __acall__(self, request):
+        started, token = self._begin(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            reset_request_id(token)
+        return self._finish(request, response, started)
+
+    def _begin(self, request) -> tuple:
+        incoming = request.META.get('HTTP_X_REQUEST_ID', '')
+        request.request_id = incoming if _VALID_REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        return time.perf_counter(), set_request_id(request.request_id)
+
+    def _finish(self, request, response, started: float):
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match and match.url_name else 'unmatched'
+        # Streaming responses are timed to the first byte
+        observe_request(view, request.method, response.status_code, time.perf_counter() - started)
+        response[REQUEST_ID_HEADER] = request.request_id
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profile a single request (see api.profiling) and return the artifact
+    id in X-Profile-Id.
+
+    A request is profiled when it carries ``X-Profile: <PROFILING_TOKEN>``
+    or is picked at PROFILING_SAMPLE_RATE. ``X-Profile-Mode: cprofile``
+    selects cProfile instead of the stack sampler (PROFILING_MODE is the
+    default). With neither a token nor a sample rate configured Django
+    drops the middleware at startup, so it costs nothing.
+
+    The profile covers the view, not the streaming of a response body.
+    Under ASGI, cProfile also sees other requests on the event loop.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.token = getattr(settings, 'PROFILING_TOKEN', '')
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        if not self.token and self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile = self._begin(request)
+        if profile is None:
+            return self.get_response(request)
+        response = None
+        try:
+            response = self.get_response(request)
+        finally:
+            self._finish(request, response, profile)
+        return response
+
+    async def __acall__(self, request):
+        profile = self._begin(request)
+        if profile is None:
+            return await self.get_response(request)
+        response = None
+        try:
+            response = await self.get_response(request)
+        finally:
+            self._finish(request, response, profile)
+        return response
+
+    def _begin(self, request):
+        header = request.headers.get('X-Profile', '')
+        if header and self.token and constant_time_compare(header, self.token):
+            mode = request.headers.get('X-Profile-Mode') or getattr(settings, 'PROFILING_MODE', 'sample')
+        elif self.sample_rate > 0 and random.random() < self.sample_rate:
+            mode = getattr(settings, 'PROFILING_MODE', 'sample')
+        else:
+            return None
+        return profiling.try_begin(mode)
+
+    def _finish(self, request, response, profile):
+        match = getattr(request, 'resolver_match', None)
+        meta = {
+            'request_id': getattr(request, 'request_id', None),
+            'method': request.method,
+            'path': request.path,
+            'view': match.url_name if match else None,
+            'status': response.status_code if response is not None else None,
+        }
+        try:
+            profile_id = profiling.end(profile, meta)
+        except OSError as e:
+            logger.warning("Could not write request profile: %s", e)
+            return
+        if response is not None:
+            response['X-Profile-Id'] = profile_id
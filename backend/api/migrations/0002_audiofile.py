@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-19 09:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AudioFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('pinned', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_accessed_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='audiofile',
+            index=models.Index(fields=['pinned', 'last_accessed_at'], name='api_audiofi_pinned_ea5bf9_idx'),
+        ),
+    ]
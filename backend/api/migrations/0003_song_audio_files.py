@@ -0,0 +1,58 @@
+# Generated by Django 4.2 on 2026-10-19 09:23
+
+import os
+
+from django.db import migrations, models
+
+
+BATCH_SIZE = 500
+FILE_FIELDS = (
+    ('instrumental_url', 'instrumental_file'),
+    ('vocals_url', 'vocals_file'),
+    ('mix_url', 'mix_file'),
+)
+
+
+def fill_audio_file_names(apps, schema_editor):
+    """Derive the new columns for existing songs (as Song.sync_audio_files does)."""
+    Song = apps.get_model('api', 'Song')
+    songs = Song.objects.using(schema_editor.connection.alias).exclude(
+        instrumental_url='', vocals_url='', mix_url=''
+    ).only(*(field for pair in FILE_FIELDS for field in pair))
+    batch = []
+    for song in songs.iterator(chunk_size=BATCH_SIZE):
+        for url_field, file_field in FILE_FIELDS:
+            url = getattr(song, url_field)
+            setattr(song, file_field, os.path.basename(url.split('?', 1)[0].rstrip('/')) if url else '')
+        batch.append(song)
+        if len(batch) == BATCH_SIZE:
+            Song.objects.using(schema_editor.connection.alias).bulk_update(batch, [f for _, f in FILE_FIELDS])
+            batch = []
+    if batch:
+        Song.objects.using(schema_editor.connection.alias).bulk_update(batch, [f for _, f in FILE_FIELDS])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_audiofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='song',
+            name='instrumental_file',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='song',
+            name='mix_file',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='song',
+            name='vocals_file',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=255),
+        ),
+        migrations.RunPython(fill_audio_file_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2 on 2026-10-19 09:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_song_audio_files'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='song',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='song',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='song_user_created_idx'),
+        ),
+    ]
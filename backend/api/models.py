@@ -2,6 +2,14 @@ from django.conf import settings
 from django.db import models
 
 
+# Song URL fields and the indexed file-name columns derived from them
+AUDIO_FILE_FIELDS = (
+    ("instrumental_url", "instrumental_file"),
+    ("vocals_url", "vocals_file"),
+    ("mix_url", "mix_file"),
+)
+
+
 class Song(models.Model):
     """
     Generated song with metadata and links to audio assets.
@@ -25,15 +33,62 @@ class Song(models.Model):
     vocals_url = models.URLField(max_length=500, blank=True)
     mix_url = models.URLField(max_length=500, blank=True)
 
+    # File names in TEMP_AUDIO_DIR behind the URLs above, kept in sync by
+    # save() (and sync_audio_files() before bulk_create), so the
+    # temp-audio pins can be looked up by exact match (api.signals)
+    instrumental_file = models.CharField(max_length=255, blank=True, db_index=True, editable=False)
+    vocals_file = models.CharField(max_length=255, blank=True, db_index=True, editable=False)
+    mix_file = models.CharField(max_length=255, blank=True, db_index=True, editable=False)
+
     duration_seconds = models.PositiveIntegerField(null=True, blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ["-created_at"]
+        ordering = ["-created_at", "-id"]
+        # Serves the per-user listing (api.pagination.SongCursorPagination)
+        indexes = [models.Index(fields=["user", "-created_at", "-id"], name="song_user_created_idx")]
 
     def __str__(self) -> str:
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.sync_audio_files()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, *(
+                file_field for url_field, file_field in AUDIO_FILE_FIELDS if url_field in update_fields
+            )}
+        super().save(*args, **kwargs)
+
+    def sync_audio_files(self):
+        """Derive the *_file columns from the audio URLs."""
+        from .temp_audio import audio_file_name
+
+        for url_field, file_field in AUDIO_FILE_FIELDS:
+            url = getattr(self, url_field)
+            setattr(self, file_field, audio_file_name(url) if url else "")
+
+
+class AudioFile(models.Model):
+    """
+    Index entry for a generated file in TEMP_AUDIO_DIR.
+
+    Tracks size and last access so the lifecycle sweeper (api.temp_audio)
+    can expire and evict files without walking the directory. Files
+    referenced by a Song are pinned and never removed.
+    """
+
+    name = models.CharField(max_length=255, unique=True)
+    size_bytes = models.BigIntegerField(default=0)
+    pinned = models.BooleanField(default=False)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_accessed_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["pinned", "last_accessed_at"])]
 
+    def __str__(self) -> str:
+        return self.name
@@ -0,0 +1,16 @@
+"""
+Pagination for song listings.
+
+Cursor pagination keeps pages stable while songs are added and reads each
+page with an index range scan on Song(user, -created_at, -id) instead of
+an OFFSET that grows with the library.
+"""
+
+from rest_framework.pagination import CursorPagination
+
+
+class SongCursorPagination(CursorPagination):
+    # Newest first; id breaks ties between songs saved in the same instant
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,226 @@
+"""
+Server-side song generation as a dependency graph of stages.
+
+Each stage runs as soon as the stages it depends on have finished, so
+independent stages run concurrently:
+
+    lyrics ──┬── instrumental ──┬── mix
+             └── vocals ────────┘
+
+End-to-end latency is lyrics + max(instrumental, vocals) + mix instead of
+the sum of all four. Stems are handed to the mixer in memory.
+"""
+
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from .metrics import staged
+from .models import Song
+from .progress import NULL_PROGRESS
+from .temp_audio import public_audio_url
+from .variants import schedule_variants
+from .utils import (
+    generate_song_lyrics,
+    generate_music_track,
+    generate_singing_vocals,
+    mix_audio_tracks,
+    _persist_stem,
+)
+
+
+# How often should_cancel is polled while stages are running
+CANCEL_POLL_SECONDS = 0.5
+
+
+class StageGraphCancelled(Exception):
+    """Raised when a stage graph is cancelled."""
+
+
+class Stage:
+    """
+    A pipeline stage: a callable plus the names of the stages it needs.
+
+    The callable receives a dict mapping each dependency name to that
+    stage's result.
+    """
+
+    def __init__(self, name: str, func, depends_on: tuple = ()):
+        self.name = name
+        self.func = func
+        self.depends_on = tuple(depends_on)
+
+
+def run_stage_graph(stages: list, max_workers: int = None, should_cancel=None) -> tuple:
+    """
+    Run stages in dependency order, starting each one as soon as it can.
+
+    Args:
+        stages: List of Stage objects (dependencies must be in the list)
+        max_workers: Thread pool size (defaults to the number of stages)
+        should_cancel: Optional callable checked before each stage starts
+            and every CANCEL_POLL_SECONDS while stages run; when it returns
+            True no further stages are started
+
+    Returns:
+        Tuple of (results, timings): dicts keyed by stage name, timings in
+        seconds
+
+    Raises:
+        RuntimeError: If a stage fails; stages not yet started are skipped
+        StageGraphCancelled: If should_cancel() returned True
+
+    On failure or cancellation the graph returns at once: stages that are
+    still running cannot be interrupted, so they finish in the background
+    and their results are discarded.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        missing = [dep for dep in stage.depends_on if dep not in by_name]
+        if missing:
+            raise RuntimeError(f"Stage '{stage.name}' depends on unknown stage(s): {', '.join(missing)}")
+
+    results, timings = {}, {}
+    pending = list(stages)
+    running = {}
+
+    def timed(stage, inputs):
+        start = time.perf_counter()
+        try:
+            return stage.func(inputs)
+        finally:
+            timings[stage.name] = round(time.perf_counter() - start, 3)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers or len(stages))
+    try:
+        while pending or running:
+            ready = [stage for stage in pending if all(dep in results for dep in stage.depends_on)]
+            if ready and should_cancel is not None and should_cancel():
+                raise StageGraphCancelled("Pipeline cancelled before stage(s): "
+                                          + ', '.join(stage.name for stage in ready))
+            for stage in ready:
+                pending.remove(stage)
+                inputs = {dep: results[dep] for dep in stage.depends_on}
+                # Each stage runs in a copy of the caller's context (request ID, metrics)
+                running[executor.submit(contextvars.copy_context().run, timed, stage, inputs)] = stage
+
+            if not running:
+                names = ', '.join(stage.name for stage in pending)
+                raise RuntimeError(f"Stage graph has a dependency cycle: {names}")
+
+            done, _ = wait(running, timeout=CANCEL_POLL_SECONDS if should_cancel else None,
+                           return_when=FIRST_COMPLETED)
+            if not done and should_cancel():
+                raise StageGraphCancelled("Pipeline cancelled during stage(s): "
+                                          + ', '.join(stage.name for stage in running.values()))
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    results[stage.name] = future.result()
+                except Exception as e:
+                    raise RuntimeError(f"{stage.name} stage failed: {str(e)}") from e
+    except BaseException:
+        # Do not wait for stages still running (a render can take minutes)
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+
+    return results, timings
+
+
+def build_song_stages(input_text: str = '', genre: str = 'pop', lyrics: str = None,
+                      keep_stems: bool = False, progress=None) -> list:
+    """
+    Build the lyrics -> (instrumental | vocals) -> mix stage graph.
+
+    When lyrics are supplied the lyrics stage just passes them through.
+    """
+    progress = progress or NULL_PROGRESS
+
+    def lyrics_stage(_):
+        progress.stage_started('lyrics')
+        result = lyrics if lyrics else generate_song_lyrics(input_text, genre)
+        progress.stage_finished('lyrics')
+        return result
+
+    def instrumental_stage(inputs):
+        audio, _ = generate_music_track(inputs['lyrics'], genre, in_memory=True, progress=progress)
+        return audio
+
+    def vocals_stage(inputs):
+        audio, _ = generate_singing_vocals(inputs['lyrics'], genre, in_memory=True, progress=progress)
+        return audio
+
+    def mix_stage(inputs):
+        mix_path, duration = mix_audio_tracks(inputs['instrumental'], inputs['vocals'], genre, progress=progress)
+        return {
+            'mix_path': mix_path,
+            'duration': duration,
+            'instrumental_path': _persist_stem(inputs['instrumental'], 'instrumental') if keep_stems else None,
+            'vocals_path': _persist_stem(inputs['vocals'], 'vocals') if keep_stems else None,
+        }
+
+    return [
+        Stage('lyrics', lyrics_stage),
+        Stage('instrumental', instrumental_stage, depends_on=('lyrics',)),
+        Stage('vocals', vocals_stage, depends_on=('lyrics',)),
+        Stage('mix', mix_stage, depends_on=('instrumental', 'vocals')),
+    ]
+
+
+@staged('song')
+def run_song_pipeline(input_text: str = '', genre: str = 'pop', lyrics: str = None,
+                      keep_stems: bool = False, should_cancel=None, progress=None) -> dict:
+    """
+    Generate a full song server-side.
+
+    should_cancel is polled between and during stages (see
+    run_stage_graph); progress receives every stage's events.
+
+    Returns:
+        Dict with lyrics, mix_path, duration, instrumental_path,
+        vocals_path and timings (per stage plus 'total', in seconds)
+    """
+    start = time.perf_counter()
+    stages = build_song_stages(input_text, genre, lyrics, keep_stems, progress=progress)
+    results, timings = run_stage_graph(stages, should_cancel=should_cancel)
+    timings['total'] = round(time.perf_counter() - start, 3)
+
+    output = dict(results['mix'])
+    output['lyrics'] = results['lyrics']
+    output['timings'] = timings
+    return output
+
+
+def save_generated_song(result: dict, user=None, genre: str = 'pop', title: str = '',
+                        build_url=None) -> Song:
+    """
+    Persist a pipeline result as a Song.
+
+    Args:
+        result: Output of run_song_pipeline
+        user: Owner (anonymous users are stored as no owner)
+        genre: Music genre
+        title: Song title (defaults to the first lyric line)
+        build_url: Callable turning a relative URL into an absolute one,
+            e.g. request.build_absolute_uri
+    """
+    def audio_url(path):
+        if not path:
+            return ''
+        url = public_audio_url(path)
+        return build_url(url) if build_url else url
+
+    title = title or result['lyrics'].strip().split('\n')[0]
+    mix_url = audio_url(result['mix_path'])
+    schedule_variants(mix_url)
+    return Song.objects.create(
+        user=user if user is not None and user.is_authenticated else None,
+        title=title[:255],
+        genre=genre,
+        lyrics=result['lyrics'],
+        instrumental_url=audio_url(result['instrumental_path']),
+        vocals_url=audio_url(result['vocals_path']),
+        mix_url=mix_url,
+        duration_seconds=int(round(result['duration'])),
+    )
@@ -0,0 +1,202 @@
+"""
+Per-request profiling, switched on for single requests (ProfilingMiddleware).
+
+Two profilers:
+
+- ``sample`` (default): a thread records the stacks of every thread each
+  PROFILING_SAMPLE_INTERVAL_MS, so pipeline stages and CPU-pool work are
+  included. Written as collapsed stacks (``stacks.collapsed``, one
+  ``frame;frame;frame count`` line per stack) for flamegraph.pl,
+  speedscope or inferno.
+- ``cprofile``: deterministic cProfile of the request thread only, written
+  as ``profile.prof`` (pstats, e.g. for snakeviz) and a text summary.
+
+Both also trace allocations with tracemalloc: the peak during the request,
+and the top allocation sites still live when it ends (``memory.txt``, plus
+``memory.snapshot`` for ``tracemalloc.Snapshot.load``).
+
+Each profile is a directory ``<PROFILING_DIR>/<profile id>/`` with a
+``meta.json``. Only the newest PROFILING_MAX_ARTIFACTS are kept. Profiling
+is global to the process (stack sampling, tracemalloc), so only one request
+per worker is profiled at a time; others run normally.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import shutil
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+
+from django.conf import settings
+
+
+MODES = ('sample', 'cprofile')
+TRACEMALLOC_FRAMES = 25
+TOP_ALLOCATIONS = 50
+
+# One profiled request per process at a time
+_busy = threading.Lock()
+
+
+def profiles_dir() -> str:
+    return str(getattr(settings, 'PROFILING_DIR', settings.BASE_DIR / 'profiles'))
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    base = str(settings.BASE_DIR)
+    if filename.startswith(base):
+        filename = os.path.relpath(filename, base)
+    else:
+        # Library frames: keep the package-relative part of site-packages paths
+        marker = f'site-packages{os.sep}'
+        filename = filename.split(marker, 1)[-1]
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(';', ':')
+
+
+class StackSampler:
+    """Collapsed stacks of every thread, sampled from a background thread."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            if len(names) != threading.active_count():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f'thread-{ident}').replace(';', ':'))
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def collapsed(self) -> str:
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfile:
+    """
+    Profile one request: ``start()`` before the view, ``finish()`` after.
+
+    finish() writes the artifacts and returns the profile id.
+    """
+
+    def __init__(self, mode: str):
+        self.mode = mode if mode in MODES else 'sample'
+        self.id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self._own_tracemalloc = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._own_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._started = time.perf_counter()
+        if self.mode == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        else:
+            interval = getattr(settings, 'PROFILING_SAMPLE_INTERVAL_MS', 5) / 1000
+            self._profiler = StackSampler(interval)
+            self._profiler.start()
+
+    def finish(self, meta: dict) -> str:
+        if self.mode == 'cprofile':
+            self._profiler.disable()
+        else:
+            self._profiler.stop()
+        wall = time.perf_counter() - self._started
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+        if self._own_tracemalloc:
+            tracemalloc.stop()
+
+        directory = os.path.join(profiles_dir(), self.id)
+        os.makedirs(directory, exist_ok=True)
+        if self.mode == 'cprofile':
+            self._profiler.dump_stats(os.path.join(directory, 'profile.prof'))
+            summary = io.StringIO()
+            pstats.Stats(self._profiler, stream=summary).sort_stats('cumulative').print_stats(60)
+            _write(directory, 'profile.txt', summary.getvalue())
+        else:
+            _write(directory, 'stacks.collapsed', self._profiler.collapsed())
+        snapshot.dump(os.path.join(directory, 'memory.snapshot'))
+        top = snapshot.statistics('lineno')[:TOP_ALLOCATIONS]
+        _write(directory, 'memory.txt', ''.join(f"{stat}\n" for stat in top))
+
+        _write(directory, 'meta.json', json.dumps({
+            **meta,
+            'profile_id': self.id,
+            'mode': self.mode,
+            'wall_seconds': round(wall, 6),
+            'samples': getattr(self._profiler, 'samples', None),
+            'memory_peak_bytes': peak,
+            'memory_end_bytes': current,
+        }, indent=2))
+        prune()
+        return self.id
+
+
+def _write(directory: str, name: str, content: str):
+    with open(os.path.join(directory, name), 'w') as f:
+        f.write(content)
+
+
+def try_begin(mode: str):
+    """A started RequestProfile, or None when another request is being profiled."""
+    if not _busy.acquire(blocking=False):
+        return None
+    try:
+        profile = RequestProfile(mode)
+        profile.start()
+    except Exception:
+        _busy.release()
+        raise
+    return profile
+
+
+def end(profile: RequestProfile, meta: dict) -> str:
+    try:
+        return profile.finish(meta)
+    finally:
+        _busy.release()
+
+
+def prune(keep: int = None):
+    """Delete the oldest profiles beyond PROFILING_MAX_ARTIFACTS."""
+    keep = keep if keep is not None else getattr(settings, 'PROFILING_MAX_ARTIFACTS', 50)
+    try:
+        entries = [entry for entry in os.scandir(profiles_dir()) if entry.is_dir()]
+    except FileNotFoundError:
+        return
+    entries.sort(key=lambda entry: entry.name, reverse=True)
+    for entry in entries[keep:]:
+        shutil.rmtree(entry.path, ignore_errors=True)
@@ -0,0 +1,376 @@
+"""
+Progress events for generation stages.
+
+Stages publish events (stage start/finish, percent rendered, provider
+waits) to a channel; clients follow the channel over Server-Sent Events
+instead of polling. The channel is a client-chosen ``progress_id`` for the
+stage endpoints, or the job ID for background jobs.
+
+Two pub/sub backends:
+- InProcessBroker: subscribers in the same process (dev, tests)
+- RedisBroker: Redis pub/sub, so any web worker can serve the stream
+  (used in docker-compose)
+
+Each channel keeps a short history so a client that subscribes late
+still sees events published before it connected. Histories expire after
+PROGRESS_TTL_SECONDS; the in-process broker also drops them shortly after
+the channel's terminal event.
+
+Under ASGI the stream is an async generator (sse_events); sync WSGI workers
+get a blocking generator (sse_events_sync) instead, since Django collects
+async iterators into a list before sending anything under WSGI. Sync
+streams end before the worker timeout; events carry IDs, so the client's
+automatic reconnect (Last-Event-ID) resumes without repeats.
+"""
+
+import asyncio
+import json
+import logging
+import queue
+import re
+import threading
+import time
+import uuid
+from collections import deque
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis
+    import redis.asyncio as redis_async
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+# Event types
+STAGE_STARTED = 'stage_started'
+STAGE_FINISHED = 'stage_finished'
+PROGRESS = 'progress'
+PROVIDER_WAIT = 'provider_wait'
+DONE = 'done'
+ERROR = 'error'
+TERMINAL_EVENTS = (DONE, ERROR)
+
+# How long a channel's history outlives its terminal event (in-process broker)
+TERMINAL_HISTORY_SECONDS = 60
+
+_CHANNEL_ID = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+
+def is_valid_channel(channel: str) -> bool:
+    return bool(channel) and bool(_CHANNEL_ID.match(channel))
+
+
+def _history_after(history: list, last_event_id: str = None) -> list:
+    """History past a reconnecting client's Last-Event-ID (all of it if unknown)."""
+    if last_event_id:
+        for index, event in enumerate(history):
+            if event.get('id') == last_event_id:
+                return history[index + 1:]
+    return history
+
+
+class InProcessBroker:
+    """Pub/sub between threads of one process, bridged onto asyncio loops."""
+
+    def __init__(self, history: int = None, ttl: int = None):
+        self._history_size = history or getattr(settings, 'PROGRESS_HISTORY', 50)
+        self._ttl = ttl or getattr(settings, 'PROGRESS_TTL_SECONDS', 3600)
+        self._history = {}
+        # Monotonic time after which a channel's history is dropped
+        self._expires = {}
+        self._next_sweep = 0.0
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, channel: str, event: dict):
+        now = time.monotonic()
+        with self._lock:
+            self._history.setdefault(channel, deque(maxlen=self._history_size)).append(event)
+            ttl = self._ttl
+            if event.get('type') in TERMINAL_EVENTS:
+                ttl = min(ttl, TERMINAL_HISTORY_SECONDS)
+            self._expires[channel] = now + ttl
+            if now >= self._next_sweep:
+                self._sweep(now)
+            subscribers = list(self._subscribers.get(channel, ()))
+        for deliver in subscribers:
+            deliver(event)
+
+    def _sweep(self, now: float):
+        """Drop expired histories (caller holds the lock)."""
+        for channel in [channel for channel, expires in self._expires.items() if expires <= now]:
+            del self._expires[channel]
+            self._history.pop(channel, None)
+        self._next_sweep = now + min(self._ttl, TERMINAL_HISTORY_SECONDS)
+
+    def _attach(self, channel: str, deliver) -> list:
+        """Register a subscriber; returns the channel's unexpired history."""
+        with self._lock:
+            history = []
+            if self._expires.get(channel, 0) > time.monotonic():
+                history = list(self._history.get(channel, ()))
+            self._subscribers.setdefault(channel, []).append(deliver)
+        return history
+
+    def _detach(self, channel: str, deliver):
+        with self._lock:
+            self._subscribers.get(channel, []).remove(deliver)
+            if not self._subscribers.get(channel):
+                self._subscribers.pop(channel, None)
+
+    async def subscribe(self, channel: str, timeout: float, last_event_id: str = None):
+        """
+        Yield past and new events; yields None when ``timeout`` passes idle.
+
+        Past events up to ``last_event_id`` (a reconnecting client's) are skipped.
+        """
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+
+        def deliver(event):
+            loop.call_soon_threadsafe(events.put_nowait, event)
+
+        history = _history_after(self._attach(channel, deliver), last_event_id)
+        try:
+            for event in history:
+                yield event
+            while True:
+                try:
+                    yield await asyncio.wait_for(events.get(), timeout)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self._detach(channel, deliver)
+
+    def subscribe_sync(self, channel: str, timeout: float, last_event_id: str = None):
+        """Blocking version of subscribe, for WSGI workers."""
+        events = queue.Queue()
+        history = _history_after(self._attach(channel, events.put), last_event_id)
+        try:
+            yield from history
+            while True:
+                try:
+                    yield events.get(timeout=timeout)
+                except queue.Empty:
+                    yield None
+        finally:
+            self._detach(channel, events.put)
+
+
+class RedisBroker:
+    """Redis pub/sub with a capped per-channel history list."""
+
+    def __init__(self, url: str = None, prefix: str = None, history: int = None, ttl: int = None):
+        if not REDIS_AVAILABLE:
+            raise RuntimeError("redis library not available. Install it or set PROGRESS_BACKEND=inprocess.")
+        self._url = url or settings.REDIS_URL
+        self._prefix = prefix or getattr(settings, 'PROGRESS_REDIS_PREFIX', 'auralynx:progress')
+        self._history_size = history or getattr(settings, 'PROGRESS_HISTORY', 50)
+        self._ttl = ttl or getattr(settings, 'PROGRESS_TTL_SECONDS', 3600)
+        self._redis = redis.Redis.from_url(self._url, decode_responses=True)
+
+    def _key(self, channel: str, kind: str) -> str:
+        return f"{self._prefix}:{channel}:{kind}"
+
+    def publish(self, channel: str, event: dict):
+        data = json.dumps(event)
+        history = self._key(channel, 'history')
+        pipe = self._redis.pipeline()
+        pipe.rpush(history, data)
+        pipe.ltrim(history, -self._history_size, -1)
+        pipe.expire(history, self._ttl)
+        pipe.publish(self._key(channel, 'events'), data)
+        pipe.execute()
+
+    async def subscribe(self, channel: str, timeout: float, last_event_id: str = None):
+        client = redis_async.Redis.from_url(self._url, decode_responses=True)
+        pubsub = client.pubsub()
+        try:
+            # Subscribe before reading history so nothing falls in between
+            await pubsub.subscribe(self._key(channel, 'events'))
+            history = [json.loads(data) for data in await client.lrange(self._key(channel, 'history'), 0, -1)]
+            for event in _history_after(history, last_event_id):
+                yield event
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+                yield json.loads(message['data']) if message else None
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+    def subscribe_sync(self, channel: str, timeout: float, last_event_id: str = None):
+        """Blocking version of subscribe, for WSGI workers."""
+        pubsub = self._redis.pubsub()
+        try:
+            pubsub.subscribe(self._key(channel, 'events'))
+            history = [json.loads(data) for data in self._redis.lrange(self._key(channel, 'history'), 0, -1)]
+            yield from _history_after(history, last_event_id)
+            while True:
+                message = pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+                yield json.loads(message['data']) if message else None
+        finally:
+            pubsub.close()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Return the process-wide broker for settings.PROGRESS_BACKEND."""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            backend = getattr(settings, 'PROGRESS_BACKEND', 'inprocess').lower()
+            if backend == 'redis':
+                _broker = RedisBroker()
+            elif backend == 'inprocess':
+                _broker = InProcessBroker()
+            else:
+                raise RuntimeError(f"Unknown PROGRESS_BACKEND '{backend}'. Use 'inprocess' or 'redis'.")
+        return _broker
+
+
+class ProgressReporter:
+    """
+    Publishes progress events for one channel.
+
+    Stage functions accept ``progress=None``; passing a reporter makes them
+    report. A failing broker never breaks generation.
+    """
+
+    def __init__(self, channel: str, broker=None):
+        self.channel = channel
+        self._broker = broker or get_broker()
+
+    def emit(self, event_type: str, **data):
+        event = {'id': uuid.uuid4().hex[:16], 'type': event_type, 'ts': round(time.time(), 3)}
+        event.update(data)
+        try:
+            self._broker.publish(self.channel, event)
+        except Exception as e:
+            logger.warning("Progress publish failed: %s", e)
+
+    def stage_started(self, stage: str, **data):
+        self.emit(STAGE_STARTED, stage=stage, **data)
+
+    def stage_finished(self, stage: str, **data):
+        self.emit(STAGE_FINISHED, stage=stage, **data)
+
+    def percent(self, stage: str, value: float):
+        self.emit(PROGRESS, stage=stage, percent=round(max(0.0, min(100.0, value)), 1))
+
+    def provider_wait(self, stage: str, provider: str):
+        self.emit(PROVIDER_WAIT, stage=stage, provider=provider)
+
+    def done(self, **data):
+        self.emit(DONE, **data)
+
+    def error(self, message: str):
+        self.emit(ERROR, error=message)
+
+
+class NullProgress(ProgressReporter):
+    """Reporter that drops every event (the default for stage functions)."""
+
+    def __init__(self):
+        self.channel = None
+
+    def emit(self, event_type: str, **data):
+        pass
+
+
+NULL_PROGRESS = NullProgress()
+
+
+def get_progress_reporter(channel: str):
+    """Reporter for a client-supplied channel, or NULL_PROGRESS if none/invalid."""
+    if not is_valid_channel(channel):
+        return NULL_PROGRESS
+    return ProgressReporter(channel)
+
+
+SSE_PREAMBLE = 'retry: 3000\n\n'
+# A sync stream ends this long before the worker timeout (the client
+# reconnects with Last-Event-ID and picks up where it left off)
+WORKER_TIMEOUT_MARGIN_SECONDS = 30
+
+
+def _stream_limits(timeout: float, heartbeat: float) -> tuple:
+    """(deadline, heartbeat) for a stream, from the arguments or settings."""
+    timeout = timeout or getattr(settings, 'PROGRESS_STREAM_TIMEOUT_SECONDS', 600)
+    heartbeat = heartbeat or getattr(settings, 'PROGRESS_HEARTBEAT_SECONDS', 15)
+    return time.monotonic() + timeout, heartbeat
+
+
+def sync_stream_timeout() -> float:
+    """
+    PROGRESS_STREAM_TIMEOUT_SECONDS capped below the WSGI worker timeout.
+
+    A sync worker busy with one request for longer than gunicorn's timeout
+    is killed by the master, mid-stream.
+    """
+    timeout = getattr(settings, 'PROGRESS_STREAM_TIMEOUT_SECONDS', 600)
+    worker_timeout = getattr(settings, 'WORKER_TIMEOUT_SECONDS', 300)
+    if worker_timeout:
+        timeout = min(timeout, max(worker_timeout - WORKER_TIMEOUT_MARGIN_SECONDS, 1))
+    return timeout
+
+
+def _sse_frame(event: dict) -> str:
+    """An event, or a comment line as heartbeat for None."""
+    if event is None:
+        return ': keep-alive\n\n'
+    event_id = f"id: {event['id']}\n" if event.get('id') else ''
+    return f"{event_id}event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+def _stream_ends(event: dict, deadline: float) -> bool:
+    return (event is not None and event['type'] in TERMINAL_EVENTS) or time.monotonic() >= deadline
+
+
+async def sse_events(channel: str, timeout: float = None, heartbeat: float = None,
+                     last_event_id: str = None):
+    """
+    Encode a channel as a Server-Sent Events stream.
+
+    Sends a comment line as heartbeat while idle and ends after a terminal
+    event or after ``timeout`` seconds. Events carry IDs, so a client that
+    reconnects with Last-Event-ID only gets what it missed.
+    """
+    deadline, heartbeat = _stream_limits(timeout, heartbeat)
+    yield SSE_PREAMBLE
+    events = get_broker().subscribe(channel, heartbeat, last_event_id)
+    try:
+        async for event in events:
+            yield _sse_frame(event)
+            if _stream_ends(event, deadline):
+                break
+    finally:
+        # Unsubscribe right away rather than when the generator is collected
+        await events.aclose()
+
+
+def sse_events_sync(channel: str, timeout: float = None, heartbeat: float = None,
+                    last_event_id: str = None):
+    """
+    Blocking version of sse_events for sync WSGI workers.
+
+    The worker is held for the whole stream, so deployments with many
+    concurrent streams should serve the API under ASGI. The stream ends
+    before the worker timeout (sync_stream_timeout) and the client resumes.
+    """
+    deadline, heartbeat = _stream_limits(timeout or sync_stream_timeout(), heartbeat)
+    yield SSE_PREAMBLE
+    events = get_broker().subscribe_sync(channel, heartbeat, last_event_id)
+    try:
+        for event in events:
+            yield _sse_frame(event)
+            if _stream_ends(event, deadline):
+                break
+    finally:
+        events.close()
@@ -0,0 +1,173 @@
+"""
+Priority scheduling for heavy work.
+
+Interactive and heavy requests are served by separate lanes: nginx sends
+transcription, generation and mixing to the ``backend-heavy`` service and
+everything else (health, auth, songs, jobs, progress) to ``backend``, so
+renders cannot occupy the workers that answer cheap requests. The heavy
+lane also runs at a lower CPU priority (GUNICORN_NICE).
+
+Inside the heavy lane work is ordered by priority class (high, normal,
+low) with weighted fair sharing, so short stages are not stuck behind
+long renders and long renders still make progress:
+
+- PriorityExecutor: the CPU pool used by async views
+- the job queue keeps one queue per priority class and picks between
+  them with the same weights
+
+Stage priorities come from STAGE_PRIORITIES and the weights from
+PRIORITY_WEIGHTS.
+"""
+
+import contextvars
+import threading
+from collections import deque
+from concurrent.futures import Executor, Future
+
+from django.conf import settings
+
+
+HIGH = 'high'
+NORMAL = 'normal'
+LOW = 'low'
+PRIORITIES = (HIGH, NORMAL, LOW)
+
+DEFAULT_WEIGHTS = 'high=6,normal=3,low=1'
+DEFAULT_STAGE_PRIORITIES = 'lyrics=high,mix=high,transcribe=normal,instrumental=normal,vocals=normal,song=low'
+
+
+def _parse_pairs(value: str) -> dict:
+    pairs = {}
+    for item in (value or '').split(','):
+        name, _, setting = item.strip().partition('=')
+        if name and setting:
+            pairs[name.strip()] = setting.strip()
+    return pairs
+
+
+def priority_weights() -> dict:
+    """{priority: weight} from settings.PRIORITY_WEIGHTS (every class at least 1)."""
+    weights = _parse_pairs(getattr(settings, 'PRIORITY_WEIGHTS', DEFAULT_WEIGHTS))
+    return {priority: max(1, int(weights.get(priority, 1))) for priority in PRIORITIES}
+
+
+def stage_priority(stage: str) -> str:
+    """Priority class of a stage (settings.STAGE_PRIORITIES, default normal)."""
+    priorities = _parse_pairs(getattr(settings, 'STAGE_PRIORITIES', DEFAULT_STAGE_PRIORITIES))
+    priority = priorities.get(stage, NORMAL)
+    return priority if priority in PRIORITIES else NORMAL
+
+
+def validate_priority(priority: str) -> str:
+    """Return an error message for an unknown priority class, or ''."""
+    if priority and priority not in PRIORITIES:
+        return f"Unknown priority '{priority}'. Use one of: {', '.join(PRIORITIES)}"
+    return ''
+
+
+class WeightedPicker:
+    """
+    Smooth weighted round-robin between priority classes.
+
+    With weights 6/3/1 and all classes busy, ten picks give six high, three
+    normal and one low, interleaved. Classes with nothing waiting are
+    skipped. Not thread-safe; callers hold their own lock.
+    """
+
+    def __init__(self, weights: dict = None):
+        self.weights = weights or priority_weights()
+        self._current = {priority: 0 for priority in self.weights}
+
+    def pick(self, ready) -> str:
+        ready = [priority for priority in PRIORITIES if priority in ready]
+        if not ready:
+            return None
+        total = 0
+        for priority in ready:
+            self._current[priority] += self.weights[priority]
+            total += self.weights[priority]
+        best = max(ready, key=lambda priority: self._current[priority])
+        self._current[best] -= total
+        return best
+
+
+class PriorityExecutor(Executor):
+    """
+    Thread pool that takes queued work by weighted priority.
+
+    submit() queues at normal priority (so it drops in for
+    loop.run_in_executor); submit_with_priority() picks the class. Work
+    runs in a copy of the submitter's context (request ID, active stages).
+    """
+
+    def __init__(self, max_workers: int, thread_name_prefix: str = 'priority', weights: dict = None):
+        self._max_workers = max_workers
+        self._thread_name_prefix = thread_name_prefix
+        self._queues = {priority: deque() for priority in PRIORITIES}
+        self._picker = WeightedPicker(weights)
+        self._condition = threading.Condition()
+        self._threads = []
+        self._idle = 0
+        self._shutdown = False
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        return self.submit_with_priority(NORMAL, fn, *args, **kwargs)
+
+    def submit_with_priority(self, priority: str, fn, *args, **kwargs) -> Future:
+        future = Future()
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError('cannot schedule new futures after shutdown')
+            self._queues[priority if priority in self._queues else NORMAL].append(
+                (future, contextvars.copy_context(), fn, args, kwargs))
+            self._condition.notify()
+            queued = sum(len(queue) for queue in self._queues.values())
+            if queued > self._idle and len(self._threads) < self._max_workers:
+                thread = threading.Thread(target=self._work, daemon=True,
+                                          name=f'{self._thread_name_prefix}-{len(self._threads)}')
+                thread.start()
+                self._threads.append(thread)
+        return future
+
+    def queue_depths(self) -> dict:
+        with self._condition:
+            return {priority: len(queue) for priority, queue in self._queues.items()}
+
+    def _next(self):
+        with self._condition:
+            while True:
+                priority = self._picker.pick([p for p, queue in self._queues.items() if queue])
+                if priority is not None:
+                    return self._queues[priority].popleft()
+                if self._shutdown:
+                    return None
+                self._idle += 1
+                self._condition.wait()
+                self._idle -= 1
+
+    def _work(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            future, context, fn, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = context.run(fn, *args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        with self._condition:
+            self._shutdown = True
+            if cancel_futures:
+                for queue in self._queues.values():
+                    while queue:
+                        queue.popleft()[0].cancel()
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
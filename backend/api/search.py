@@ -0,0 +1,285 @@
+"""
+Full-text search over a user's songs (title and lyrics).
+
+One interface, a backend per database:
+
+- PostgreSQL: ``api_song_search`` holds a weighted ``tsvector`` per song
+  (title A, lyrics B) with a GIN index; queries use
+  ``websearch_to_tsquery``, rank with ``ts_rank_cd`` and highlight with
+  ``ts_headline``
+- SQLite: an FTS5 table ``api_song_fts``, ranked with ``bm25`` and
+  highlighted with ``snippet``. The owner is an indexed token, so the
+  per-user filter is part of the index lookup instead of a post-filter
+- anything else (or SQLite without FTS5): ``icontains``, unranked
+
+The index is kept up to date from the Song signals (api.signals), created
+after ``migrate`` and rebuilt from scratch with
+``python manage.py rebuild_search_index``. Index writes go through set-based
+SQL (``INSERT ... SELECT`` from the song table), so one statement covers
+one song or the whole library.
+
+Highlights come back as HTML: the song text is escaped and matches are
+wrapped in ``<mark>``.
+"""
+
+import abc
+import html
+import logging
+import re
+from dataclasses import dataclass
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+
+from .models import Song
+
+logger = logging.getLogger(__name__)
+
+
+# Match delimiters (private-use characters), swapped for <mark> after escaping
+_START, _STOP = '\ue000', '\ue001'
+SNIPPET_WORDS = 16
+MAX_LIMIT = 50
+# Ids per statement (SQLite limits bound parameters)
+BATCH_SIZE = 500
+
+
+@dataclass
+class SearchHit:
+    song_id: int
+    rank: float
+    title: str
+    snippet: str
+
+
+def mark_up(text: str) -> str:
+    """Escape song text and turn match delimiters into <mark> tags."""
+    return html.escape(text or '').replace(_START, '<mark>').replace(_STOP, '</mark>')
+
+
+def _placeholders(ids) -> str:
+    return ', '.join(['%s'] * len(ids))
+
+
+class SearchBackend(abc.ABC):
+    """Search index operations; ids are Song primary keys."""
+
+    def ensure_schema(self):
+        pass
+
+    def index(self, song_ids):
+        pass
+
+    def remove(self, song_ids):
+        pass
+
+    def rebuild(self) -> int:
+        """Re-create the index from every song; returns the songs indexed."""
+        return Song.objects.count()
+
+    @abc.abstractmethod
+    def search(self, user_id, query: str, limit: int, offset: int = 0) -> list:
+        """SearchHits for the user's songs matching ``query``, best match first."""
+
+
+class PostgresSearchBackend(SearchBackend):
+    TABLE = 'api_song_search'
+    CONFIG = 'english'
+
+    def _document(self) -> str:
+        return (f"setweight(to_tsvector('{self.CONFIG}', coalesce(s.title, '')), 'A') || "
+                f"setweight(to_tsvector('{self.CONFIG}', coalesce(s.lyrics, '')), 'B')")
+
+    def ensure_schema(self):
+        songs = Song._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.TABLE} ("
+                f" song_id bigint PRIMARY KEY REFERENCES {songs} (id) ON DELETE CASCADE,"
+                f" user_id integer,"
+                f" document tsvector NOT NULL)"
+            )
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {self.TABLE}_document_idx "
+                           f"ON {self.TABLE} USING GIN (document)")
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {self.TABLE}_user_idx ON {self.TABLE} (user_id)")
+
+    def _insert(self, where: str = '', params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {self.TABLE} (song_id, user_id, document) "
+                f"SELECT s.id, s.user_id, {self._document()} FROM {Song._meta.db_table} s {where} "
+                f"ON CONFLICT (song_id) DO UPDATE "
+                f"SET user_id = EXCLUDED.user_id, document = EXCLUDED.document",
+                params,
+            )
+            return cursor.rowcount
+
+    def index(self, song_ids):
+        if song_ids:
+            self._insert(f"WHERE s.id IN ({_placeholders(song_ids)})", list(song_ids))
+
+    def remove(self, song_ids):
+        if song_ids:
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {self.TABLE} WHERE song_id IN ({_placeholders(song_ids)})",
+                               list(song_ids))
+
+    def rebuild(self) -> int:
+        self.ensure_schema()
+        with connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {self.TABLE}")
+        return self._insert()
+
+    def search(self, user_id, query: str, limit: int, offset: int = 0) -> list:
+        options = (f"StartSel={_START}, StopSel={_STOP}, MaxWords={SNIPPET_WORDS}, "
+                   f"MinWords={SNIPPET_WORDS // 2}, MaxFragments=2, FragmentDelimiter=\" … \"")
+        # Rank and limit first, so ts_headline only runs on the page
+        sql = (
+            f"SELECT s.id, hits.rank, "
+            f" ts_headline('{self.CONFIG}', coalesce(s.title, ''), hits.q, %s), "
+            f" ts_headline('{self.CONFIG}', coalesce(s.lyrics, ''), hits.q, %s) "
+            f"FROM ("
+            f" SELECT x.song_id, q, ts_rank_cd(x.document, q) AS rank"
+            f" FROM {self.TABLE} x, websearch_to_tsquery('{self.CONFIG}', %s) q"
+            f" WHERE x.user_id = %s AND x.document @@ q"
+            f" ORDER BY rank DESC, x.song_id DESC LIMIT %s OFFSET %s"
+            f") hits JOIN {Song._meta.db_table} s ON s.id = hits.song_id "
+            f"ORDER BY hits.rank DESC, s.id DESC"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [f'HighlightAll=true, StartSel={_START}, StopSel={_STOP}', options,
+                                 query, user_id, limit, offset])
+            rows = cursor.fetchall()
+        return [SearchHit(row[0], float(row[1]), row[2], row[3]) for row in rows]
+
+
+class SQLiteSearchBackend(SearchBackend):
+    TABLE = 'api_song_fts'
+    # bm25 weights per column: owner (filter only), title, lyrics
+    RANKING = 'bm25(0.0, 10.0, 1.0)'
+
+    def ensure_schema(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.TABLE} "
+                f"USING fts5(owner, title, lyrics, tokenize = 'porter unicode61')"
+            )
+
+    def _insert(self, where: str = '', params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {self.TABLE} (rowid, owner, title, lyrics) "
+                f"SELECT s.id, 'u' || s.user_id, coalesce(s.title, ''), coalesce(s.lyrics, '') "
+                f"FROM {Song._meta.db_table} s {where}",
+                params,
+            )
+            return cursor.rowcount
+
+    def index(self, song_ids):
+        if song_ids:
+            # FTS5 has no upsert: replace the rows
+            self.remove(song_ids)
+            self._insert(f"WHERE s.id IN ({_placeholders(song_ids)})", list(song_ids))
+
+    def remove(self, song_ids):
+        if song_ids:
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {self.TABLE} WHERE rowid IN ({_placeholders(song_ids)})",
+                               list(song_ids))
+
+    def rebuild(self) -> int:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self.TABLE}")
+        self.ensure_schema()
+        return self._insert()
+
+    @staticmethod
+    def match_expression(user_id, query: str) -> str:
+        """
+        FTS5 query for the user's songs containing every word of ``query``
+        (the last word as a prefix, for search-as-you-type). Words are
+        quoted, so FTS5 syntax in user input is inert.
+        """
+        words = re.findall(r'\w+', query)
+        if not words:
+            return ''
+        terms = [f'"{word}"' for word in words]
+        terms[-1] += '*'
+        return f'owner : u{int(user_id)} AND {{title lyrics}} : ({" ".join(terms)})'
+
+    def search(self, user_id, query: str, limit: int, offset: int = 0) -> list:
+        expression = self.match_expression(user_id, query)
+        if not expression:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid, -rank, "
+                f" highlight({self.TABLE}, 1, %s, %s), "
+                f" snippet({self.TABLE}, 2, %s, %s, ' … ', %s) "
+                f"FROM {self.TABLE} WHERE {self.TABLE} MATCH %s AND rank MATCH %s "
+                f"ORDER BY rank LIMIT %s OFFSET %s",
+                [_START, _STOP, _START, _STOP, SNIPPET_WORDS, expression, self.RANKING, limit, offset],
+            )
+            rows = cursor.fetchall()
+        return [SearchHit(row[0], float(row[1]), row[2], row[3]) for row in rows]
+
+
+class ScanSearchBackend(SearchBackend):
+    """No full-text support: substring match, newest first, no snippets."""
+
+    def search(self, user_id, query: str, limit: int, offset: int = 0) -> list:
+        songs = Song.objects.filter(user_id=user_id).filter(
+            Q(title__icontains=query) | Q(lyrics__icontains=query)
+        ).values_list('id', 'title')[offset:offset + limit]
+        return [SearchHit(song_id, 0.0, title, '') for song_id, title in songs]
+
+
+_backends = {}
+
+
+def search_backend() -> SearchBackend:
+    """Backend for the default database (chosen once per process)."""
+    vendor = connection.vendor
+    if vendor not in _backends:
+        if vendor == 'postgresql':
+            _backends[vendor] = PostgresSearchBackend()
+        elif vendor == 'sqlite' and _sqlite_has_fts5():
+            _backends[vendor] = SQLiteSearchBackend()
+        else:
+            _backends[vendor] = ScanSearchBackend()
+    return _backends[vendor]
+
+
+def _sqlite_has_fts5() -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def _apply(operation, song_ids):
+    """Run an index write in a savepoint; a failure must not lose the song write."""
+    song_ids = list(song_ids)
+    try:
+        with transaction.atomic():
+            for start in range(0, len(song_ids), BATCH_SIZE):
+                operation(song_ids[start:start + BATCH_SIZE])
+    except DatabaseError as e:
+        logger.warning("Search index update failed (%d songs): %s", len(song_ids), e)
+
+
+def index_songs(song_ids):
+    """Add or refresh songs in the search index."""
+    _apply(search_backend().index, song_ids)
+
+
+def remove_songs(song_ids):
+    _apply(search_backend().remove, song_ids)
+
+
+def search_songs(user_id, query: str, limit: int = 20, offset: int = 0) -> list:
+    """Ranked SearchHits among a user's songs, best first."""
+    query = (query or '').strip()
+    if not query:
+        return []
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    return search_backend().search(user_id, query, limit, max(0, int(offset)))
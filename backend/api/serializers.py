@@ -49,3 +49,29 @@ class SongSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "user", "created_at", "updated_at"]
 
 
+class SongListSerializer(serializers.ModelSerializer):
+    """
+    Slim projection for song listings: no nested user (every row belongs
+    to the requester) and no lyrics unless the view passes
+    ``include_lyrics`` in the context.
+    """
+
+    class Meta:
+        model = Song
+        fields = [
+            "id",
+            "title",
+            "genre",
+            "lyrics",
+            "instrumental_url",
+            "vocals_url",
+            "mix_url",
+            "duration_seconds",
+            "created_at",
+            "updated_at",
+        ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not self.context.get("include_lyrics"):
+            self.fields.pop("lyrics")
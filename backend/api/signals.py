@@ -0,0 +1,80 @@
+"""
+Model signal handlers (connected in ApiConfig.ready).
+"""
+
+from django.db.models import Q
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .library_cache import bump_library_version
+from .models import AUDIO_FILE_FIELDS, Song
+from .search import index_songs, remove_songs, search_backend
+from .temp_audio import audio_file_name, set_pinned
+
+
+def _song_urls(song) -> list:
+    return [song.instrumental_url, song.vocals_url, song.mix_url]
+
+
+@receiver(post_save, sender=Song)
+def pin_song_audio(sender, instance, **kwargs):
+    """Files a Song points at are kept by the temp-audio sweeper."""
+    set_pinned(_song_urls(instance), True)
+
+
+@receiver(post_save, sender=Song)
+@receiver(post_delete, sender=Song)
+def invalidate_song_library(sender, instance, **kwargs):
+    """
+    Cached listings of the owner's songs are stale after any write. The
+    version moves once the transaction commits, so a concurrent reader
+    cannot cache the pre-commit rows under the new version.
+    """
+    user_id = instance.user_id
+    transaction.on_commit(lambda: bump_library_version(user_id))
+
+
+@receiver(post_delete, sender=Song)
+def unpin_song_audio(sender, instance, **kwargs):
+    """Release a deleted Song's files unless another Song still uses them."""
+    names = {audio_file_name(url) for url in _song_urls(instance) if url}
+    if not names:
+        return
+    file_fields = [file_field for _, file_field in AUDIO_FILE_FIELDS]
+    in_use = Q()
+    for file_field in file_fields:
+        in_use |= Q(**{f'{file_field}__in': names})
+    still_used = {
+        name for row in Song.objects.filter(in_use).values_list(*file_fields) for name in row
+    }
+    set_pinned(names - still_used, False)
+
+
+@receiver(post_save, sender=Song)
+def index_song(sender, instance, **kwargs):
+    index_songs([instance.pk])
+
+
+@receiver(post_delete, sender=Song)
+def unindex_song(sender, instance, **kwargs):
+    remove_songs([instance.pk])
+
+
+def songs_bulk_created(songs):
+    """
+    What post_save does, for songs written with bulk_create (which sends
+    no signals): pin their audio, index them and, once the transaction
+    commits, invalidate their owners' cached listings.
+    """
+    set_pinned([url for song in songs for url in _song_urls(song)], True)
+    index_songs([song.pk for song in songs if song.pk is not None])
+    user_ids = {song.user_id for song in songs}
+    transaction.on_commit(lambda: [bump_library_version(user_id) for user_id in user_ids])
+
+
+@receiver(post_migrate)
+def create_search_index(sender, using='default', **kwargs):
+    """The search tables live outside migrations (raw SQL per database)."""
+    if sender.name == 'api' and using == 'default':
+        search_backend().ensure_schema()
@@ -0,0 +1,161 @@
+"""
+Lifecycle of generated files in TEMP_AUDIO_DIR.
+
+Every file handed out as a URL is recorded in the AudioFile index with its
+size and last access. A sweep deletes files idle for longer than
+TEMP_AUDIO_TTL_SECONDS, then evicts least-recently-used files while the
+directory is over TEMP_AUDIO_MAX_BYTES. Files referenced by a Song are
+pinned (see api.signals) and never removed.
+
+Sweeps are incremental: they run at most once per
+TEMP_AUDIO_SWEEP_INTERVAL_SECONDS across all workers (a cache lock), work
+from the index rather than the directory, and delete at most
+TEMP_AUDIO_SWEEP_BATCH files per run. `python manage.py sweep_temp_audio`
+runs a sweep by hand and can index files written before tracking began.
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+
+from .audio_serving import signed_query
+from .audio_store import SIDECAR_SUFFIXES, remove_sidecars, store_audio_file
+from .models import AudioFile
+from .variants import remove_variants
+
+logger = logging.getLogger(__name__)
+
+
+SWEEP_LOCK_KEY = 'auralynx:temp-audio:sweep'
+
+
+def audio_file_name(path_or_url: str) -> str:
+    """File name inside TEMP_AUDIO_DIR for a path or a /temp-audio/ URL."""
+    return os.path.basename(str(path_or_url).split('?', 1)[0].rstrip('/'))
+
+
+def public_audio_url(path: str) -> str:
+    """
+    Relative URL for a generated file, recording it in the index.
+
+    Call this wherever a file in TEMP_AUDIO_DIR is handed to a client. The
+    file is first moved to its content-addressed name (api.audio_store),
+    so the URL is immutable.
+    """
+    name = register_audio_file(store_audio_file(path))
+    return f'{settings.TEMP_AUDIO_URL}{name}{signed_query(name)}'
+
+
+def register_audio_file(path: str) -> str:
+    """Add (or refresh) a file in the index and maybe run a sweep."""
+    name = audio_file_name(path)
+    full_path = os.path.join(settings.TEMP_AUDIO_DIR, name)
+    try:
+        size = os.path.getsize(full_path)
+    except OSError:
+        return name
+    AudioFile.objects.update_or_create(
+        name=name, defaults={'size_bytes': size, 'last_accessed_at': timezone.now()}
+    )
+    maybe_sweep()
+    return name
+
+
+def touch_audio_file(path_or_url: str):
+    """Mark a file as used now (throttled to one write per minute)."""
+    now = timezone.now()
+    AudioFile.objects.filter(
+        name=audio_file_name(path_or_url), last_accessed_at__lt=now - timedelta(minutes=1)
+    ).update(last_accessed_at=now)
+
+
+def set_pinned(urls, pinned: bool):
+    """Pin or unpin the files behind a list of audio URLs (blank ones skipped)."""
+    names = [audio_file_name(url) for url in urls if url]
+    if names:
+        AudioFile.objects.filter(name__in=names).update(pinned=pinned)
+
+
+def _delete(entries) -> tuple:
+    deleted, freed = 0, 0
+    for entry in entries:
+        try:
+            os.remove(os.path.join(settings.TEMP_AUDIO_DIR, entry.name))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning("Could not delete %s: %s", entry.name, e)
+            continue
+        remove_variants(entry.name)
+        remove_sidecars(entry.name)
+        entry.delete()
+        deleted += 1
+        freed += entry.size_bytes
+    return deleted, freed
+
+
+def sweep(batch: int = None) -> dict:
+    """
+    Delete expired files, then evict LRU files while over quota.
+
+    Returns:
+        Dict with expired, evicted, freed_bytes and total_bytes (after)
+    """
+    batch = batch or getattr(settings, 'TEMP_AUDIO_SWEEP_BATCH', 200)
+    ttl = getattr(settings, 'TEMP_AUDIO_TTL_SECONDS', 86400)
+    quota = getattr(settings, 'TEMP_AUDIO_MAX_BYTES', 5 * 1024 ** 3)
+    unpinned = AudioFile.objects.filter(pinned=False).order_by('last_accessed_at')
+
+    cutoff = timezone.now() - timedelta(seconds=ttl)
+    expired, freed = _delete(unpinned.filter(last_accessed_at__lt=cutoff)[:batch])
+
+    evicted = 0
+    total = AudioFile.objects.aggregate(total=Sum('size_bytes'))['total'] or 0
+    if quota and total > quota:
+        budget = batch - expired
+        candidates = []
+        excess = total - quota
+        for entry in unpinned[:max(budget, 0)]:
+            if excess <= 0:
+                break
+            candidates.append(entry)
+            excess -= entry.size_bytes
+        evicted, evicted_bytes = _delete(candidates)
+        freed += evicted_bytes
+        total -= evicted_bytes
+
+    return {'expired': expired, 'evicted': evicted, 'freed_bytes': freed, 'total_bytes': total}
+
+
+def maybe_sweep():
+    """Run a sweep unless one ran within TEMP_AUDIO_SWEEP_INTERVAL_SECONDS."""
+    interval = getattr(settings, 'TEMP_AUDIO_SWEEP_INTERVAL_SECONDS', 60)
+    if not cache.add(SWEEP_LOCK_KEY, 1, interval):
+        return
+    try:
+        sweep()
+    except Exception as e:
+        logger.warning("Temp audio sweep failed: %s", e)
+
+
+def index_untracked_files() -> int:
+    """Add files in TEMP_AUDIO_DIR that are missing from the index (full walk)."""
+    known = set(AudioFile.objects.values_list('name', flat=True))
+    added = []
+    with os.scandir(settings.TEMP_AUDIO_DIR) as entries:
+        for entry in entries:
+            # Sidecars are swept with their master
+            if entry.is_file() and entry.name not in known and not entry.name.endswith(SIDECAR_SUFFIXES):
+                stat = entry.stat()
+                added.append(AudioFile(
+                    name=entry.name,
+                    size_bytes=stat.st_size,
+                    last_accessed_at=datetime.fromtimestamp(stat.st_mtime, tz=dt_timezone.utc),
+                ))
+    AudioFile.objects.bulk_create(added, batch_size=500, ignore_conflicts=True)
+    return len(added)
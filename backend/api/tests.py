@@ -0,0 +1,1579 @@
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.http import JsonResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from .admission import admit, get_budget
+from .benchmarks import compare
+from .jobs import TASKS, InProcessJobQueue, JobCancelled
+from .library_cache import library_version
+from .models import Song
+from .pipeline import Stage, StageGraphCancelled, run_stage_graph
+from .progress import InProcessBroker, ProgressReporter
+
+
+User = get_user_model()
+
+
+LOCMEM_CACHE = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class SongListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="listener", password="password123")
+        other = User.objects.create_user(username="other", password="password123")
+        for i in range(30):
+            Song.objects.create(user=cls.user, title=f"Song {i}", genre="pop", lyrics="la " * 500)
+        Song.objects.create(user=other, title="Not mine", genre="rock")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("songs")
+
+    def test_list_queries_per_page(self):
+        # Validators (count, latest updated_at) plus the page itself
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {"page_size": 10})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 10)
+
+        with self.assertNumQueries(2):
+            response = self.client.get(response.data["next"])
+        self.assertEqual(len(response.data["results"]), 10)
+
+    def test_cached_page_and_not_modified_skip_the_database(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            again = self.client.get(self.url)
+        self.assertEqual(again.data, first.data)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_writes_invalidate_the_cache(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            song = Song.objects.create(user=self.user, title="Newest", genre="jazz")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["title"], "Newest")
+
+        etag = response["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            song.delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data["results"][0]["title"], "Newest")
+
+    def test_version_bumped_on_commit(self):
+        version = library_version(self.user.id)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Song.objects.create(user=self.user, title="Uncommitted", genre="jazz")
+        self.assertEqual(library_version(self.user.id), version)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(library_version(self.user.id), version)
+
+    def test_evicted_version_does_not_resurrect_cached_pages(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            Song.objects.create(user=self.user, title="Newest", genre="jazz")
+        # A bounded cache (FileBasedCache MAX_ENTRIES) may drop the version
+        cache.delete(f"auralynx:songs:version:{self.user.id}")
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["results"][0]["title"], "Newest")
+
+    @override_settings(CACHES={
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "shared"},
+        "worker": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "shared"},
+    })
+    def test_version_bumped_through_another_connection(self):
+        cache.clear()
+        etag = self.client.get(self.url)["ETag"]
+        # A job worker saves the song and bumps the version over its own connection
+        with mock.patch("api.library_cache.cache", caches["worker"]), \
+                self.captureOnCommitCallbacks(execute=True):
+            Song.objects.create(user=self.user, title="From a job", genre="jazz")
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["results"][0]["title"], "From a job")
+
+    def test_redis_job_backend_defaults_to_the_shared_cache(self):
+        script = "import django; django.setup(); from django.conf import settings; print(settings.CACHES['default']['BACKEND'])"
+        env = {key: value for key, value in os.environ.items() if key != "CACHE_BACKEND"}
+        env.update(DJANGO_SETTINGS_MODULE="config.settings", JOB_BACKEND="redis")
+        output = subprocess.run(
+            [sys.executable, "-c", script], cwd=settings.BASE_DIR, env=env,
+            capture_output=True, text=True, check=True, timeout=60,
+        ).stdout
+        self.assertEqual(output.strip().splitlines()[-1], "django.core.cache.backends.redis.RedisCache")
+
+    def test_listing_index_is_migrated(self):
+        from django.db import connection
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Song._meta.db_table)
+        self.assertEqual(constraints["song_user_created_idx"]["columns"], ["user_id", "created_at", "id"])
+
+    def test_cursor_walks_every_song_once_newest_first(self):
+        ids = []
+        url = f"{self.url}?page_size=7"
+        while url:
+            response = self.client.get(url)
+            ids.extend(song["id"] for song in response.data["results"])
+            url = response.data["next"]
+        expected = list(Song.objects.filter(user=self.user).order_by("-created_at", "-id").values_list("id", flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_lyrics_only_on_request(self):
+        response = self.client.get(self.url)
+        song = response.data["results"][0]
+        self.assertNotIn("lyrics", song)
+        self.assertNotIn("user", song)
+
+        response = self.client.get(self.url, {"include": "lyrics"})
+        self.assertTrue(response.data["results"][0]["lyrics"].startswith("la "))
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class SongSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="searcher", password="password123")
+        other = User.objects.create_user(username="other", password="password123")
+        Song.objects.create(user=cls.user, title="Summer Rain", genre="pop",
+                            lyrics="dancing in the summer rain <tonight>")
+        Song.objects.create(user=cls.user, title="City Lights", genre="rock", lyrics="neon nights")
+        Song.objects.create(user=other, title="Rain Again", genre="pop", lyrics="rain rain rain")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = reverse("songs_search")
+
+    def test_ranked_highlighted_matches_of_own_songs(self):
+        response = self.client.get(self.url, {"q": "rain"})
+        self.assertEqual(response.status_code, 200)
+        results = response.data["results"]
+        self.assertEqual([song["title"] for song in results], ["Summer Rain"])
+        self.assertIn("<mark>Rain</mark>", results[0]["title_highlight"])
+        self.assertIn("&lt;tonight&gt;", results[0]["snippet"])
+        self.assertNotIn("lyrics", results[0])
+
+    def test_index_follows_edits_and_deletes(self):
+        song = Song.objects.get(title="City Lights")
+        song.lyrics = "rain on the neon"
+        song.save()
+        titles = [s["title"] for s in self.client.get(self.url, {"q": "neon rain"}).data["results"]]
+        self.assertEqual(titles, ["City Lights"])
+
+        song.delete()
+        self.assertEqual(self.client.get(self.url, {"q": "neon"}).data["results"], [])
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class BulkSongTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="importer", password="password123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_create_is_all_or_nothing(self):
+        songs = [{"title": f"Imported {i}", "genre": "pop", "lyrics": f"line {i}"} for i in range(25)]
+        response = self.client.post(reverse("songs_bulk"), songs + [{"genre": "pop"}], format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Song.objects.exists())
+
+        response = self.client.post(reverse("songs_bulk"), {"songs": songs}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 25)
+        self.assertEqual(Song.objects.filter(user=self.user).count(), 25)
+        results = self.client.get(reverse("songs_search"), {"q": "imported"}).data["results"]
+        self.assertEqual(len(results), 20)
+
+    def test_export_streams_ndjson(self):
+        for i in range(3):
+            Song.objects.create(user=self.user, title=f"Song {i}", genre="rock", lyrics="words")
+        response = self.client.get(reverse("songs_export"))
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([row["title"] for row in rows], ["Song 0", "Song 1", "Song 2"])
+        self.assertEqual(rows[0]["lyrics"], "words")
+
+
+class ProgressStreamTests(TestCase):
+    def setUp(self):
+        self.broker = InProcessBroker()
+        for target, value in [("api.progress._broker", self.broker),
+                              ("api.jobs._queue", InProcessJobQueue(autostart=False))]:
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_wsgi_stream_sends_events_before_the_job_finishes(self):
+        reporter = ProgressReporter("progress-test-1", broker=self.broker)
+        reporter.stage_started("lyrics")
+        response = self.client.get(reverse("progress_stream", args=["progress-test-1"]))
+        chunks = iter(response.streaming_content)
+        self.assertEqual(next(chunks), b"retry: 3000\n\n")
+        self.assertIn(b"event: stage_started", next(chunks))
+
+        reporter.done()
+        self.assertIn(b"event: done", next(chunks))
+        self.assertEqual(list(chunks), [])
+
+    def test_reconnect_resumes_after_last_event_id(self):
+        reporter = ProgressReporter("progress-test-2", broker=self.broker)
+        reporter.stage_started("lyrics")
+        reporter.stage_finished("lyrics")
+        reporter.done()
+        first, _, _ = [event["id"] for event in self.broker._history["progress-test-2"]]
+        response = self.client.get(reverse("progress_stream", args=["progress-test-2"]),
+                                   HTTP_LAST_EVENT_ID=first)
+        body = b"".join(response.streaming_content).decode()
+        self.assertNotIn("event: stage_started", body)
+        self.assertIn("event: stage_finished", body)
+        self.assertIn("event: done", body)
+        self.assertEqual(body.count("id: "), 2)
+
+    @override_settings(PROGRESS_STREAM_TIMEOUT_SECONDS=600, WORKER_TIMEOUT_SECONDS=300)
+    def test_sync_stream_ends_before_worker_timeout(self):
+        from .progress import sse_events_sync, sync_stream_timeout
+        self.assertEqual(sync_stream_timeout(), 270)
+        with override_settings(PROGRESS_STREAM_TIMEOUT_SECONDS=120):
+            self.assertEqual(sync_stream_timeout(), 120)
+        with mock.patch("api.progress.sync_stream_timeout", return_value=0.2):
+            started = time.monotonic()
+            frames = list(sse_events_sync("progress-test-3", heartbeat=0.05))
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertIn(": keep-alive\n\n", frames)
+
+    def test_history_dropped_after_terminal_event(self):
+        self.broker.publish("finished-channel", {"type": "done"})
+        self.broker.publish("running-channel", {"type": "progress"})
+        later = time.monotonic() + 61
+        with mock.patch("api.progress.time.monotonic", return_value=later):
+            self.broker.publish("another-channel", {"type": "progress"})
+        self.assertNotIn("finished-channel", self.broker._history)
+        self.assertIn("running-channel", self.broker._history)
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.queue = InProcessJobQueue(autostart=False, max_retries=2, retry_backoff=0.2, result_ttl=60)
+        self.calls = 0
+
+        def flaky(params, context):
+            self.calls += 1
+            if self.calls == 1:
+                raise RuntimeError("provider down")
+            return {"calls": self.calls}
+
+        self.started = threading.Event()
+
+        def waits_for_cancel(params, context):
+            self.started.set()
+            deadline = time.monotonic() + 5
+            while not context.should_cancel():
+                if time.monotonic() > deadline:
+                    return {"cancelled": False}
+                time.sleep(0.01)
+            raise JobCancelled("Cancelled at stage boundary")
+
+        patcher = mock.patch.dict(TASKS, {"flaky": (flaky, ()), "waits": (waits_for_cancel, ())})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retry_with_backoff(self):
+        job = self.queue.submit("flaky", {})
+        self.assertEqual(self.queue._dequeue(0.01), job["id"])
+        self.queue.run_job(job["id"])
+        retried = self.queue.get(job["id"])
+        self.assertEqual((retried["status"], retried["attempts"]), ("queued", 1))
+
+        # Not ready until the backoff (retry_backoff x attempts) has passed
+        self.assertIsNone(self.queue._dequeue(0.01))
+        started = time.monotonic()
+        self.assertEqual(self.queue._dequeue(2.0), job["id"])
+        self.assertLess(time.monotonic() - started, 1.0)
+
+        self.queue.run_job(job["id"])
+        finished = self.queue.get(job["id"])
+        self.assertEqual((finished["status"], finished["attempts"]), ("succeeded", 2))
+        self.assertEqual(finished["result"], {"calls": 2})
+        self.assertEqual(self.queue.metrics()["counters"]["retried"], 1)
+
+    def test_fails_after_max_retries(self):
+        queue = InProcessJobQueue(autostart=False, max_retries=0)
+        job = queue.submit("flaky", {})
+        queue.run_job(job["id"])
+        self.assertEqual(queue.get(job["id"])["status"], "failed")
+        self.assertEqual(queue.get(job["id"])["error"], "provider down")
+
+    def test_cancel_before_start(self):
+        job = self.queue.submit("flaky", {})
+        self.assertEqual(self.queue.cancel(job["id"])["status"], "cancelled")
+        self.assertIsNone(self.queue._dequeue(0.01))
+        self.queue.run_job(job["id"])
+        self.assertEqual(self.calls, 0)
+
+    def test_cancel_while_running(self):
+        job = self.queue.submit("waits", {})
+        worker = threading.Thread(target=self.queue.run_job, args=(job["id"],))
+        worker.start()
+        self.assertTrue(self.started.wait(5))
+        self.assertEqual(self.queue.cancel(job["id"])["status"], "running")
+        worker.join(5)
+        cancelled = self.queue.get(job["id"])
+        self.assertEqual(cancelled["status"], "cancelled")
+        self.assertEqual(cancelled["error"], "Cancelled at stage boundary")
+
+    def test_result_expires_after_ttl(self):
+        job = self.queue.submit("flaky", {})
+        self.queue.cancel(job["id"])
+        self.assertIsNotNone(self.queue.get(job["id"]))
+        with mock.patch("api.jobs.time.time", return_value=time.time() + 61):
+            self.assertIsNone(self.queue.get(job["id"]))
+
+    def test_job_detail_checks_owner_and_expiry(self):
+        owner = User.objects.create_user(username="owner", password="password123")
+        other = User.objects.create_user(username="intruder", password="password123")
+        job = self.queue.submit("flaky", {}, user_id=owner.id)
+        url = reverse("job_detail", args=[job["id"]])
+        client = APIClient()
+        with mock.patch("api.jobs._queue", self.queue):
+            client.force_authenticate(other)
+            self.assertEqual(client.get(url).status_code, 404)
+            self.assertEqual(client.delete(url).status_code, 404)
+            self.assertEqual(self.queue.get(job["id"])["status"], "queued")
+            self.assertEqual(client.get(reverse("job_metrics")).status_code, 403)
+            self.assertEqual(client.get(reverse("admission_metrics")).status_code, 403)
+
+            client.force_authenticate(owner)
+            self.assertEqual(client.get(url).data["status"], "queued")
+            self.assertEqual(client.delete(url).data["status"], "cancelled")
+            with mock.patch("api.jobs.time.time", return_value=time.time() + 61):
+                response = client.get(url)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data["error"], "Job not found or expired")
+
+    def test_progress_stream_checks_job_owner(self):
+        owner = User.objects.create_user(username="owner", password="password123")
+        other = User.objects.create_user(username="intruder", password="password123")
+        job = self.queue.submit("flaky", {}, user_id=owner.id)
+        url = reverse("progress_stream", args=[job["id"]])
+        client = APIClient()
+        broker = InProcessBroker()
+        with mock.patch("api.jobs._queue", self.queue), mock.patch("api.progress._broker", broker):
+            self.assertEqual(client.get(url).status_code, 404)
+            client.force_authenticate(other)
+            response = client.get(url)
+            self.assertEqual(response.status_code, 404)
+            self.assertEqual(response.json()["error"], "Job not found or expired")
+
+            client.force_authenticate(owner)
+            ProgressReporter(job["id"], broker=broker).done(result={"secret": True})
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(b"event: done", b"".join(response.streaming_content))
+
+            response = APIClient().get(url, HTTP_AUTHORIZATION="Bearer not-a-token")
+        self.assertEqual(response.status_code, 401)
+
+
+class StageGraphTests(SimpleTestCase):
+    def setUp(self):
+        # Released at cleanup so stages abandoned by a test do not linger
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def sleeper(self, seconds, value=None):
+        def run(inputs):
+            time.sleep(seconds)
+            return value
+        return run
+
+    def blocked(self, inputs):
+        self.release.wait(30)
+
+    def test_independent_stages_run_concurrently(self):
+        stages = [
+            Stage("lyrics", self.sleeper(0.2, "words")),
+            Stage("instrumental", self.sleeper(0.6), depends_on=("lyrics",)),
+            Stage("vocals", self.sleeper(0.4), depends_on=("lyrics",)),
+            Stage("mix", lambda inputs: sorted(inputs), depends_on=("instrumental", "vocals")),
+        ]
+        started = time.perf_counter()
+        results, timings = run_stage_graph(stages)
+        elapsed = time.perf_counter() - started
+        # lyrics + max(instrumental, vocals) + mix, not the sum (1.2 s)
+        self.assertGreaterEqual(elapsed, 0.8)
+        self.assertLess(elapsed, 1.1)
+        self.assertEqual(results["mix"], ["instrumental", "vocals"])
+        self.assertEqual(set(timings), {"lyrics", "instrumental", "vocals", "mix"})
+
+    def test_failure_returns_without_waiting_for_running_stages(self):
+        def vocals(inputs):
+            time.sleep(0.05)
+            raise ValueError("no voice")
+
+        stages = [
+            Stage("lyrics", self.sleeper(0, "words")),
+            Stage("instrumental", self.blocked, depends_on=("lyrics",)),
+            Stage("vocals", vocals, depends_on=("lyrics",)),
+            Stage("mix", self.sleeper(0), depends_on=("instrumental", "vocals")),
+        ]
+        started = time.perf_counter()
+        with self.assertRaisesMessage(RuntimeError, "vocals stage failed: no voice") as raised:
+            run_stage_graph(stages)
+        self.assertLess(time.perf_counter() - started, 2)
+        self.assertIsInstance(raised.exception.__cause__, ValueError)
+
+    def test_cancel_while_stages_run(self):
+        cancelled = threading.Event()
+        stages = [
+            Stage("lyrics", self.sleeper(0, "words")),
+            Stage("instrumental", self.blocked, depends_on=("lyrics",)),
+            Stage("mix", self.sleeper(0), depends_on=("instrumental",)),
+        ]
+        threading.Timer(0.1, cancelled.set).start()
+        started = time.perf_counter()
+        with self.assertRaisesMessage(StageGraphCancelled, "during stage(s): instrumental"):
+            run_stage_graph(stages, should_cancel=cancelled.is_set)
+        self.assertLess(time.perf_counter() - started, 2)
+
+
+def _tone(seconds, sample_rate, frequency=440.0, amplitude=0.5, channels=1):
+    import numpy as np
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    mono = (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+    return np.repeat(mono[:, None], channels, axis=1)
+
+
+def _read_wav(path):
+    import wave
+    import numpy as np
+    with wave.open(path, "rb") as wav_file:
+        raw = wav_file.readframes(wav_file.getnframes())
+        samples = np.frombuffer(raw, dtype="<i2").reshape(-1, wav_file.getnchannels())
+        return samples.astype(np.float32) / 32767, wav_file.getframerate()
+
+
+class StreamMixTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def stems(self):
+        """A 1 s mono stem at 22.05 kHz on disk and a 0.5 s stereo one at 44.1 kHz in memory."""
+        from .audio_stream import AudioBuffer
+        vocals = os.path.join(self.directory, "vocals.wav")
+        AudioBuffer(_tone(1.0, 22050, 220.0), 22050).write_wav(vocals)
+        return [vocals, AudioBuffer(_tone(0.5, 44100, 440.0, 0.25, channels=2), 44100)]
+
+    def mix(self, name, **kwargs):
+        from .audio_stream import stream_mix
+        path, duration = stream_mix(self.stems(), os.path.join(self.directory, name), **kwargs)
+        samples, sample_rate = _read_wav(path)
+        return samples, sample_rate, duration
+
+    def test_mixes_sample_rates_and_channel_counts(self):
+        samples, sample_rate, duration = self.mix("mix.wav")
+        # Highest rate and widest layout; the 1 s stem sets the length
+        self.assertEqual(sample_rate, 44100)
+        self.assertEqual(samples.shape[1], 2)
+        self.assertLessEqual(abs(len(samples) - 44100), 2)
+        self.assertAlmostEqual(duration, len(samples) / 44100)
+
+    def test_block_size_does_not_change_the_output(self):
+        reference = self.mix("reference.wav")[0]
+        for block_frames in (257, 4096):
+            samples = self.mix(f"mix_{block_frames}.wav", block_frames=block_frames)[0]
+            self.assertEqual(samples.shape, reference.shape)
+            self.assertEqual(abs(samples - reference).max(), 0.0)
+
+    def test_normalize_sets_each_track_peak_before_gain(self):
+        from .audio_stream import AudioBuffer, NORMALIZE_HEADROOM_DB, stream_mix
+        from .waveform import PeakAccumulator
+        path = os.path.join(self.directory, "normalized.wav")
+        peaks = PeakAccumulator(8000)
+        stream_mix([AudioBuffer(_tone(0.5, 44100, amplitude=0.2), 44100)], path,
+                   gains_db=[-6.0], normalize=True, peaks=peaks)
+        samples, _ = _read_wav(path)
+        expected = 10 ** ((-6.0 - NORMALIZE_HEADROOM_DB) / 20)
+        self.assertAlmostEqual(float(abs(samples).max()), expected, places=3)
+        self.assertEqual(peaks.sample_rate, 44100)
+        self.assertAlmostEqual(float(peaks.peaks()[1].max()), expected, places=3)
+
+    def test_resampler_is_continuous_across_blocks(self):
+        import numpy as np
+        from .audio_stream import StreamingResampler
+        ramp = np.arange(1000, dtype=np.float32).reshape(-1, 1)
+        whole = StreamingResampler(22050, 44100).process(ramp)
+        resampler = StreamingResampler(22050, 44100)
+        pieces = np.concatenate([resampler.process(ramp[i:i + 37]) for i in range(0, len(ramp), 37)])
+        self.assertEqual(pieces.shape, whole.shape)
+        self.assertTrue(np.allclose(pieces, whole))
+        # Linear interpolation of a ramp is the ramp at half steps
+        self.assertTrue(np.allclose(whole[:, 0], np.arange(len(whole)) * 0.5))
+
+
+class MasteringTests(SimpleTestCase):
+    PROGRESS = (
+        "out_time_us=500000\nout_time=00:00:00.500000\nprogress=continue\n"
+        "out_time_us=2345678\nout_time=00:00:02.345678\nprogress=end\n"
+    )
+
+    def test_filtergraph(self):
+        from .mastering import build_master_filtergraph
+        graph = build_master_filtergraph([0.0, -3.0], -14.0, -1.5, 44100)
+        self.assertEqual(graph, (
+            "[0:a]volume=0.0dB[a0];[1:a]volume=-3.0dB[a1];"
+            "[a0][a1]amix=inputs=2:duration=longest:normalize=0,"
+            "loudnorm=I=-14.0:TP=-1.5:LRA=11,"
+            "alimiter=limit=0.8414,"
+            "aresample=44100[out]"
+        ))
+
+    def test_duration_from_progress(self):
+        from .mastering import parse_ffmpeg_duration
+        self.assertEqual(parse_ffmpeg_duration(self.PROGRESS), 2.345678)
+        # Without out_time_us, the last out_time line
+        self.assertEqual(parse_ffmpeg_duration("out_time=00:01:02.500000\nprogress=end\n"), 62.5)
+
+    def test_duration_falls_back_to_stderr(self):
+        from .mastering import parse_ffmpeg_duration
+        stderr = "size=  10kB time=00:00:01.00 bitrate=...\nsize=  20kB time=01:00:03.25 bitrate=...\n"
+        self.assertEqual(parse_ffmpeg_duration("", stderr), 3603.25)
+        self.assertEqual(parse_ffmpeg_duration("", ""), 0.0)
+
+    def test_master_command(self):
+        from .mastering import _master_command
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        inputs = []
+        for name in ("instrumental.wav", "vocals.wav"):
+            inputs.append(os.path.join(directory, name))
+            open(inputs[-1], "wb").close()
+        with override_settings(TEMP_AUDIO_DIR=directory):
+            args, output_path = _master_command(inputs, "opus", None, -16.0, -1.0)
+            with self.assertRaises(RuntimeError):
+                _master_command(inputs, "flac", None, None, None)
+            with self.assertRaises(RuntimeError):
+                _master_command(inputs + [os.path.join(directory, "gone.wav")], "wav", None, None, None)
+        self.assertTrue(output_path.endswith(".opus"))
+        self.assertEqual(args[-1], output_path)
+        self.assertEqual(args[:4], ["-i", inputs[0], "-i", inputs[1]])
+        self.assertIn("aresample=48000[out]", args[args.index("-filter_complex") + 1])
+        self.assertEqual(args[args.index("-progress") + 1], "pipe:1")
+
+    def test_master_reads_duration_from_progress(self):
+        from .mastering import master_audio_tracks
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        path = os.path.join(directory, "instrumental.wav")
+        open(path, "wb").close()
+        with override_settings(TEMP_AUDIO_DIR=directory), \
+                mock.patch("api.mastering.run_ffmpeg", return_value=(self.PROGRESS, "")):
+            output_path, duration = master_audio_tracks([path])
+        self.assertEqual(duration, 2.35)
+        self.assertTrue(output_path.endswith(".wav"))
+
+    @unittest.skipIf(shutil.which("ffmpeg") is None, "ffmpeg is not installed")
+    def test_render(self):
+        from .audio_stream import AudioBuffer
+        from .mastering import master_audio_tracks
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        inputs = []
+        for name, frequency in (("instrumental.wav", 220.0), ("vocals.wav", 440.0)):
+            inputs.append(os.path.join(directory, name))
+            AudioBuffer(_tone(1.0, 44100, frequency), 44100).write_wav(inputs[-1])
+        with override_settings(TEMP_AUDIO_DIR=directory, FFMPEG_PATH="ffmpeg"):
+            output_path, duration = master_audio_tracks(inputs)
+        self.assertTrue(os.path.getsize(output_path) > 44)
+        self.assertAlmostEqual(duration, 1.0, delta=0.1)
+
+
+class AdmissionTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        patcher = mock.patch.dict("api.admission._budgets", clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.settings_patch = override_settings(
+            ADMISSION_ENABLED=True, ADMISSION_LOCK_DIR=directory, ADMISSION_WAIT_SECONDS=0.2,
+            ADMISSION_RETRY_AFTER_SECONDS=7, ADMISSION_POLL_SECONDS=0.01,
+        )
+        self.settings_patch.enable()
+        self.addCleanup(self.settings_patch.disable)
+        self.request = RequestFactory().post("/api/unit/")
+
+    def view(self, limits):
+        @admit("unit")
+        def view(request):
+            return JsonResponse({"ok": True})
+
+        setting = override_settings(ADMISSION_LIMITS=limits)
+        setting.enable()
+        self.addCleanup(setting.disable)
+        return view
+
+    def hold_slot(self):
+        budget = get_budget("unit")
+        slot = budget.acquire(0, 7)
+        self.addCleanup(budget.release, slot)
+        return budget, slot
+
+    def test_queue_full_gets_429(self):
+        view = self.view("unit=1:0")
+        budget, slot = self.hold_slot()
+        response = view(self.request)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "7")
+        self.assertEqual(json.loads(response.content)["stage"], "unit")
+        self.assertEqual(budget.snapshot()["rejected"], 1)
+
+    def test_wait_timeout_gets_503(self):
+        view = self.view("unit=1:1")
+        budget, slot = self.hold_slot()
+        started = time.monotonic()
+        response = view(self.request)
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "7")
+        self.assertEqual(budget.snapshot()["timed_out"], 1)
+
+    def test_queued_request_runs_when_a_slot_frees(self):
+        view = self.view("unit=1:1")
+        budget = get_budget("unit")
+        slot = budget.acquire(0, 7)
+        threading.Timer(0.05, budget.release, args=(slot,)).start()
+        self.assertEqual(view(self.request).status_code, 200)
+        self.assertEqual(budget.snapshot()["running"], 0)
+
+    def test_slot_released_when_the_view_raises(self):
+        self.view("unit=1:0")
+
+        @admit("unit")
+        def failing(request):
+            raise RuntimeError("render crashed")
+
+        with self.assertRaises(RuntimeError):
+            failing(self.request)
+        budget = get_budget("unit")
+        self.assertEqual(budget.snapshot()["running"], 0)
+        self.assertEqual(self.view("unit=1:0")(self.request).status_code, 200)
+
+    def test_prometheus_gauges_track_running_and_queued(self):
+        from .metrics import PROMETHEUS_AVAILABLE
+        if not PROMETHEUS_AVAILABLE:
+            self.skipTest("prometheus_client not installed")
+        from prometheus_client import REGISTRY
+
+        def gauges():
+            return tuple(REGISTRY.get_sample_value(f"auralynx_admission_{name}", {"stage": "unit"}) or 0
+                         for name in ("running", "queued"))
+
+        running, queued = gauges()
+        view = self.view("unit=1:1")
+        budget = get_budget("unit")
+        slot = budget.acquire(0, 7)
+        self.assertEqual(gauges(), (running + 1, queued))
+        waiting = threading.Thread(target=view, args=(self.request,))
+        waiting.start()
+        deadline = time.monotonic() + 2
+        while gauges()[1] == queued and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(gauges(), (running + 1, queued + 1))
+        budget.release(slot)
+        waiting.join(2)
+        self.assertEqual(gauges(), (running, queued))
+
+    def test_async_view_rejected_when_full(self):
+        self.view("unit=1:0")
+
+        @admit("unit")
+        async def view(request):
+            return JsonResponse({"ok": True})
+
+        self.hold_slot()
+        response = asyncio.run(view(self.request))
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "7")
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHE, COALESCE_ENABLED=True, COALESCE_LOCK_TTL_SECONDS=5,
+    COALESCE_RESULT_TTL_SECONDS=30, COALESCE_POLL_SECONDS=0.01,
+)
+class CoalesceTests(SimpleTestCase):
+    inputs = {"prompt": "rain on a tin roof", "duration": 8}
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+        self.release = threading.Event()
+
+    def compute(self, value="render.wav", error=None):
+        def compute():
+            self.calls += 1
+            self.release.wait(5)
+            if error:
+                raise ValueError(error)
+            return value
+        return compute
+
+    def run_in_thread(self, compute):
+        """Start single_flight in a thread; returns (thread, outcome dict)."""
+        from .coalesce import single_flight
+        outcome = {}
+
+        def target():
+            try:
+                outcome["value"] = single_flight("music", self.inputs, compute)
+            except Exception as e:
+                outcome["error"] = e
+
+        thread = threading.Thread(target=target)
+        thread.start()
+        return thread, outcome
+
+    def keys(self):
+        from .coalesce import _keys
+        return _keys("music", self.inputs)
+
+    def test_concurrent_requests_share_one_result(self):
+        leader, led = self.run_in_thread(self.compute())
+        time.sleep(0.05)
+        follower, followed = self.run_in_thread(self.compute("second.wav"))
+        time.sleep(0.05)
+        self.release.set()
+        leader.join(5)
+        follower.join(5)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(led, {"value": "render.wav"})
+        self.assertEqual(followed, {"value": "render.wav"})
+
+    def test_later_request_gets_cached_result(self):
+        from .coalesce import single_flight
+        self.release.set()
+        single_flight("music", self.inputs, self.compute())
+        self.assertEqual(single_flight("music", self.inputs, self.compute("second.wav")), "render.wav")
+        self.assertEqual(self.calls, 1)
+
+    def test_waiters_get_the_leaders_error(self):
+        leader, led = self.run_in_thread(self.compute(error="provider down"))
+        time.sleep(0.05)
+        follower, followed = self.run_in_thread(self.compute())
+        time.sleep(0.05)
+        self.release.set()
+        leader.join(5)
+        follower.join(5)
+        self.assertEqual(self.calls, 1)
+        self.assertIsInstance(led["error"], ValueError)
+        self.assertIsInstance(followed["error"], RuntimeError)
+        self.assertEqual(str(followed["error"]), "provider down")
+
+    def test_stale_error_from_another_leader_is_ignored(self):
+        lock_key, result_key = self.keys()
+        cache.set(lock_key, "current-leader", 5)
+        cache.set(result_key, {"error": "old failure", "token": "previous-leader"}, 30)
+        self.release.set()
+        thread, outcome = self.run_in_thread(self.compute())
+        time.sleep(0.05)
+        # The current leader dies without writing a result
+        cache.delete(lock_key)
+        thread.join(5)
+        self.assertEqual(outcome, {"value": "render.wav"})
+        self.assertEqual(self.calls, 1)
+
+    def test_takes_over_when_lock_disappears(self):
+        lock_key, result_key = self.keys()
+        cache.set(lock_key, "crashed-worker", 5)
+        self.release.set()
+        thread, outcome = self.run_in_thread(self.compute())
+        time.sleep(0.05)
+        self.assertEqual(self.calls, 0)
+        cache.delete(lock_key)
+        thread.join(5)
+        self.assertEqual(outcome, {"value": "render.wav"})
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(cache.get(result_key), {"value": "render.wav"})
+        self.assertIsNone(cache.get(lock_key))
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_ranges(self):
+        from .audio_serving import parse_range
+        cases = [
+            ("bytes=0-99", 1000, (0, 99)),
+            ("bytes=900-", 1000, (900, 999)),
+            ("bytes=500-5000", 1000, (500, 999)),
+            ("bytes=-100", 1000, (900, 999)),
+            ("bytes=-5000", 1000, (0, 999)),
+            # Whole file: no header, multiple ranges, other units, invalid spec
+            ("", 1000, None),
+            ("bytes=0-99,200-299", 1000, None),
+            ("items=0-1", 1000, None),
+            ("bytes=-", 1000, None),
+            ("bytes=99-0", 1000, None),
+            # Unsatisfiable
+            ("bytes=1000-", 1000, False),
+            ("bytes=-0", 1000, False),
+            ("bytes=-10", 0, False),
+        ]
+        for header, size, expected in cases:
+            with self.subTest(header=header, size=size):
+                self.assertEqual(parse_range(header, size), expected)
+
+
+class ServeAudioRangeTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        setting = override_settings(
+            TEMP_AUDIO_DIR=directory, AUDIO_ACCEL_REDIRECT_PREFIX="", AUDIO_SIGNED_URLS=False,
+        )
+        setting.enable()
+        self.addCleanup(setting.disable)
+        self.data = bytes(range(256)) * 4
+        with open(os.path.join(directory, "take.wav"), "wb") as f:
+            f.write(self.data)
+        self.url = reverse("serve_audio", args=["take.wav"])
+
+    def get(self, **headers):
+        response = self.client.get(self.url, **headers)
+        self.addCleanup(response.close)
+        return response
+
+    def test_whole_file_without_range(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(b"".join(response.streaming_content), self.data)
+
+    def test_partial_content(self):
+        response = self.get(HTTP_RANGE="bytes=100-199")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 100-199/1024")
+        self.assertEqual(response["Content-Length"], "100")
+        self.assertEqual(b"".join(response.streaming_content), self.data[100:200])
+
+    def test_suffix_and_open_ended_ranges(self):
+        response = self.get(HTTP_RANGE="bytes=-24")
+        self.assertEqual(response["Content-Range"], "bytes 1000-1023/1024")
+        self.assertEqual(b"".join(response.streaming_content), self.data[-24:])
+        response = self.get(HTTP_RANGE="bytes=1000-")
+        self.assertEqual(response["Content-Length"], "24")
+        self.assertEqual(b"".join(response.streaming_content), self.data[1000:])
+
+    def test_unsatisfiable_range(self):
+        response = self.get(HTTP_RANGE="bytes=2048-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */1024")
+
+    def test_multiple_ranges_get_whole_file(self):
+        response = self.get(HTTP_RANGE="bytes=0-9,20-29")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.data)
+
+    def test_stale_if_range_gets_whole_file(self):
+        response = self.get(HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        response = self.get(HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+
+
+WAV_HEADER = b"RIFF\x24\x00\x00\x00WAVEfmt "
+
+
+@override_settings(CACHES=LOCMEM_CACHE, ADMISSION_ENABLED=False, COALESCE_ENABLED=False, MAX_AUDIO_SIZE_MB=1)
+class AudioUploadTests(TestCase):
+    def handler(self, content_length=None):
+        from .uploads import AudioUploadHandler
+        handler = AudioUploadHandler(RequestFactory().post("/api/transcribe/"))
+        handler.handle_raw_input(None, {}, content_length, b"boundary")
+        handler.new_file("audio_file", "take.wav", "audio/wav", None)
+        self.addCleanup(handler.upload_interrupted)
+        return handler
+
+    def post(self, data):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        upload = SimpleUploadedFile("take.wav", data, content_type="audio/wav")
+        return self.client.post(reverse("transcribe"), {"audio_file": upload})
+
+    def test_spools_hashes_and_detects_container(self):
+        import hashlib
+        handler = self.handler()
+        data = WAV_HEADER + b"\x00" * 5000
+        for start in range(0, len(data), 1000):
+            handler.receive_data_chunk(data[start:start + 1000], start)
+        uploaded = handler.file_complete(len(data))
+        self.assertEqual(uploaded.container, "wav")
+        self.assertEqual(uploaded.sha256, hashlib.sha256(data).hexdigest())
+        self.assertEqual(uploaded.read(), data)
+
+    def test_header_split_across_chunks(self):
+        handler = self.handler()
+        handler.receive_data_chunk(WAV_HEADER[:5], 0)
+        handler.receive_data_chunk(WAV_HEADER[5:] + b"\x00" * 10, 5)
+        self.assertEqual(handler.file_complete(len(WAV_HEADER) + 10).container, "wav")
+
+    def test_rejects_non_audio_on_first_chunk(self):
+        from .uploads import UploadRejected
+        handler = self.handler()
+        with self.assertRaises(UploadRejected) as caught:
+            handler.receive_data_chunk(b"%PDF-1.7\n" + b"\x00" * 100, 0)
+        self.assertEqual(caught.exception.status_code, 415)
+        self.assertEqual(handler.file.tell(), 0)
+
+    def test_rejects_oversized_content_length_before_reading(self):
+        from .uploads import MULTIPART_OVERHEAD_BYTES, UploadRejected
+        with self.assertRaises(UploadRejected) as caught:
+            self.handler(content_length=1024 * 1024 + MULTIPART_OVERHEAD_BYTES + 1)
+        self.assertEqual(caught.exception.status_code, 413)
+
+    def test_stops_streaming_past_the_limit(self):
+        from .uploads import UploadRejected
+        handler = self.handler()
+        handler.receive_data_chunk(WAV_HEADER + b"\x00" * (1024 * 1024 - len(WAV_HEADER)), 0)
+        with self.assertRaises(UploadRejected) as caught:
+            handler.receive_data_chunk(b"\x00", 1024 * 1024)
+        self.assertEqual(caught.exception.status_code, 413)
+
+    def test_transcribe_rejects_oversized_upload_with_413(self):
+        from .uploads import AudioUploadHandler
+        with mock.patch.object(AudioUploadHandler, "new_file", autospec=True,
+                               side_effect=AudioUploadHandler.new_file) as new_file, \
+                mock.patch("api.views._transcribe_upload") as transcribe:
+            response = self.post(WAV_HEADER + b"\x00" * (2 * 1024 * 1024))
+        self.assertEqual(response.status_code, 413)
+        self.assertIn("too large", response.json()["error"])
+        # Content-Length alone decided: no file part was started
+        new_file.assert_not_called()
+        transcribe.assert_not_called()
+
+    def test_transcribe_rejects_non_audio_with_415(self):
+        with mock.patch("api.views._transcribe_upload") as transcribe:
+            response = self.post(b"<html><body>not audio</body></html>")
+        self.assertEqual(response.status_code, 415)
+        transcribe.assert_not_called()
+
+    def test_transcribe_accepts_audio(self):
+        with mock.patch("api.views._transcribe_upload", return_value="la la la") as transcribe:
+            response = self.post(WAV_HEADER + b"\x00" * 100)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["transcribed_text"], "la la la")
+        self.assertEqual(transcribe.call_args.args[0].container, "wav")
+
+
+class PeakAccumulatorTests(SimpleTestCase):
+    def samples(self, frames=10000, channels=2):
+        import numpy as np
+        return np.random.default_rng(7).uniform(-1, 1, (frames, channels)).astype(np.float32)
+
+    def feed(self, samples, block_frames, samples_per_peak=256):
+        from .waveform import PeakAccumulator
+        accumulator = PeakAccumulator(44100, samples_per_peak)
+        for start in range(0, len(samples), block_frames):
+            accumulator.add(samples[start:start + block_frames])
+        return accumulator
+
+    def test_block_size_does_not_change_peaks(self):
+        samples = self.samples()
+        expected = self.feed(samples, len(samples)).finish(overview_points=16)
+        for block_frames in (1, 100, 255, 256, 257, 4096):
+            with self.subTest(block_frames=block_frames):
+                self.assertEqual(self.feed(samples, block_frames).finish(overview_points=16), expected)
+
+    def test_partial_final_bucket(self):
+        samples = self.samples(frames=1000)
+        mins, maxs = self.feed(samples, 300).peaks()
+        # 3 full buckets of 256 frames and one of 232
+        self.assertEqual(len(mins), 4)
+        self.assertEqual(mins[3], samples[768:].min())
+        self.assertEqual(maxs[3], samples[768:].max())
+        self.assertEqual(mins[2], samples[512:768].min())
+        document = self.feed(samples, 300).finish()
+        self.assertEqual(document["duration"], round(1000 / 44100, 3))
+        self.assertEqual(document["levels"][0]["length"], 4)
+
+    def test_channels_are_folded(self):
+        import numpy as np
+        samples = np.zeros((256, 2), dtype=np.float32)
+        samples[10, 0], samples[20, 1] = -0.5, 0.75
+        mins, maxs = self.feed(samples, 256).peaks()
+        self.assertEqual((mins[0], maxs[0]), (-0.5, 0.75))
+
+    def test_empty_input(self):
+        from .waveform import PeakAccumulator
+        accumulator = PeakAccumulator(44100)
+        accumulator.add(self.samples(frames=0))
+        document = accumulator.finish()
+        self.assertEqual(document["duration"], 0)
+        self.assertEqual(document["overview"]["data"], [])
+
+    def test_levels_merge_until_overview_size(self):
+        document = self.feed(self.samples(frames=256 * 100), 1000).finish(overview_points=10)
+        self.assertEqual([level["length"] for level in document["levels"]], [100, 25, 7])
+        self.assertEqual([level["samples_per_peak"] for level in document["levels"]], [256, 1024, 4096])
+
+    def test_overview_downsamples_to_points(self):
+        import numpy as np
+        from .waveform import _overview
+        mins = np.linspace(-1, 0, 1000, dtype=np.float32)
+        maxs = np.linspace(0, 1, 1000, dtype=np.float32)
+        overview = _overview(mins, maxs, 8, 256)
+        self.assertEqual(overview["length"], 8)
+        self.assertEqual(overview["samples_per_peak"], 256 * 1000 // 8)
+        self.assertEqual(len(overview["data"]), 16)
+        # Buckets span the whole file: the first holds the global min, the last the global max
+        self.assertEqual(overview["data"][0], -127)
+        self.assertEqual(overview["data"][-1], 127)
+
+    def test_overview_keeps_short_files(self):
+        import numpy as np
+        from .waveform import _overview
+        peaks = np.array([-0.5, 0.5], dtype=np.float32)
+        overview = _overview(peaks, peaks, 8, 256)
+        self.assertEqual(overview, {"samples_per_peak": 256, "length": 2, "data": [-64, -64, 64, 64]})
+
+
+@override_settings(CACHES=LOCMEM_CACHE, TEMP_AUDIO_TTL_SECONDS=3600, TEMP_AUDIO_MAX_BYTES=0)
+class TempAudioSweepTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        setting = override_settings(TEMP_AUDIO_DIR=self.directory)
+        setting.enable()
+        self.addCleanup(setting.disable)
+
+    def add_file(self, name, size=100, idle_seconds=0):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import AudioFile
+        with open(os.path.join(self.directory, name), "wb") as f:
+            f.write(b"\x00" * size)
+        AudioFile.objects.create(
+            name=name, size_bytes=size, last_accessed_at=timezone.now() - timedelta(seconds=idle_seconds)
+        )
+
+    def remaining(self):
+        from .models import AudioFile
+        return sorted(AudioFile.objects.values_list("name", flat=True))
+
+    def song(self, **urls):
+        return Song.objects.create(title="Take", lyrics="la", **urls)
+
+    def test_expires_idle_files(self):
+        from .temp_audio import sweep
+        self.add_file("old.wav", idle_seconds=7200)
+        self.add_file("new.wav", idle_seconds=60)
+        self.assertEqual(sweep()["expired"], 1)
+        self.assertEqual(self.remaining(), ["new.wav"])
+        self.assertFalse(os.path.exists(os.path.join(self.directory, "old.wav")))
+
+    def test_evicts_least_recently_used_over_quota(self):
+        from .temp_audio import sweep
+        for name, idle in [("a.wav", 300), ("b.wav", 200), ("c.wav", 100)]:
+            self.add_file(name, idle_seconds=idle)
+        with override_settings(TEMP_AUDIO_MAX_BYTES=150):
+            result = sweep()
+        self.assertEqual(result["evicted"], 2)
+        self.assertEqual(result["total_bytes"], 100)
+        self.assertEqual(self.remaining(), ["c.wav"])
+
+    def test_pinned_files_survive(self):
+        from .temp_audio import sweep
+        self.add_file("kept.wav", idle_seconds=7200)
+        self.add_file("loose.wav", idle_seconds=7200)
+        self.song(mix_url="https://example.com/temp-audio/kept.wav")
+        with override_settings(TEMP_AUDIO_MAX_BYTES=1):
+            sweep()
+        self.assertEqual(self.remaining(), ["kept.wav"])
+
+    def test_song_stores_file_names(self):
+        song = self.song(mix_url="https://example.com/temp-audio/mix.wav?sig=abc", vocals_url="")
+        self.assertEqual((song.mix_file, song.vocals_file), ("mix.wav", ""))
+        song.mix_url = "/temp-audio/other.wav"
+        song.save(update_fields=["mix_url"])
+        song.refresh_from_db()
+        self.assertEqual(song.mix_file, "other.wav")
+
+    def test_deleting_a_song_unpins_only_unshared_files(self):
+        from .models import AudioFile
+        for name in ["shared.wav", "own.wav", "ab.wav", "b.wav"]:
+            self.add_file(name)
+        kept = self.song(mix_url="/temp-audio/shared.wav", vocals_url="/temp-audio/ab.wav")
+        deleted = self.song(instrumental_url="/temp-audio/shared.wav", mix_url="/temp-audio/own.wav",
+                            vocals_url="/temp-audio/b.wav")
+        deleted.delete()
+        pinned = dict(AudioFile.objects.values_list("name", "pinned"))
+        # ab.wav ends with b.wav, but only an exact match keeps a file pinned
+        self.assertEqual(pinned, {"shared.wav": True, "own.wav": False, "ab.wav": True, "b.wav": False})
+        kept.delete()
+        self.assertFalse(AudioFile.objects.filter(pinned=True).exists())
+
+    def test_bulk_created_songs_store_file_names(self):
+        user = get_user_model().objects.create_user(username="bulk", password="pw-12345678")
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.post(reverse("songs_bulk"), [
+            {"title": "One", "lyrics": "la", "mix_url": "https://example.com/temp-audio/one.wav"},
+        ], format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Song.objects.get(pk=response.json()["ids"][0]).mix_file, "one.wav")
+
+    def test_migration_fills_file_names(self):
+        import importlib
+        from django.apps import apps
+        from django.db import connection
+        migration = importlib.import_module("api.migrations.0003_song_audio_files")
+        song = self.song(mix_url="/temp-audio/late.wav?sig=abc")
+        Song.objects.filter(pk=song.pk).update(mix_file="")
+        migration.fill_audio_file_names(apps, mock.Mock(connection=connection))
+        song.refresh_from_db()
+        self.assertEqual(song.mix_file, "late.wav")
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHE, AUDIO_ACCEL_REDIRECT_PREFIX="", AUDIO_SIGNED_URLS=False, AUDIO_VARIANTS_EAGER="",
+)
+class AudioStoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        setting = override_settings(TEMP_AUDIO_DIR=self.directory)
+        setting.enable()
+        self.addCleanup(setting.disable)
+
+    def render(self, name, content=b"RIFF" + b"\x01" * 100):
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def test_identical_renders_collapse(self):
+        from .audio_store import is_content_addressed, store_audio_file
+        first, second = self.render("mix_1.wav"), self.render("mix_2.wav")
+        stored = store_audio_file(first)
+        self.assertEqual(store_audio_file(second), stored)
+        self.assertTrue(is_content_addressed(os.path.basename(stored)))
+        self.assertEqual(os.listdir(self.directory), [os.path.basename(stored)])
+        self.assertFalse(os.path.exists(first))
+        self.assertFalse(os.path.exists(second))
+        # Already stored: returned as is
+        self.assertEqual(store_audio_file(stored), stored)
+
+    def test_different_renders_stay_apart(self):
+        from .audio_store import store_audio_file
+        first = store_audio_file(self.render("mix_1.wav"))
+        second = store_audio_file(self.render("mix_2.wav", b"RIFF" + b"\x02" * 100))
+        self.assertNotEqual(first, second)
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+    def test_missing_file(self):
+        from .audio_store import store_audio_file
+        with self.assertRaises(RuntimeError):
+            store_audio_file(os.path.join(self.directory, "gone.wav"))
+
+    def test_sidecar_moves_with_file(self):
+        from .audio_store import WAVEFORM_SUFFIX, sidecar_path, store_audio_file
+        source = self.render("mix_1.wav")
+        self.render("mix_1" + WAVEFORM_SUFFIX, b'{"peaks": []}')
+        stored = store_audio_file(source)
+        with open(sidecar_path(stored, WAVEFORM_SUFFIX), "rb") as f:
+            self.assertEqual(f.read(), b'{"peaks": []}')
+        self.assertFalse(os.path.exists(sidecar_path(source, WAVEFORM_SUFFIX)))
+
+        # A duplicate's sidecar is dropped; the stored one is kept
+        duplicate = self.render("mix_2.wav")
+        self.render("mix_2" + WAVEFORM_SUFFIX, b'{"peaks": [1]}')
+        store_audio_file(duplicate)
+        self.assertFalse(os.path.exists(sidecar_path(duplicate, WAVEFORM_SUFFIX)))
+        with open(sidecar_path(stored, WAVEFORM_SUFFIX), "rb") as f:
+            self.assertEqual(f.read(), b'{"peaks": []}')
+
+    def get(self, name, **headers):
+        response = self.client.get(reverse("serve_audio", args=[name]), **headers)
+        self.addCleanup(response.close)
+        return response
+
+    def test_stored_file_is_served_immutable(self):
+        from .audio_store import IMMUTABLE_CACHE_CONTROL, store_audio_file
+        name = os.path.basename(store_audio_file(self.render("mix_1.wav")))
+        response = self.get(name)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], IMMUTABLE_CACHE_CONTROL)
+        # Strong ETag: the content hash, no W/ prefix
+        self.assertEqual(response["ETag"], '"%s"' % name.split(".")[0])
+        self.assertEqual(self.get(name, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+    def test_unhashed_file_revalidates(self):
+        from .audio_store import REVALIDATE_CACHE_CONTROL
+        self.render("legacy.wav")
+        response = self.get("legacy.wav")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], REVALIDATE_CACHE_CONTROL)
+        self.assertFalse(response["ETag"].startswith("W/"))
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHE, AUDIO_ACCEL_REDIRECT_PREFIX="", AUDIO_SIGNED_URLS=False, AUDIO_VARIANTS_EAGER="",
+)
+class VariantServingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        setting = override_settings(TEMP_AUDIO_DIR=self.directory)
+        setting.enable()
+        self.addCleanup(setting.disable)
+        self.master = "a" * 64 + ".wav"
+        with open(os.path.join(self.directory, self.master), "wb") as f:
+            f.write(b"RIFF" + b"\x00" * 100)
+        self.executor = mock.Mock()
+        patcher = mock.patch("api.utils.get_cpu_executor", return_value=self.executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, **params):
+        response = self.client.get(reverse("serve_audio", args=[self.master]), params)
+        self.addCleanup(response.close)
+        return response
+
+    def test_miss_serves_master_and_schedules_low_priority_transcode(self):
+        from .scheduling import LOW
+        from .variants import _build_quietly
+        with mock.patch("api.variants.transcode") as transcode:
+            response = self.get(format="opus")
+            self.get(format="opus")
+        transcode.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "audio/wav")
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        # Two misses, one queued transcode
+        self.executor.submit_with_priority.assert_called_once_with(LOW, _build_quietly, self.master, "opus", 96)
+
+    def test_built_variant_is_served(self):
+        from .variants import _build_quietly, variant_name, variants_dir
+
+        def transcode(master_path, output_path, fmt, bitrate):
+            with open(output_path, "wb") as f:
+                f.write(b"OggS" + b"\x00" * 10)
+
+        with mock.patch("api.variants.transcode", side_effect=transcode):
+            self.get(format="opus")
+            _build_quietly(*self.executor.submit_with_priority.call_args.args[2:])
+        self.assertTrue(os.path.exists(os.path.join(variants_dir(), variant_name(self.master, "opus", 96))))
+        response = self.get(format="opus")
+        self.assertEqual(response["Content-Type"], "audio/ogg")
+        self.assertIn("immutable", response["Cache-Control"])
+
+    def test_failed_build_can_be_rescheduled(self):
+        from .variants import _build_quietly
+        with mock.patch("api.variants.transcode", side_effect=RuntimeError("no ffmpeg")):
+            self.get(format="mp3")
+            _build_quietly(*self.executor.submit_with_priority.call_args.args[2:])
+            self.get(format="mp3")
+        self.assertEqual(self.executor.submit_with_priority.call_count, 2)
+
+
+class SchedulingTests(SimpleTestCase):
+    weights = {"high": 6, "normal": 3, "low": 1}
+
+    def executor(self):
+        from .scheduling import PriorityExecutor
+        executor = PriorityExecutor(max_workers=1, thread_name_prefix="test", weights=self.weights)
+        self.addCleanup(executor.shutdown, True, cancel_futures=True)
+        return executor
+
+    def block(self, executor):
+        """Occupy the only worker until the returned event is set."""
+        release, started = threading.Event(), threading.Event()
+
+        def blocker():
+            started.set()
+            release.wait(5)
+        self.addCleanup(release.set)
+        future = executor.submit(blocker)
+        started.wait(5)
+        return release, future
+
+    def test_picker_interleaves_by_weight(self):
+        from .scheduling import WeightedPicker
+        picker = WeightedPicker(self.weights)
+        picks = [picker.pick(["high", "normal", "low"]) for _ in range(20)]
+        self.assertEqual(picks[:10], ["high", "normal", "high", "high", "normal",
+                                      "high", "low", "high", "normal", "high"])
+        # The pattern repeats every sum(weights) picks
+        self.assertEqual(picks[10:], picks[:10])
+
+    def test_picker_skips_empty_classes(self):
+        from .scheduling import WeightedPicker
+        picker = WeightedPicker(self.weights)
+        self.assertIsNone(picker.pick([]))
+        self.assertEqual({picker.pick(["low"]) for _ in range(5)}, {"low"})
+        picks = [picker.pick(["normal", "low"]) for _ in range(8)]
+        self.assertEqual((picks.count("normal"), picks.count("low")), (6, 2))
+
+    def test_queued_work_runs_by_priority(self):
+        from .scheduling import HIGH, LOW, NORMAL
+        executor = self.executor()
+        release, _ = self.block(executor)
+        order = []
+        futures = [executor.submit_with_priority(priority, order.append, priority)
+                   for priority in (LOW, NORMAL, HIGH, HIGH)]
+        self.assertEqual(executor.queue_depths(), {"high": 2, "normal": 1, "low": 1})
+        release.set()
+        for future in futures:
+            future.result(5)
+        self.assertEqual(order, ["high", "normal", "high", "low"])
+
+    def test_shutdown_cancels_queued_futures(self):
+        executor = self.executor()
+        release, running = self.block(executor)
+        queued = [executor.submit(time.sleep, 0) for _ in range(3)]
+        executor.shutdown(wait=False, cancel_futures=True)
+        self.assertTrue(all(future.cancelled() for future in queued))
+        with self.assertRaises(RuntimeError):
+            executor.submit(time.sleep, 0)
+        release.set()
+        self.assertIsNone(running.result(5))
+
+    def test_work_runs_in_the_submitters_context(self):
+        import contextvars
+        request_id = contextvars.ContextVar("request_id", default=None)
+        executor = self.executor()
+        token = request_id.set("req-42")
+        try:
+            future = executor.submit(request_id.get)
+        finally:
+            request_id.reset(token)
+        self.assertEqual(future.result(5), "req-42")
+        # Changes inside the task stay in its copy of the context
+        executor.submit(request_id.set, "changed").result(5)
+        self.assertIsNone(request_id.get())
+
+
+NO_PROVIDERS = dict(
+    OPENAI_API_KEY=None, GROQ_API_KEY=None, TOGETHER_API_KEY=None, MUBERT_API_KEY=None,
+    SUNO_API_KEY=None, HUGGINGFACE_API_TOKEN=None,
+)
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHE, ADMISSION_ENABLED=False, COALESCE_ENABLED=False,
+    AUDIO_VARIANTS_EAGER="", **NO_PROVIDERS,
+)
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        import importlib
+        from django.urls import clear_url_caches
+        import api.urls
+        import config.urls
+
+        def route(modules):
+            for module in modules:
+                importlib.reload(module)
+            clear_url_caches()
+
+        # urls.py picks the async views at import time; cleanups run in reverse,
+        # so the sync routes come back after ASYNC_VIEWS is switched off again
+        self.addCleanup(route, [api.urls, config.urls])
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        setting = override_settings(ASYNC_VIEWS=True, TEMP_AUDIO_DIR=self.directory)
+        setting.enable()
+        self.addCleanup(setting.disable)
+        route([api.urls, config.urls])
+
+    def test_routes_to_async_views(self):
+        from django.urls import resolve
+        self.assertTrue(asyncio.iscoroutinefunction(resolve(reverse("mix_audio")).func))
+
+    async def test_post_only(self):
+        for name in ("generate_lyrics", "generate_instrumental", "generate_vocals", "mix_audio"):
+            with self.subTest(name=name):
+                response = await self.async_client.get(reverse(name))
+                self.assertEqual(response.status_code, 405)
+
+    async def test_missing_fields(self):
+        cases = [
+            ("generate_lyrics", "input_text is required"),
+            ("generate_instrumental", "lyrics is required"),
+            ("generate_vocals", "lyrics is required"),
+            ("mix_audio", "instrumental_url and vocals_url are required"),
+        ]
+        for name, error in cases:
+            with self.subTest(name=name):
+                response = await self.async_client.post(reverse(name), {}, content_type="application/json")
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()["error"], error)
+
+    async def test_unknown_mix_mode(self):
+        data = {"instrumental_url": "/temp-audio/a.wav", "vocals_url": "/temp-audio/b.wav", "mode": "loud"}
+        with mock.patch("api.async_views.temp_audio_path") as temp_audio_path, \
+                mock.patch("api.async_views.asingle_flight") as single_flight:
+            response = await self.async_client.post(reverse("mix_audio"), data, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("mode must be one of", response.json()["error"])
+        temp_audio_path.assert_not_called()
+        single_flight.assert_not_called()
+
+    def test_sync_view_rejects_unknown_mix_mode(self):
+        from rest_framework.test import APIRequestFactory
+        from . import views
+        data = {"instrumental_url": "/temp-audio/a.wav", "vocals_url": "/temp-audio/b.wav", "mode": "loud"}
+        with mock.patch("api.views.temp_audio_path") as temp_audio_path, \
+                mock.patch("api.views.single_flight") as single_flight:
+            response = views.mix_audio(APIRequestFactory().post("/api/mix-audio/", data, format="json"))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("mode must be one of", response.data["error"])
+        temp_audio_path.assert_not_called()
+        single_flight.assert_not_called()
+
+    def test_request_data(self):
+        from .async_views import _request_data
+        factory = RequestFactory()
+        cases = [
+            (factory.post("/", {"genre": "rock"}, content_type="application/json"), {"genre": "rock"}),
+            (factory.post("/", {"genre": "rock", "input_text": "rain"}), {"genre": "rock", "input_text": "rain"}),
+            (factory.post("/", "not json", content_type="application/json"), {}),
+            (factory.post("/", ["a", "list"], content_type="application/json"), {}),
+            (factory.post("/", b"", content_type="application/json"), {}),
+        ]
+        for request, expected in cases:
+            with self.subTest(body=request.body):
+                self.assertEqual(_request_data(request), expected)
+
+    async def test_lyrics_fall_back_without_providers(self):
+        response = await self.async_client.post(
+            reverse("generate_lyrics"), {"input_text": "rain on a tin roof", "genre": "folk"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["genre"], "folk")
+        self.assertTrue(response.json()["lyrics"])
+
+    def stems(self):
+        from .audio_stream import AudioBuffer
+        names = []
+        for name, frequency in (("instrumental.wav", 220.0), ("vocals.wav", 440.0)):
+            AudioBuffer(_tone(0.5, 22050, frequency), 22050).write_wav(os.path.join(self.directory, name))
+            names.append(f"/temp-audio/{name}")
+        return {"instrumental_url": names[0], "vocals_url": names[1], "genre": "pop", "mode": "stream"}
+
+    async def test_mix_matches_the_sync_view(self):
+        from rest_framework.test import APIRequestFactory
+        from . import views
+        data = self.stems()
+        request = APIRequestFactory().post("/api/mix-audio/", data, format="json")
+        sync_response = await sync_to_async(views.mix_audio)(request)
+        async_response = await self.async_client.post(reverse("mix_audio"), data, content_type="application/json")
+        self.assertEqual(sync_response.status_code, 200)
+        self.assertEqual(async_response.status_code, 200)
+        expected, actual = sync_response.data, async_response.json()
+        self.assertEqual(set(actual), set(expected))
+        for key in ("url", "format", "duration", "waveform"):
+            with self.subTest(key=key):
+                self.assertEqual(actual[key], expected[key])
+
+
+class RequestIDTests(TestCase):
+    def test_request_id_is_echoed_or_generated(self):
+        response = self.client.get(reverse("health_check"), HTTP_X_REQUEST_ID="abc-123")
+        self.assertEqual(response["X-Request-ID"], "abc-123")
+
+        response = self.client.get(reverse("health_check"), HTTP_X_REQUEST_ID="bad id\n")
+        self.assertRegex(response["X-Request-ID"], r"^[0-9a-f]{32}$")
+
+
+class BenchmarkCompareTests(SimpleTestCase):
+    def test_regressions_beyond_threshold(self):
+        baseline = {
+            "mix.stream.30s": {"wall_median": 1.0, "alloc_peak_mb": 10.0},
+            "lyrics.template": {"wall_median": 0.001, "alloc_peak_mb": 0.1},
+            "mix.master.30s": {"skipped": "needs ffmpeg"},
+        }
+        current = {
+            "mix.stream.30s": {"wall_median": 1.1, "alloc_peak_mb": 13.0},
+            "lyrics.template": {"wall_median": 0.002, "alloc_peak_mb": 0.1},
+            "mix.master.30s": {"wall_median": 5.0, "alloc_peak_mb": 1.0},
+            "songs.list.10": {"wall_median": 0.01, "alloc_peak_mb": 0.5},
+        }
+        regressions = compare(current, baseline, threshold=0.2)
+        self.assertEqual(
+            [(name, metric) for name, metric, *_ in regressions],
+            [("mix.stream.30s", "alloc_peak_mb"), ("lyrics.template", "wall_median")],
+        )
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def test_profiles_only_authorized_requests(self):
+        with override_settings(PROFILING_TOKEN="secret", PROFILING_DIR=self.directory):
+            client = self.client_class()
+            plain = client.get(reverse("health_check"), HTTP_X_PROFILE="wrong")
+            profiled = client.get(reverse("health_check"), HTTP_X_PROFILE="secret")
+        self.assertNotIn("X-Profile-Id", plain)
+        profile_id = profiled["X-Profile-Id"]
+        files = os.listdir(os.path.join(self.directory, profile_id))
+        self.assertIn("stacks.collapsed", files)
+        self.assertIn("memory.snapshot", files)
+        with open(os.path.join(self.directory, profile_id, "meta.json")) as f:
+            self.assertEqual(json.load(f)["view"], "health_check")
+
+
+# Cold start of a worker or management command: settings, apps and every
+# view module the URLconf reaches (async_views too, for ASGI)
+STARTUP_SCRIPT = """
+import json, os, sys, time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+started = time.perf_counter()
+import django
+django.setup()
+import config.urls, api.async_views
+heavy = sorted(name for name in ('torch', 'transformers', 'pydub', 'numpy') if name in sys.modules)
+print(json.dumps({'seconds': time.perf_counter() - started, 'heavy': heavy}))
+"""
+
+
+class StartupTimeTests(SimpleTestCase):
+    def test_cold_start_within_budget(self):
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True, timeout=120,
+        ).stdout
+        startup = json.loads(output.strip().splitlines()[-1])
+        self.assertEqual(startup["heavy"], [], "heavy libraries must be imported where they are used")
+        self.assertLess(
+            startup["seconds"], settings.STARTUP_BUDGET_SECONDS,
+            'cold start over budget; see python -X importtime -c "import django; django.setup(); import config.urls"',
+        )
@@ -0,0 +1,145 @@
+"""
+Streaming handler for audio uploads.
+
+Django's default handlers keep uploads up to FILE_UPLOAD_MAX_MEMORY_SIZE
+in RAM. AudioUploadHandler instead writes each chunk to a
+SpooledTemporaryFile that moves to disk past UPLOAD_SPOOL_MAX_BYTES, so a
+worker holds at most a few MB per upload whatever the file size. While
+the chunks stream in it:
+
+- hashes the content (``uploaded_file.sha256``)
+- checks the container's magic bytes on the first chunk and stops an
+  upload that is not audio (415)
+- stops an upload as soon as it passes MAX_AUDIO_SIZE_MB (413), or before
+  reading anything when Content-Length already says it is too big
+
+Rejected uploads raise UploadRejected out of request.FILES without the
+rest of the body being read.
+"""
+
+import functools
+import hashlib
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+
+
+# Leading bytes needed to recognise every supported container
+HEADER_BYTES = 12
+# Multipart boundaries and headers around the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadRejected(Exception):
+    """Raised while streaming an upload that is too large or not audio."""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def detect_audio_container(header: bytes) -> str:
+    """Container name from a file's leading bytes, or '' if not audio."""
+    if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+        return 'wav'
+    if header[:3] == b'ID3':
+        return 'mp3'
+    if header[4:8] == b'ftyp':
+        return 'mp4'
+    if header[:4] == b'OggS':
+        return 'ogg'
+    if header[:4] == b'fLaC':
+        return 'flac'
+    if header[:4] == b'\x1a\x45\xdf\xa3':
+        return 'webm'
+    if len(header) >= 2 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0:
+        # MPEG audio or ADTS AAC frame sync
+        return 'mpeg'
+    return ''
+
+
+def max_upload_bytes() -> int:
+    return getattr(settings, 'MAX_AUDIO_SIZE_MB', 100) * 1024 * 1024
+
+
+class SpooledAudioFile(UploadedFile):
+    """Uploaded audio in a SpooledTemporaryFile, with its hash and container."""
+
+    def __init__(self, file, name, content_type, size, charset, content_type_extra,
+                 sha256: str, container: str):
+        super().__init__(file, name, content_type, size, charset, content_type_extra)
+        self.sha256 = sha256
+        self.container = container
+
+
+class AudioUploadHandler(FileUploadHandler):
+    """Spool, hash and validate audio uploads chunk by chunk."""
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.max_bytes = max_upload_bytes()
+        if content_length and content_length > self.max_bytes + MULTIPART_OVERHEAD_BYTES:
+            raise self._too_large()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        spool_bytes = getattr(settings, 'UPLOAD_SPOOL_MAX_BYTES', 2 * 1024 * 1024)
+        self.file = tempfile.SpooledTemporaryFile(
+            max_size=spool_bytes, dir=getattr(settings, 'FILE_UPLOAD_TEMP_DIR', None)
+        )
+        self.digest = hashlib.sha256()
+        self.header = b''
+        self.container = ''
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.max_bytes:
+            raise self._too_large()
+        if not self.container:
+            self.header += raw_data[:HEADER_BYTES - len(self.header)]
+            if len(self.header) >= HEADER_BYTES:
+                self._validate()
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if not self.container:
+            # Uploads shorter than HEADER_BYTES
+            self._validate()
+        self.file.seek(0)
+        return SpooledAudioFile(
+            self.file, self.file_name, self.content_type, file_size, self.charset,
+            self.content_type_extra, sha256=self.digest.hexdigest(), container=self.container,
+        )
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file'):
+            self.file.close()
+
+    def _validate(self):
+        self.container = detect_audio_container(self.header)
+        if not self.container:
+            raise UploadRejected(
+                'Unsupported file type. Upload WAV, MP3, M4A, OGG/Opus, FLAC or WebM audio.', 415
+            )
+
+    def _too_large(self):
+        return UploadRejected(
+            f"Audio file is too large (limit {getattr(settings, 'MAX_AUDIO_SIZE_MB', 100)} MB)", 413
+        )
+
+
+def audio_upload(view):
+    """
+    Parse this view's uploads with AudioUploadHandler.
+
+    Goes above @api_view, since handlers must be set before the body is read.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        request.upload_handlers = [AudioUploadHandler(request)]
+        return view(request, *args, **kwargs)
+    return wrapper
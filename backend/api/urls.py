@@ -1,19 +1,43 @@
+from django.conf import settings
 from django.urls import path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
 from . import views
 
+# Under ASGI the provider-bound endpoints are served by their async versions
+if getattr(settings, 'ASYNC_VIEWS', False):
+    from . import async_views as generation_views
+else:
+    generation_views = views
+
 urlpatterns = [
     # Speech-to-Text
     path("transcribe/", views.transcribe, name="transcribe"),
 
     # Lyrics Generation
-    path("generate-lyrics/", views.generate_lyrics, name="generate_lyrics"),
+    path("generate-lyrics/", generation_views.generate_lyrics, name="generate_lyrics"),
 
     # Music Generation
-    path("generate-instrumental/", views.generate_instrumental, name="generate_instrumental"),
-    path("generate-vocals/", views.generate_vocals, name="generate_vocals"),
-    path("mix-audio/", views.mix_audio, name="mix_audio"),
+    path("generate-instrumental/", generation_views.generate_instrumental, name="generate_instrumental"),
+    path("generate-vocals/", generation_views.generate_vocals, name="generate_vocals"),
+    path("mix-audio/", generation_views.mix_audio, name="mix_audio"),
+
+    # One-shot song generation (lyrics -> instrumental | vocals -> mix)
+    path("generate-song/", views.generate_song, name="generate_song"),
+
+    # Background jobs
+    path("jobs/", views.submit_job, name="submit_job"),
+    path("jobs/metrics/", views.job_metrics, name="job_metrics"),
+    path("jobs/<str:job_id>/", views.job_detail, name="job_detail"),
+
+    # Admission control (concurrency budgets per stage)
+    path("admission/metrics/", views.admission_status, name="admission_metrics"),
+
+    # Prometheus metrics (stage timings, providers, caches, fallbacks)
+    path("metrics/", views.prometheus_metrics, name="metrics"),
+
+    # Progress events (Server-Sent Events)
+    path("progress/<str:channel>/", views.progress_stream, name="progress_stream"),
 
     # Auth
     path("auth/register/", views.register, name="register"),
@@ -23,6 +47,9 @@ urlpatterns = [
 
     # Songs
     path("songs/", views.list_create_songs, name="songs"),
+    path("songs/bulk/", views.bulk_create_songs, name="songs_bulk"),
+    path("songs/export/", views.export_songs, name="songs_export"),
+    path("songs/search/", views.search_library, name="songs_search"),
 
     # Utilities
     path("health/", views.health_check, name="health_check"),
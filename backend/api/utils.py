@@ -14,34 +14,79 @@ All models are open-source with permissive licenses.
 
 import os
 import json
+import time
 import uuid
-import numpy as np
+import asyncio
+import logging
+import functools
+import importlib.util
+import threading
 from pathlib import Path
 from django.conf import settings
 
-# Model availability flags
-try:
-    import torch
-    TORCH_AVAILABLE = True
-except ImportError:
-    TORCH_AVAILABLE = False
-
-try:
-    from transformers import pipeline
-    TRANSFORMERS_AVAILABLE = True
-except ImportError:
-    TRANSFORMERS_AVAILABLE = False
-
-try:
-    import pydub
-    from pydub import AudioSegment
-    PYDUB_AVAILABLE = True
-except ImportError:
-    PYDUB_AVAILABLE = False
+from .metrics import count_fallback, observe_step, provider_call, staged, timed_step
+from .progress import NULL_PROGRESS
+from .scheduling import PriorityExecutor, stage_priority
+from .waveform import PeakAccumulator, save_waveform, waveform_from_file, waveform_from_samples
+
+
+def _installed(module: str) -> bool:
+    """Whether ``module`` can be imported, found without importing it."""
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+# Model availability flags. torch, transformers and pydub (and numpy, in the
+# synthetic renderers) take seconds and hundreds of MB to import, so they
+# are only imported by the code paths that use them; processes that never
+# transcribe or render audio (auth, the song library, management commands,
+# migrations) do not load them.
+TORCH_AVAILABLE = _installed('torch')
+TRANSFORMERS_AVAILABLE = _installed('transformers')
+PYDUB_AVAILABLE = _installed('pydub')
+HTTPX_AVAILABLE = _installed('httpx')
 
 import requests
 
+logger = logging.getLogger(__name__)
+
+# Provider API roots, overridable in settings (e.g. to run against tools/mock_providers.py)
+PROVIDER_API_BASES = {
+    'openai': 'https://api.openai.com/v1',
+    'groq': 'https://api.groq.com/openai/v1',
+    'together': 'https://api.together.xyz/v1',
+    'mubert': 'https://api-b2b.mubert.com/v2',
+    'elevenlabs': 'https://api.elevenlabs.io/v1',
+}
+
 
+def provider_url(provider: str, path: str) -> str:
+    """URL of ``path`` on a provider's API (base from settings.<PROVIDER>_API_BASE)."""
+    base = getattr(settings, f'{provider.upper()}_API_BASE', None) or PROVIDER_API_BASES[provider]
+    return f"{base.rstrip('/')}/{path.lstrip('/')}"
+
+
+_whisper = None
+_whisper_lock = threading.Lock()
+
+
+def _whisper_pipeline():
+    """The Whisper pipeline, imported and loaded on first use and then kept for the process."""
+    global _whisper
+    with _whisper_lock:
+        if _whisper is None:
+            from transformers import pipeline
+            device = -1
+            if TORCH_AVAILABLE:
+                import torch
+                device = 0 if torch.cuda.is_available() else -1
+            _whisper = pipeline("automatic-speech-recognition", model="openai/whisper-base", device=device)
+        return _whisper
+
+
+@staged('transcribe')
 def transcribe_audio(audio_path: str) -> str:
     """
     Transcribe audio file to text using OpenAI Whisper.
@@ -62,74 +107,32 @@ def transcribe_audio(audio_path: str) -> str:
     
     try:
         # Use Whisper via Hugging Face transformers
-        transcriber = pipeline(
-            "automatic-speech-recognition",
-            model="openai/whisper-base",
-            device=0 if TORCH_AVAILABLE and torch.cuda.is_available() else -1
-        )
+        transcriber = _whisper_pipeline()
         result = transcriber(audio_path)
         return result['text']
     except Exception as e:
-        print(f"Transcription error: {e}")
+        logger.error("Transcription error: %s", e)
         raise RuntimeError(f"Audio transcription failed: {str(e)}. Please check if Whisper model is properly loaded.")
 
 
-def generate_song_lyrics(input_text: str, genre: str = 'pop') -> str:
+def _lyrics_provider_requests(input_text: str, genre: str) -> list:
     """
-    Generate song lyrics from a text prompt using an open LLM.
+    Build the chat-completion request for every configured lyrics provider.
     
-    Args:
-        input_text: Theme, prompt, or partial lyrics
-        genre: Music genre (pop, rock, hip-hop, etc.)
+    Providers are returned in order of preference (OpenAI, Groq, Together
+    AI) so the sync and async generators try them identically.
     
     Returns:
-        Generated song lyrics with verse/chorus structure
-    
-    Models:
-        - mistralai/Mistral-7B (Apache 2.0)
-        - EleutherAI/gpt-j-6B (Apache 2.0)
-        - meta-llama/Llama-2-7b (Meta Custom License)
-    
-    Note: This is a simplified version. Production should use proper prompting
-    and potentially fine-tuned models for song generation.
+        List of dicts with name, label, url, headers and payload
     """
+    requests_to_try = []
     
-    prompt = f"""Write song lyrics for a {genre} song based on this theme: {input_text}
-
-Format the lyrics with:
-- Verse 1: (4-6 lines)
-- Chorus: (4-6 lines)
-- Verse 2: (4-6 lines)
-- Chorus: (4-6 lines)
-- Bridge: (4-6 lines)
-- Outro: (2-4 lines)
-
-Make the lyrics creative, rhythmic, and appropriate for {genre} music."""
-
-    try:
-        # Use OpenAI-compatible API for lyrics generation
-        # Can work with OpenAI, Together AI, OpenRouter, etc.
-        import requests
-        import json
-        import random
-        
-        lyrics_generated = False
-        lyrics_result = ""
+    # OpenAI API if configured
+    openai_key = getattr(settings, 'OPENAI_API_KEY', None)
+    if openai_key and openai_key != 'your-openai-api-key-here' and openai_key != 'sk-your_openai_api_key_here':
+        system_prompt = f"""You are a professional songwriter. Write complete, creative song lyrics in {genre} style."""
         
-        # Try OpenAI API if configured
-        openai_key = getattr(settings, 'OPENAI_API_KEY', None)
-        if openai_key and openai_key != 'your-openai-api-key-here' and openai_key != 'sk-your_openai_api_key_here':
-            try:
-                print("🤖 Using OpenAI API for lyrics generation...")
-                api_url = "https://api.openai.com/v1/chat/completions"
-                headers = {
-                    "Authorization": f"Bearer {openai_key}",
-                    "Content-Type": "application/json"
-                }
-                
-                system_prompt = f"""You are a professional songwriter. Write complete, creative song lyrics in {genre} style."""
-                
-                user_prompt = f"""Write a complete {genre} song about: {input_text}
+        user_prompt = f"""Write a complete {genre} song about: {input_text}
 
 Create lyrics with this exact structure:
 [Verse 1]
@@ -151,134 +154,109 @@ Create lyrics with this exact structure:
 (2-4 lines)
 
 Make it creative, catchy, and unique. Only output the lyrics, no explanations."""
-                
-                payload = {
-                    "model": "gpt-3.5-turbo",
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    "temperature": 0.9,
-                    "max_tokens": 500
-                }
-                
-                response = requests.post(api_url, headers=headers, json=payload, timeout=30)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    lyrics_result = result['choices'][0]['message']['content'].strip()
-                    if len(lyrics_result) > 50:
-                        lyrics_generated = True
-                        print("✅ Successfully generated lyrics using OpenAI")
-                        return lyrics_result
-                else:
-                    print(f"⚠️  OpenAI API failed: {response.status_code}")
-                    
-            except Exception as e:
-                print(f"⚠️  OpenAI API error: {str(e)}")
         
-        # Try Groq API (Free tier with good models)
-        if not lyrics_generated:
-            try:
-                print("🤖 Using Groq API for lyrics generation...")
-                # Groq offers free API with fast inference
-                api_url = "https://api.groq.com/openai/v1/chat/completions"
-                
-                # Try to get Groq API key from settings
-                groq_key = getattr(settings, 'GROQ_API_KEY', None)
-                if not groq_key:
-                    # If not configured, inform user
-                    print("⚠️  Groq API key not configured. Get free key from https://console.groq.com")
-                    raise RuntimeError("Groq API not configured")
-                
-                headers = {
-                    "Authorization": f"Bearer {groq_key}",
-                    "Content-Type": "application/json"
-                }
-                
-                payload = {
-                    "model": "mixtral-8x7b-32768",  # Free fast model
-                    "messages": [
-                        {"role": "system", "content": f"You are a professional songwriter specializing in {genre} music."},
-                        {"role": "user", "content": f"Write complete song lyrics for a {genre} song about: {input_text}\n\nFormat: [Verse 1], [Chorus], [Verse 2], [Chorus], [Bridge], [Outro]\nMake it creative and unique. Only lyrics, no explanations."}
-                    ],
-                    "temperature": 0.9,
-                    "max_tokens": 500
-                }
-                
-                response = requests.post(api_url, headers=headers, json=payload, timeout=30)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    lyrics_result = result['choices'][0]['message']['content'].strip()
-                    if len(lyrics_result) > 50:
-                        lyrics_generated = True
-                        print("✅ Successfully generated lyrics using Groq")
-                        return lyrics_result
-                        
-            except Exception as e:
-                print(f"⚠️  Groq API error: {str(e)}")
-        
-        # Try Together AI (Free tier available)
-        if not lyrics_generated:
-            try:
-                print("🤖 Using Together AI for lyrics generation...")
-                api_url = "https://api.together.xyz/v1/chat/completions"
-                
-                together_key = getattr(settings, 'TOGETHER_API_KEY', None)
-                if not together_key:
-                    print("⚠️  Together AI key not configured. Get free key from https://api.together.xyz")
-                    raise RuntimeError("Together AI not configured")
-                
-                headers = {
-                    "Authorization": f"Bearer {together_key}",
-                    "Content-Type": "application/json"
-                }
-                
-                payload = {
-                    "model": "mistralai/Mixtral-8x7B-Instruct-v0.1",
-                    "messages": [
-                        {"role": "system", "content": f"Write song lyrics in {genre} style."},
-                        {"role": "user", "content": f"Create a complete {genre} song about: {input_text}\n\nFormat with [Verse 1], [Chorus], [Verse 2], [Chorus], [Bridge], [Outro]. Be creative and unique."}
-                    ],
-                    "temperature": 0.9,
-                    "max_tokens": 500
-                }
-                
-                response = requests.post(api_url, headers=headers, json=payload, timeout=30)
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    lyrics_result = result['choices'][0]['message']['content'].strip()
-                    if len(lyrics_result) > 50:
-                        lyrics_generated = True
-                        print("✅ Successfully generated lyrics using Together AI")
-                        return lyrics_result
-                        
-            except Exception as e:
-                print(f"⚠️  Together AI error: {str(e)}")
-        
-        # If all AI APIs fail, fall through to template generation
-        if not lyrics_generated:
-            print("⚠️  All AI APIs failed or not configured. Using template-based generation.")
-            print("💡 To use AI models, add one of these keys to your .env file:")
-            print("   - OPENAI_API_KEY (https://platform.openai.com/api-keys)")
-            print("   - GROQ_API_KEY (https://console.groq.com/keys) - FREE & FAST")
-            print("   - TOGETHER_API_KEY (https://api.together.xyz/settings/api-keys)")
-            raise RuntimeError("No AI API configured")
-            
-    except Exception as main_error:
-        # Fallback: Create intelligent template-based lyrics
-        print(f"⚠️  AI generation failed: {str(main_error)}")
-        print("📝 Creating template-based lyrics as fallback.")
-        
-        # Create more dynamic lyrics based on input and genre
-        words = input_text.lower().split()
-        key_word = words[0] if words else "dreams"
-        
-        # Genre-specific templates
-        if genre.lower() == 'rock':
-            lyrics_result = f"""Verse 1:
+        requests_to_try.append({
+            'name': 'openai',
+            'label': 'OpenAI',
+            'url': provider_url('openai', 'chat/completions'),
+            'headers': {
+                "Authorization": f"Bearer {openai_key}",
+                "Content-Type": "application/json"
+            },
+            'payload': {
+                "model": "gpt-3.5-turbo",
+                "messages": [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                "temperature": 0.9,
+                "max_tokens": 500
+            },
+        })
+    
+    # Groq API (Free tier with good models)
+    groq_key = getattr(settings, 'GROQ_API_KEY', None)
+    if groq_key:
+        requests_to_try.append({
+            'name': 'groq',
+            'label': 'Groq',
+            'url': provider_url('groq', 'chat/completions'),
+            'headers': {
+                "Authorization": f"Bearer {groq_key}",
+                "Content-Type": "application/json"
+            },
+            'payload': {
+                "model": "mixtral-8x7b-32768",  # Free fast model
+                "messages": [
+                    {"role": "system", "content": f"You are a professional songwriter specializing in {genre} music."},
+                    {"role": "user", "content": f"Write complete song lyrics for a {genre} song about: {input_text}\n\nFormat: [Verse 1], [Chorus], [Verse 2], [Chorus], [Bridge], [Outro]\nMake it creative and unique. Only lyrics, no explanations."}
+                ],
+                "temperature": 0.9,
+                "max_tokens": 500
+            },
+        })
+    else:
+        logger.info("Groq API key not configured. Get free key from https://console.groq.com")
+    
+    # Together AI (Free tier available)
+    together_key = getattr(settings, 'TOGETHER_API_KEY', None)
+    if together_key:
+        requests_to_try.append({
+            'name': 'together',
+            'label': 'Together AI',
+            'url': provider_url('together', 'chat/completions'),
+            'headers': {
+                "Authorization": f"Bearer {together_key}",
+                "Content-Type": "application/json"
+            },
+            'payload': {
+                "model": "mistralai/Mixtral-8x7B-Instruct-v0.1",
+                "messages": [
+                    {"role": "system", "content": f"Write song lyrics in {genre} style."},
+                    {"role": "user", "content": f"Create a complete {genre} song about: {input_text}\n\nFormat with [Verse 1], [Chorus], [Verse 2], [Chorus], [Bridge], [Outro]. Be creative and unique."}
+                ],
+                "temperature": 0.9,
+                "max_tokens": 500
+            },
+        })
+    else:
+        logger.info("Together AI key not configured. Get free key from https://api.together.xyz")
+    
+    return requests_to_try
+
+
+def _parse_lyrics_response(provider: dict, status_code: int, body) -> str:
+    """Return lyrics from a chat-completion response, or None if unusable."""
+    if status_code != 200:
+        logger.warning("%s API failed: %s", provider['label'], status_code,
+                       extra={'provider': provider['name'], 'status_code': status_code})
+        return None
+    lyrics_result = body['choices'][0]['message']['content'].strip()
+    if len(lyrics_result) > 50:
+        logger.info("Generated lyrics using %s", provider['label'], extra={'provider': provider['name']})
+        return lyrics_result
+    return None
+
+
+def _lyrics_fallback(providers: list):
+    """Count and log the switch to template lyrics."""
+    count_fallback('lyrics', 'provider_failed' if providers else 'no_provider')
+    logger.warning(
+        "All AI APIs failed or not configured. Using template-based lyrics. To use AI models, "
+        "set OPENAI_API_KEY, GROQ_API_KEY (free) or TOGETHER_API_KEY in .env.",
+        extra={'stage': 'lyrics', 'fallback': 'template'},
+    )
+
+
+def _template_lyrics(input_text: str, genre: str) -> str:
+    """Genre-specific template lyrics used when no AI provider answers."""
+    # Create more dynamic lyrics based on input and genre
+    words = input_text.lower().split()
+    key_word = words[0] if words else "dreams"
+    
+    # Genre-specific templates
+    if genre.lower() == 'rock':
+        lyrics_result = f"""Verse 1:
 Thunder in the distance, {key_word} calling my name
 Electric guitars screaming, nothing's quite the same
 {input_text} burns inside me like a raging fire
@@ -310,9 +288,9 @@ In this rock and roll song
 
 Outro:
 {input_text}... our rock and roll dream"""
-        
-        elif genre.lower() == 'hip-hop':
-            lyrics_result = f"""Verse 1:
+    
+    elif genre.lower() == 'hip-hop':
+        lyrics_result = f"""Verse 1:
 Started from the bottom, now we here with {input_text}
 Every beat's a lesson, every rhyme's a test
 {key_word} in my pocket, dreams up in my head
@@ -339,9 +317,9 @@ From the streets to the stage, this is how we roll
 Outro:
 {input_text}, yeah, that's my story
 Hip-hop forever, this is our glory"""
-        
-        else:  # Pop and other genres
-            lyrics_result = f"""Verse 1:
+    
+    else:  # Pop and other genres
+        lyrics_result = f"""Verse 1:
 Dancing through the {input_text}
 Like a {genre} melody
 Every step feels magical
@@ -374,24 +352,165 @@ In my heart, in my soul
 Outro:
 {input_text}...
 My {genre} dream come true"""
+    
+    return lyrics_result
+
+
+@staged('lyrics')
+def generate_song_lyrics(input_text: str, genre: str = 'pop') -> str:
+    """
+    Generate song lyrics from a text prompt using an open LLM.
+    
+    Args:
+        input_text: Theme, prompt, or partial lyrics
+        genre: Music genre (pop, rock, hip-hop, etc.)
+    
+    Returns:
+        Generated song lyrics with verse/chorus structure
+    
+    Models:
+        - mistralai/Mistral-7B (Apache 2.0)
+        - EleutherAI/gpt-j-6B (Apache 2.0)
+        - meta-llama/Llama-2-7b (Meta Custom License)
+    
+    Note: This is a simplified version. Production should use proper prompting
+    and potentially fine-tuned models for song generation.
+    """
+    try:
+        # Use OpenAI-compatible APIs for lyrics generation
+        # Can work with OpenAI, Together AI, OpenRouter, etc.
+        providers = _lyrics_provider_requests(input_text, genre)
+        for provider in providers:
+            try:
+                logger.info("Using %s for lyrics generation", provider['label'], extra={'provider': provider['name']})
+                with provider_call(provider['name'], 'lyrics') as call:
+                    response = requests.post(provider['url'], headers=provider['headers'],
+                                             json=provider['payload'], timeout=30)
+                    call.status(response.status_code)
+                body = response.json() if response.status_code == 200 else None
+                lyrics_result = _parse_lyrics_response(provider, response.status_code, body)
+                if lyrics_result:
+                    return lyrics_result
+            except Exception as e:
+                logger.warning("%s API error: %s", provider['label'], e, extra={'provider': provider['name']})
         
-        return lyrics_result
+        # If all AI APIs fail, fall back to template generation
+        _lyrics_fallback(providers)
+        return _template_lyrics(input_text, genre)
             
     except Exception as e:
-        print(f"Lyrics generation error: {e}")
+        logger.error("Lyrics generation error: %s", e)
         raise RuntimeError(f"Lyrics generation failed: {str(e)}. Please check your internet connection and API token.")
 
 
-def generate_music_track(lyrics: str, genre: str = 'pop') -> tuple:
+def _mubert_request(genre: str) -> dict:
+    """Mubert RecordTrack request (url, payload), or None if no key is set."""
+    mubert_api_key = getattr(settings, 'MUBERT_API_KEY', None)
+    if not mubert_api_key or mubert_api_key == 'your-mubert-api-key-here':
+        return None
+    return {
+        'url': provider_url('mubert', 'RecordTrack'),
+        'payload': {
+            "method": "RecordTrack",
+            "params": {
+                "license": "license-free",
+                "token": mubert_api_key,
+                "format": "wav",
+                "mode": genre.lower(),
+                "duration": 30,
+                "bitrate": 320
+            }
+        },
+    }
+
+
+def _mubert_download_link(result: dict) -> str:
+    if result.get('status') == 1 and 'data' in result:
+        return result['data'].get('tasks', [{}])[0].get('download_link')
+    return None
+
+
+def _elevenlabs_request(lyrics: str) -> dict:
+    """ElevenLabs text-to-speech request (url, headers, payload, duration), or None if no key is set."""
+    elevenlabs_api_key = os.getenv('ELEVENLABS_API_KEY')
+    if not elevenlabs_api_key or elevenlabs_api_key == 'your-elevenlabs-api-key-here':
+        return None
+
+    # Use a more suitable voice ID for singing (default is Adam)
+    target_voice_id = os.getenv('ELEVENLABS_VOICE_ID', 'pNInz6obpgDQGcFmaJgB')
+
+    # Clean lyrics for better TTS (remove section markers)
+    clean_lyrics = lyrics.replace('[Verse 1]', '').replace('[Chorus]', '').replace('[Verse 2]', '').replace('[Bridge]', '').replace('[Outro]', '').strip()
+
+    return {
+        'url': provider_url('elevenlabs', f'text-to-speech/{target_voice_id}'),
+        'headers': {
+            "xi-api-key": elevenlabs_api_key,
+            "Accept": "audio/mpeg",
+            "Content-Type": "application/json"
+        },
+        'payload': {
+            "text": clean_lyrics,
+            "model_id": os.getenv('ELEVENLABS_MODEL_ID', 'eleven_multilingual_v2'),
+            "voice_settings": {
+                "stability": float(os.getenv('ELEVENLABS_VOICE_STABILITY', '0.5')),
+                "similarity_boost": float(os.getenv('ELEVENLABS_VOICE_SIMILARITY', '0.8')),
+                "style": float(os.getenv('ELEVENLABS_VOICE_STYLE', '0.5')),
+                "use_speaker_boost": True
+            },
+        },
+        # Estimate duration based on word count (~0.4s per word)
+        'duration': max(10, int(len(clean_lyrics.split()) * 0.4)),
+    }
+
+
+def _store_provider_audio(content: bytes, stage: str, provider: str, extension: str,
+                          duration: float, in_memory: bool, progress) -> tuple:
+    """
+    Keep audio downloaded from a provider: decoded in memory when asked
+    (falling back to a file if it cannot be decoded), otherwise written to
+    TEMP_AUDIO_DIR.
+    """
+    if in_memory:
+        try:
+            from .audio_stream import decode_audio_bytes
+            with timed_step(stage, 'decode'):
+                buffer = decode_audio_bytes(content)
+            logger.info("Generated %s using %s", stage, provider, extra={'stage': stage, 'provider': provider})
+            progress.stage_finished(stage, provider=provider, duration=buffer.duration)
+            return buffer, buffer.duration
+        except RuntimeError as e:
+            count_fallback(stage, 'decode_error')
+            logger.warning("In-memory decode failed, writing file instead: %s", e, extra={'stage': stage})
+
+    output_path = os.path.join(settings.TEMP_AUDIO_DIR, f"{stage}_{uuid.uuid4()}.{extension}")
+    with timed_step(stage, 'write'):
+        with open(output_path, 'wb') as f:
+            f.write(content)
+    with timed_step(stage, 'waveform'):
+        waveform_from_file(output_path)
+
+    logger.info("Generated %s using %s", stage, provider, extra={'stage': stage, 'provider': provider})
+    progress.stage_finished(stage, provider=provider, duration=duration)
+    return output_path, duration
+
+
+@staged('instrumental')
+def generate_music_track(lyrics: str, genre: str = 'pop', in_memory: bool = False, progress=None) -> tuple:
     """
     Generate instrumental/backing track using AI music generation APIs.
     
     Args:
         lyrics: Song lyrics (used for context)
         genre: Music genre
+        in_memory: Return an AudioBuffer instead of writing a WAV file, so a
+            server-side pipeline can hand it straight to the mixer
+        progress: Optional ProgressReporter for stage/percent/provider events
     
     Returns:
-        Tuple of (audio_path, duration_in_seconds)
+        Tuple of (audio_path, duration_in_seconds). With in_memory, the
+        first item is an AudioBuffer (or a path if the provider payload
+        could not be decoded in memory).
     
     Supported APIs:
         - Suno AI (via unofficial API)
@@ -399,6 +518,9 @@ def generate_music_track(lyrics: str, genre: str = 'pop') -> tuple:
         - Fallback: Synthetic audio generation
     """
     
+    progress = progress or NULL_PROGRESS
+    progress.stage_started('instrumental')
+    
     # Generate prompt from genre and lyrics snippet
     first_line = lyrics.split('\n')[0] if lyrics else 'instrumental music'
     prompt = f"A {genre} song instrumental with {first_line.lower()}. High quality studio production."
@@ -407,58 +529,42 @@ def generate_music_track(lyrics: str, genre: str = 'pop') -> tuple:
     suno_api_key = getattr(settings, 'SUNO_API_KEY', None)
     if suno_api_key and suno_api_key != 'your-suno-api-key-here':
         try:
-            print("🎵 Using Suno AI for instrumental generation...")
+            logger.info("Using Suno AI for instrumental generation")
             # Suno AI API integration would go here
             # Note: Suno doesn't have official API yet, using placeholder
-            print("⚠️  Suno AI not yet integrated. Using fallback.")
+            logger.warning("Suno AI not yet integrated. Using fallback.")
         except Exception as e:
-            print(f"⚠️  Suno AI error: {str(e)}")
+            logger.warning("Suno AI error: %s", e)
     
     # Try Mubert API (free tier available)
-    mubert_api_key = getattr(settings, 'MUBERT_API_KEY', None)
-    if mubert_api_key and mubert_api_key != 'your-mubert-api-key-here':
+    request = _mubert_request(genre)
+    if request:
         try:
-            print("🎵 Using Mubert API for instrumental generation...")
-            import requests
-            
-            api_url = "https://api-b2b.mubert.com/v2/RecordTrack"
-            
-            payload = {
-                "method": "RecordTrack",
-                "params": {
-                    "license": "license-free",
-                    "token": mubert_api_key,
-                    "format": "wav",
-                    "mode": genre.lower(),
-                    "duration": 30,
-                    "bitrate": 320
-                }
-            }
-            
-            response = requests.post(api_url, json=payload, timeout=60)
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('status') == 1 and 'data' in result:
-                    download_url = result['data'].get('tasks', [{}])[0].get('download_link')
-                    
-                    if download_url:
-                        # Download the generated music
-                        output_path = os.path.join(settings.TEMP_AUDIO_DIR, f"instrumental_{uuid.uuid4()}.wav")
-                        audio_response = requests.get(download_url, timeout=60)
-                        
-                        with open(output_path, 'wb') as f:
-                            f.write(audio_response.content)
-                        
-                        print(f"✅ Successfully generated instrumental using Mubert API")
-                        return output_path, 30
-                        
+            logger.info("Using Mubert API for instrumental generation", extra={'provider': 'mubert'})
+            progress.provider_wait('instrumental', 'mubert')
+            with provider_call('mubert', 'instrumental') as call:
+                response = requests.post(request['url'], json=request['payload'], timeout=60)
+                call.status(response.status_code)
+                download_url = _mubert_download_link(response.json()) if response.status_code == 200 else None
+                if download_url:
+                    # Download the generated music
+                    audio_response = requests.get(download_url, timeout=60)
+                    call.status(audio_response.status_code)
+            if download_url:
+                return _store_provider_audio(audio_response.content, 'instrumental', 'mubert', 'wav',
+                                             30, in_memory, progress)
         except Exception as e:
-            print(f"⚠️  Mubert API error: {str(e)}")
-    
+            logger.warning("Mubert API error: %s", e, extra={'provider': 'mubert'})
+
+    count_fallback('instrumental', 'provider_failed' if request else 'no_provider')
+    return _synthetic_instrumental(genre, in_memory, progress)
+
+
+def _synthetic_instrumental(genre: str, in_memory: bool, progress, duration: float = 30) -> tuple:
+    """Render the synthetic fallback instrumental (CPU-bound), 30 seconds by default."""
     # Fallback: Synthetic audio generation
-    print("🎵 Generating synthetic instrumental (fallback)...")
-    print("💡 For AI-generated music, add MUBERT_API_KEY to .env (free tier available)")
+    logger.info("Generating synthetic instrumental (fallback). For AI-generated music, "
+                "add MUBERT_API_KEY to .env (free tier available)", extra={'stage': 'instrumental'})
     
     try:
         # Create a realistic instrumental placeholder
@@ -467,11 +573,11 @@ def generate_music_track(lyrics: str, genre: str = 'pop') -> tuple:
         import numpy as np
         import random
         
+        started = time.perf_counter()
         output_path = os.path.join(settings.TEMP_AUDIO_DIR, f"instrumental_{uuid.uuid4()}.wav")
         
         # Create a more complex instrumental track
         sample_rate = 44100
-        duration = 30  # 30 seconds for demo
         t = np.linspace(0, duration, int(sample_rate * duration), False)
         
         # Define genre-specific characteristics
@@ -520,6 +626,7 @@ def generate_music_track(lyrics: str, genre: str = 'pop') -> tuple:
             )
             
             audio_data[start_idx:end_idx] += chord_audio
+            progress.percent('instrumental', 80.0 * (i + 1) / len(chord_freqs))
         
         # Combine all elements
         audio_data += bass_pattern + kick_pattern
@@ -542,106 +649,100 @@ def generate_music_track(lyrics: str, genre: str = 'pop') -> tuple:
             audio_data = (audio_data / max_val * 0.8 * 32767).astype(np.int16)
         else:
             audio_data = audio_data.astype(np.int16)
+        observe_step('instrumental', 'synthesis', time.perf_counter() - started)
+        
+        if in_memory:
+            from .audio_stream import AudioBuffer
+            logger.info("Generated %s instrumental in memory", genre, extra={'stage': 'instrumental'})
+            progress.stage_finished('instrumental', provider='fallback', duration=duration)
+            return AudioBuffer.from_int16(audio_data, sample_rate), duration
         
         # Save as WAV file
-        with wave.open(output_path, 'w') as wav_file:
-            wav_file.setnchannels(1)  # Mono
-            wav_file.setsampwidth(2)  # 16-bit
-            wav_file.setframerate(sample_rate)
-            wav_file.writeframes(audio_data.tobytes())
+        with timed_step('instrumental', 'write'):
+            with wave.open(output_path, 'w') as wav_file:
+                wav_file.setnchannels(1)  # Mono
+                wav_file.setsampwidth(2)  # 16-bit
+                wav_file.setframerate(sample_rate)
+                wav_file.writeframes(audio_data.tobytes())
+        with timed_step('instrumental', 'waveform'):
+            waveform_from_samples(output_path, audio_data, sample_rate)
         
-        print(f"Generated {genre} instrumental: {output_path}")
+        logger.info("Generated %s instrumental: %s", genre, output_path, extra={'stage': 'instrumental'})
+        progress.stage_finished('instrumental', provider='fallback', duration=duration)
         return output_path, duration
         
     except Exception as e:
-        print(f"Music generation error: {e}")
+        logger.error("Music generation error: %s", e)
         raise RuntimeError(f"Instrumental generation failed: {str(e)}. Please check system resources.")
 
 
-def generate_singing_vocals(lyrics: str, genre: str = 'pop') -> tuple:
+@staged('vocals')
+def generate_singing_vocals(lyrics: str, genre: str = 'pop', in_memory: bool = False, progress=None) -> tuple:
     """
     Generate singing vocal track for lyrics using AI voice synthesis.
 
+    With in_memory, the vocals come back as an AudioBuffer (ElevenLabs MP3
+    is decoded without touching the disk) instead of a file path. Pass a
+    ProgressReporter as progress to publish stage/percent/provider events.
+
     Supported APIs:
         - ElevenLabs (Professional AI voice - Free tier: 10k chars/month)
         - Uberduck AI (AI vocals - Free tier available)
         - Fallback: Synthetic audio generation
     """
 
+    progress = progress or NULL_PROGRESS
+    progress.stage_started('vocals')
+
     # Try ElevenLabs API first (best quality)
-    elevenlabs_api_key = os.getenv('ELEVENLABS_API_KEY')
-    if elevenlabs_api_key and elevenlabs_api_key != 'your-elevenlabs-api-key-here':
+    request = _elevenlabs_request(lyrics)
+    if request:
         try:
-            print("🎤 Using ElevenLabs AI for vocal generation...")
-            
-            # Use a more suitable voice ID for singing (default is Adam)
-            target_voice_id = os.getenv('ELEVENLABS_VOICE_ID', 'pNInz6obpgDQGcFmaJgB')
-            
-            output_path = os.path.join(settings.TEMP_AUDIO_DIR, f"vocals_{uuid.uuid4()}.mp3")
-            api_url = f"https://api.elevenlabs.io/v1/text-to-speech/{target_voice_id}"
-
-            # Clean lyrics for better TTS (remove section markers)
-            clean_lyrics = lyrics.replace('[Verse 1]', '').replace('[Chorus]', '').replace('[Verse 2]', '').replace('[Bridge]', '').replace('[Outro]', '').strip()
-            
-            payload = {
-                "text": clean_lyrics,
-                "model_id": os.getenv('ELEVENLABS_MODEL_ID', 'eleven_multilingual_v2'),
-                "voice_settings": {
-                    "stability": float(os.getenv('ELEVENLABS_VOICE_STABILITY', '0.5')),
-                    "similarity_boost": float(os.getenv('ELEVENLABS_VOICE_SIMILARITY', '0.8')),
-                    "style": float(os.getenv('ELEVENLABS_VOICE_STYLE', '0.5')),
-                    "use_speaker_boost": True
-                },
-            }
-
-            headers = {
-                "xi-api-key": elevenlabs_api_key,
-                "Accept": "audio/mpeg",
-                "Content-Type": "application/json"
-            }
+            logger.info("Using ElevenLabs AI for vocal generation", extra={'provider': 'elevenlabs'})
+            progress.provider_wait('vocals', 'elevenlabs')
+            with provider_call('elevenlabs', 'vocals') as call:
+                response = requests.post(request['url'], json=request['payload'], headers=request['headers'], timeout=60)
+                call.status(response.status_code)
 
-            response = requests.post(api_url, json=payload, headers=headers, timeout=60)
-            
             if response.status_code == 200:
-                with open(output_path, "wb") as f:
-                    f.write(response.content)
-
-                # Estimate duration based on word count (~0.4s per word)
-                words = len(clean_lyrics.split())
-                duration = max(10, int(words * 0.4))
-                
-                print(f"✅ Successfully generated vocals using ElevenLabs AI")
-                return output_path, duration
+                return _store_provider_audio(response.content, 'vocals', 'elevenlabs', 'mp3',
+                                             request['duration'], in_memory, progress)
             else:
-                print(f"⚠️  ElevenLabs API error {response.status_code}: {response.text[:200]}")
+                logger.warning("ElevenLabs API error %s: %s", response.status_code, response.text[:200],
+                               extra={'provider': 'elevenlabs', 'status_code': response.status_code})
 
         except Exception as exc:
-            print(f"⚠️  ElevenLabs vocal synthesis failed: {exc}")
-    
+            logger.warning("ElevenLabs vocal synthesis failed: %s", exc, extra={'provider': 'elevenlabs'})
+
     # Try Uberduck AI (alternative)
     uberduck_key = os.getenv('UBERDUCK_API_KEY')
     uberduck_secret = os.getenv('UBERDUCK_API_SECRET')
     if uberduck_key and uberduck_secret:
         try:
-            print("🎤 Using Uberduck AI for vocal generation...")
+            logger.info("Using Uberduck AI for vocal generation")
             # Uberduck API integration would go here
-            print("⚠️  Uberduck AI not yet integrated. Using fallback.")
+            logger.warning("Uberduck AI not yet integrated. Using fallback.")
         except Exception as e:
-            print(f"⚠️  Uberduck AI error: {str(e)}")
+            logger.warning("Uberduck AI error: %s", e)
+
+    count_fallback('vocals', 'provider_failed' if request else 'no_provider')
+    return _synthetic_vocals(lyrics, genre, in_memory, progress)
 
+
+def _synthetic_vocals(lyrics: str, genre: str, in_memory: bool, progress, duration: float = 25) -> tuple:
+    """Render the synthetic fallback vocals (CPU-bound), 25 seconds by default."""
     # Fallback: Synthetic vocal generation
-    print("🎤 Generating synthetic vocals (fallback)...")
-    print("💡 For AI-generated vocals, add ELEVENLABS_API_KEY to .env")
-    print("   Get free tier (10k chars/month): https://elevenlabs.io/api")
+    logger.info("Generating synthetic vocals (fallback). For AI-generated vocals, add ELEVENLABS_API_KEY "
+                "to .env (free tier, 10k chars/month: https://elevenlabs.io/api)", extra={'stage': 'vocals'})
     
     try:
         import wave
         import numpy as np
 
+        started = time.perf_counter()
         output_path = os.path.join(settings.TEMP_AUDIO_DIR, f"vocals_{uuid.uuid4()}.wav")
 
         sample_rate = 44100
-        duration = 25
         t = np.linspace(0, duration, int(sample_rate * duration), False)
 
         clean_lyrics = lyrics.replace('\n', ' ').replace('Verse 1:', '').replace('Chorus:', '').replace('Bridge:', '').replace('Outro:', '')
@@ -694,6 +795,7 @@ def generate_singing_vocals(lyrics: str, genre: str = 'pop') -> tuple:
 
                 note_sound = (fundamental + harmonic2 + harmonic3) * envelope * 0.4
                 audio_data[start_idx:end_idx] += note_sound
+                progress.percent('vocals', 80.0 * (i + 1) / num_notes)
 
         overall_envelope = np.ones_like(audio_data)
         fade_samples = int(0.1 * sample_rate)
@@ -712,29 +814,52 @@ def generate_singing_vocals(lyrics: str, genre: str = 'pop') -> tuple:
             audio_data = (audio_data / max_val * 0.7 * 32767).astype(np.int16)
         else:
             audio_data = audio_data.astype(np.int16)
+        observe_step('vocals', 'synthesis', time.perf_counter() - started)
 
-        import wave
-        with wave.open(output_path, 'w') as wav_file:
-            wav_file.setnchannels(1)
-            wav_file.setsampwidth(2)
-            wav_file.setframerate(sample_rate)
-            wav_file.writeframes(audio_data.tobytes())
+        if in_memory:
+            from .audio_stream import AudioBuffer
+            progress.stage_finished('vocals', provider='fallback', duration=duration)
+            return AudioBuffer.from_int16(audio_data, sample_rate), duration
 
+        import wave
+        with timed_step('vocals', 'write'):
+            with wave.open(output_path, 'w') as wav_file:
+                wav_file.setnchannels(1)
+                wav_file.setsampwidth(2)
+                wav_file.setframerate(sample_rate)
+                wav_file.writeframes(audio_data.tobytes())
+        with timed_step('vocals', 'waveform'):
+            waveform_from_samples(output_path, audio_data, sample_rate)
+
+        progress.stage_finished('vocals', provider='fallback', duration=duration)
         return output_path, duration
 
     except Exception as e:
-        print(f"Vocal synthesis fallback error: {e}")
+        logger.error("Vocal synthesis fallback error: %s", e)
         raise RuntimeError(f"Vocal synthesis failed: {str(e)}. Please check system resources.")
 
 
-def mix_audio_tracks(instrumental_path: str, vocals_path: str, genre: str = 'pop') -> tuple:
+MIX_MODES = ('auto', 'pydub', 'stream', 'master')
+
+
+@staged('mix')
+def mix_audio_tracks(instrumental_path: str, vocals_path: str, genre: str = 'pop', mode: str = None,
+                     output_format: str = 'wav', progress=None) -> tuple:
     """
     Mix instrumental and vocal tracks into a final song.
     
     Args:
-        instrumental_path: Path to instrumental WAV file
-        vocals_path: Path to vocals WAV file
+        instrumental_path: Path to instrumental WAV file, or an AudioBuffer
+        vocals_path: Path to vocals WAV file, or an AudioBuffer
         genre: Music genre (for mixing parameters)
+        mode: 'pydub' (in memory), 'stream' (constant-memory block mixer),
+            'master' (single FFmpeg pass: mix, EBU R128 loudnorm, limiter and
+            encode) or 'auto' (pydub, then stream, then FFmpeg). Defaults to
+            settings.AUDIO_MIX_MODE.
+        output_format: 'wav', 'mp3' or 'opus' (only used by 'master' mode)
+        progress: Optional ProgressReporter for stage/percent events
+    
+    In-memory AudioBuffer inputs always go through the streaming mixer.
     
     Returns:
         Tuple of (output_path, duration_in_seconds)
@@ -751,9 +876,39 @@ def mix_audio_tracks(instrumental_path: str, vocals_path: str, genre: str = 'pop
     """
     
     output_path = os.path.join(settings.TEMP_AUDIO_DIR, f"mixed_{uuid.uuid4()}.wav")
+    mode = (mode or getattr(settings, 'AUDIO_MIX_MODE', 'auto')).lower()
+    if mode not in MIX_MODES:
+        raise RuntimeError(f"Unknown mix mode '{mode}'. Use 'auto', 'pydub', 'stream' or 'master'.")
+    
+    from .audio_stream import AudioBuffer
+    in_memory = isinstance(instrumental_path, AudioBuffer) or isinstance(vocals_path, AudioBuffer)
+    if in_memory:
+        if mode == 'master':
+            raise RuntimeError("Mastering needs files on disk; in-memory tracks use the streaming mixer.")
+        mode = 'stream'
+    
+    progress = progress or NULL_PROGRESS
+    progress.stage_started('mix', mode=mode)
+    
+    # Mastering: one FFmpeg filtergraph decodes, mixes, normalizes and
+    # encodes, so errors are surfaced rather than falling back
+    if mode == 'master':
+        from .mastering import master_audio_tracks
+        with timed_step('mix', 'master'):
+            output_path, duration = master_audio_tracks(
+                [instrumental_path, vocals_path],
+                output_format=output_format,
+                gains_db=[-3.0, -1.5],  # Vocals slightly louder
+            )
+        with timed_step('mix', 'waveform'):
+            waveform_from_file(output_path)
+        progress.stage_finished('mix', mode='master', duration=duration)
+        return output_path, duration
     
-    if PYDUB_AVAILABLE:
+    if PYDUB_AVAILABLE and mode in ('auto', 'pydub'):
         try:
+            from pydub import AudioSegment
+            started = time.perf_counter()
             # Load audio files
             instrumental = AudioSegment.from_wav(instrumental_path) if os.path.exists(instrumental_path) else None
             vocals = AudioSegment.from_wav(vocals_path) if os.path.exists(vocals_path) else None
@@ -779,27 +934,239 @@ def mix_audio_tracks(instrumental_path: str, vocals_path: str, genre: str = 'pop
                 # Export
                 mixed.export(output_path, format="wav")
                 duration = len(mixed) / 1000  # Convert milliseconds to seconds
+                observe_step('mix', 'pydub', time.perf_counter() - started)
+                with timed_step('mix', 'waveform'):
+                    waveform_from_file(output_path)
                 
+                progress.stage_finished('mix', mode='pydub', duration=duration)
                 return output_path, duration
         except Exception as e:
-            print(f"pydub mixing error: {e}")
+            count_fallback('mix', 'pydub_error')
+            logger.warning("pydub mixing error: %s", e, extra={'stage': 'mix'})
+    
+    # Streaming mix: reads both tracks block by block, so memory stays
+    # constant for any song length (and decodes MP3 vocals via FFmpeg)
+    if mode in ('auto', 'stream'):
+        try:
+            from .audio_stream import stream_mix
+            # Waveform peaks are reduced from each block as it is rendered
+            peaks = PeakAccumulator(44100)
+            started = time.perf_counter()
+            output_path, duration = stream_mix(
+                [instrumental_path, vocals_path],
+                output_path,
+                gains_db=[-3.0, -1.5],  # Vocals slightly louder
+                normalize=True,
+                on_progress=lambda fraction: progress.percent('mix', 100.0 * fraction),
+                peaks=peaks,
+            )
+            observe_step('mix', 'stream', time.perf_counter() - started)
+            save_waveform(output_path, peaks)
+            progress.stage_finished('mix', mode='stream', duration=duration)
+            return output_path, duration
+        except Exception as e:
+            count_fallback('mix', 'stream_error')
+            logger.warning("Streaming mixing error: %s", e, extra={'stage': 'mix'})
+            if in_memory:
+                raise RuntimeError(f"Audio mixing failed: {str(e)}")
     
     # Fallback: use FFmpeg via subprocess
     try:
-        import subprocess
-        cmd = [
-            'ffmpeg', '-i', instrumental_path, '-i', vocals_path,
+        from .mastering import run_ffmpeg, parse_ffmpeg_duration
+        started = time.perf_counter()
+        ffmpeg_progress, stderr = run_ffmpeg([
+            '-i', instrumental_path, '-i', vocals_path,
             '-filter_complex', 'amix=inputs=2:duration=longest',
-            '-q:a', '9', '-c:a', 'libmp3lame',
+            '-c:a', 'pcm_s16le',
+            '-progress', 'pipe:1', '-nostats',
             output_path
-        ]
-        subprocess.run(cmd, check=True, capture_output=True)
+        ])
         
-        # Estimate duration
-        duration = 180
+        # Duration as reported by FFmpeg itself
+        duration = round(parse_ffmpeg_duration(ffmpeg_progress, stderr), 2)
+        observe_step('mix', 'ffmpeg', time.perf_counter() - started)
+        with timed_step('mix', 'waveform'):
+            waveform_from_file(output_path)
+        progress.stage_finished('mix', mode='ffmpeg', duration=duration)
         return output_path, duration
     except Exception as e:
-        print(f"FFmpeg mixing error: {e}")
+        logger.error("FFmpeg mixing error: %s", e, extra={'stage': 'mix'})
     
     # No fallback - raise error if mixing fails
     raise RuntimeError("Audio mixing failed. Please ensure FFmpeg is installed and audio files are valid.")
+
+
+def temp_audio_path(audio_url: str) -> str:
+    """
+    Map a generated-audio URL (absolute or relative) to its local path.
+    
+    Only the final path segment is used, so URLs cannot escape
+    TEMP_AUDIO_DIR.
+    """
+    from .temp_audio import touch_audio_file
+    filename = audio_url.split('?', 1)[0].rstrip('/').split('/')[-1]
+    touch_audio_file(filename)
+    return os.path.join(settings.TEMP_AUDIO_DIR, filename)
+
+
+def _persist_stem(source, prefix: str) -> str:
+    """Write an in-memory stem to TEMP_AUDIO_DIR, or pass a file path through."""
+    from .audio_stream import AudioBuffer
+    if isinstance(source, AudioBuffer):
+        with timed_step(prefix, 'write'):
+            path = source.write_wav(os.path.join(settings.TEMP_AUDIO_DIR, f"{prefix}_{uuid.uuid4()}.wav"))
+        waveform_from_samples(path, source.samples, source.sample_rate)
+        return path
+    return source
+
+
+def render_song_audio(lyrics: str, genre: str = 'pop', keep_stems: bool = False) -> dict:
+    """
+    Render instrumental, vocals and the final mix entirely server-side.
+    
+    Both stems are handed to the mixer as in-memory buffers, so only the
+    master (and, with keep_stems, the stems) is written to TEMP_AUDIO_DIR.
+    Instrumental and vocals render concurrently (see api.pipeline).
+    
+    Args:
+        lyrics: Song lyrics
+        genre: Music genre
+        keep_stems: Also write the instrumental and vocal stems
+    
+    Returns:
+        Dict with mix_path, duration, instrumental_path and vocals_path
+        (stem paths are None unless keep_stems is set), plus lyrics and
+        per-stage timings
+    """
+    from .pipeline import run_song_pipeline
+    return run_song_pipeline(lyrics=lyrics, genre=genre, keep_stems=keep_stems)
+
+
+# Async provider calls (ASGI views)
+#
+# Provider waits are awaited on the event loop, so one worker can keep
+# hundreds of them in flight. Anything CPU-bound (synthetic fallbacks,
+# decoding, mixing) runs on a bounded thread pool instead of the loop,
+# taken by stage priority (see api.scheduling).
+
+_cpu_executor = None
+_cpu_executor_lock = threading.Lock()
+
+
+def get_cpu_executor() -> PriorityExecutor:
+    """Process-wide pool for CPU work, sized by settings.CPU_EXECUTOR_WORKERS."""
+    global _cpu_executor
+    with _cpu_executor_lock:
+        if _cpu_executor is None:
+            workers = getattr(settings, 'CPU_EXECUTOR_WORKERS', None) or min(4, os.cpu_count() or 1)
+            _cpu_executor = PriorityExecutor(max_workers=workers, thread_name_prefix='auralynx-cpu')
+        return _cpu_executor
+
+
+async def run_cpu_bound(func, *args, priority: str = None, **kwargs):
+    """Run a blocking callable on the CPU pool (at a priority class) and await its result."""
+    future = get_cpu_executor().submit_with_priority(priority, functools.partial(func, *args, **kwargs))
+    return await asyncio.wrap_future(future)
+
+
+@staged('lyrics')
+async def agenerate_song_lyrics(input_text: str, genre: str = 'pop') -> str:
+    """Async version of generate_song_lyrics (same providers and fallback)."""
+    if not HTTPX_AVAILABLE:
+        return await run_cpu_bound(generate_song_lyrics, input_text, genre, priority=stage_priority('lyrics'))
+    import httpx
+
+    try:
+        async with httpx.AsyncClient(timeout=30) as client:
+            providers = _lyrics_provider_requests(input_text, genre)
+            for provider in providers:
+                try:
+                    logger.info("Using %s for lyrics generation", provider['label'],
+                                extra={'provider': provider['name']})
+                    with provider_call(provider['name'], 'lyrics') as call:
+                        response = await client.post(provider['url'], headers=provider['headers'],
+                                                     json=provider['payload'])
+                        call.status(response.status_code)
+                    body = response.json() if response.status_code == 200 else None
+                    lyrics_result = _parse_lyrics_response(provider, response.status_code, body)
+                    if lyrics_result:
+                        return lyrics_result
+                except Exception as e:
+                    logger.warning("%s API error: %s", provider['label'], e, extra={'provider': provider['name']})
+
+        _lyrics_fallback(providers)
+        return _template_lyrics(input_text, genre)
+
+    except Exception as e:
+        logger.error("Lyrics generation error: %s", e)
+        raise RuntimeError(f"Lyrics generation failed: {str(e)}. Please check your internet connection and API token.")
+
+
+@staged('instrumental')
+async def agenerate_music_track(lyrics: str, genre: str = 'pop', in_memory: bool = False, progress=None) -> tuple:
+    """Async version of generate_music_track (Mubert, then synthetic fallback)."""
+    if not HTTPX_AVAILABLE:
+        return await run_cpu_bound(generate_music_track, lyrics, genre, in_memory, progress,
+                                   priority=stage_priority('instrumental'))
+    import httpx
+
+    progress = progress or NULL_PROGRESS
+    progress.stage_started('instrumental')
+
+    request = _mubert_request(genre)
+    if request:
+        try:
+            logger.info("Using Mubert API for instrumental generation", extra={'provider': 'mubert'})
+            progress.provider_wait('instrumental', 'mubert')
+            async with httpx.AsyncClient(timeout=60) as client:
+                with provider_call('mubert', 'instrumental') as call:
+                    response = await client.post(request['url'], json=request['payload'])
+                    call.status(response.status_code)
+                    download_url = _mubert_download_link(response.json()) if response.status_code == 200 else None
+                    if download_url:
+                        audio_response = await client.get(download_url)
+                        call.status(audio_response.status_code)
+                if download_url:
+                    return await run_cpu_bound(_store_provider_audio, audio_response.content, 'instrumental',
+                                               'mubert', 'wav', 30, in_memory, progress,
+                                               priority=stage_priority('instrumental'))
+        except Exception as e:
+            logger.warning("Mubert API error: %s", e, extra={'provider': 'mubert'})
+
+    count_fallback('instrumental', 'provider_failed' if request else 'no_provider')
+    return await run_cpu_bound(_synthetic_instrumental, genre, in_memory, progress,
+                               priority=stage_priority('instrumental'))
+
+
+@staged('vocals')
+async def agenerate_singing_vocals(lyrics: str, genre: str = 'pop', in_memory: bool = False, progress=None) -> tuple:
+    """Async version of generate_singing_vocals (ElevenLabs, then synthetic fallback)."""
+    if not HTTPX_AVAILABLE:
+        return await run_cpu_bound(generate_singing_vocals, lyrics, genre, in_memory, progress,
+                                   priority=stage_priority('vocals'))
+    import httpx
+
+    progress = progress or NULL_PROGRESS
+    progress.stage_started('vocals')
+
+    request = _elevenlabs_request(lyrics)
+    if request:
+        try:
+            logger.info("Using ElevenLabs AI for vocal generation", extra={'provider': 'elevenlabs'})
+            progress.provider_wait('vocals', 'elevenlabs')
+            async with httpx.AsyncClient(timeout=60) as client:
+                with provider_call('elevenlabs', 'vocals') as call:
+                    response = await client.post(request['url'], json=request['payload'], headers=request['headers'])
+                    call.status(response.status_code)
+            if response.status_code == 200:
+                return await run_cpu_bound(_store_provider_audio, response.content, 'vocals', 'elevenlabs',
+                                           'mp3', request['duration'], in_memory, progress,
+                                           priority=stage_priority('vocals'))
+            logger.warning("ElevenLabs API error %s: %s", response.status_code, response.text[:200],
+                           extra={'provider': 'elevenlabs', 'status_code': response.status_code})
+        except Exception as exc:
+            logger.warning("ElevenLabs vocal synthesis failed: %s", exc, extra={'provider': 'elevenlabs'})
+
+    count_fallback('vocals', 'provider_failed' if request else 'no_provider')
+    return await run_cpu_bound(_synthetic_vocals, lyrics, genre, in_memory, progress,
+                               priority=stage_priority('vocals'))
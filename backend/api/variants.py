@@ -0,0 +1,282 @@
+"""
+Compressed renditions (variants) of generated audio.
+
+Masters are 44.1 kHz WAV; a variant is the same audio as Opus, MP3 or AAC
+at a chosen bitrate, transcoded once with FFmpeg and kept in
+``TEMP_AUDIO_DIR/variants/`` as ``<master stem>-<bitrate>k.<ext>``. Since
+masters are content-addressed, variant names are immutable too.
+
+Variants are made lazily: the first request for one gets the master while
+the variant is transcoded on the CPU pool at low priority (once, however
+many requests miss), so no request waits on FFmpeg. The renditions listed
+in AUDIO_VARIANTS_EAGER are built the same way right after mixing. The directory is an LRU cache
+bounded by AUDIO_VARIANTS_MAX_BYTES; a hit refreshes the file's mtime.
+
+Clients pick a variant on any /temp-audio/ URL with ``?format=opus`` (plus
+optional ``&bitrate=96``), or through the Accept header (audio/ogg,
+audio/mpeg, audio/mp4).
+"""
+
+import glob
+import logging
+import os
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .coalesce import single_flight
+from .mastering import run_ffmpeg
+from .metrics import count_cache
+from .scheduling import LOW
+
+logger = logging.getLogger(__name__)
+
+
+VARIANTS_SUBDIR = 'variants'
+PRUNE_LOCK_KEY = 'auralynx:variants:prune'
+PENDING_KEY_PREFIX = 'auralynx:variants:pending'
+# A queued transcode that never reports back (worker killed) is retried after this
+PENDING_TTL_SECONDS = 300
+
+# Format: file extension, FFmpeg muxer and encoder, MIME type, default kbps
+VARIANT_FORMATS = {
+    'opus': {'extension': 'opus', 'muxer': 'ogg', 'codec': ['-c:a', 'libopus', '-ar', '48000'],
+             'content_type': 'audio/ogg', 'bitrate': 96},
+    'mp3': {'extension': 'mp3', 'muxer': 'mp3', 'codec': ['-c:a', 'libmp3lame'],
+            'content_type': 'audio/mpeg', 'bitrate': 192},
+    'aac': {'extension': 'm4a', 'muxer': 'mp4', 'codec': ['-c:a', 'aac', '-movflags', '+faststart'],
+            'content_type': 'audio/mp4', 'bitrate': 128},
+}
+# Allowed bitrates (kbps), so clients cannot fill the cache with one-offs
+VARIANT_BITRATES = (48, 64, 96, 128, 160, 192, 256, 320)
+# Preference when the Accept header rates several formats equally
+_NEGOTIATION_ORDER = ('opus', 'aac', 'mp3')
+_MASTER_TYPES = ('audio/wav', 'audio/x-wav', 'audio/wave')
+
+
+def variants_dir() -> str:
+    return os.path.join(settings.TEMP_AUDIO_DIR, VARIANTS_SUBDIR)
+
+
+def variant_name(master_name: str, fmt: str, bitrate: int) -> str:
+    stem = os.path.splitext(master_name)[0]
+    return f"{stem}-{bitrate}k.{VARIANT_FORMATS[fmt]['extension']}"
+
+
+def parse_variant_request(fmt: str, bitrate: str = '') -> tuple:
+    """
+    Validate ?format= and ?bitrate=.
+
+    Returns:
+        (format, bitrate) or None for the master
+
+    Raises:
+        ValueError: unknown format or bitrate
+    """
+    fmt = (fmt or '').lower()
+    if fmt in ('', 'wav', 'original'):
+        return None
+    if fmt not in VARIANT_FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'. Use one of: wav, {', '.join(VARIANT_FORMATS)}")
+    if not bitrate:
+        return fmt, VARIANT_FORMATS[fmt]['bitrate']
+    try:
+        kbps = int(str(bitrate).lower().rstrip('k'))
+    except ValueError:
+        kbps = 0
+    if kbps not in VARIANT_BITRATES:
+        raise ValueError(f"Unsupported bitrate '{bitrate}'. Use one of: "
+                         f"{', '.join(str(b) for b in VARIANT_BITRATES)}")
+    return fmt, kbps
+
+
+def _accept_qualities(header: str) -> dict:
+    qualities = {}
+    for item in (header or '').split(','):
+        media_type, *params = [part.strip() for part in item.split(';')]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_type:
+            qualities[media_type.lower()] = quality
+    return qualities
+
+
+def negotiate_variant(accept: str) -> tuple:
+    """
+    Pick a variant from an Accept header.
+
+    Only explicitly listed audio types count (wildcards keep the master).
+    A variant is chosen when its type rates at least as high as WAV.
+
+    Returns:
+        (format, default bitrate) or None for the master
+    """
+    qualities = _accept_qualities(accept)
+    master_quality = max((qualities.get(t, 0.0) for t in _MASTER_TYPES), default=0.0)
+    best, best_quality = None, 0.0
+    for fmt in _NEGOTIATION_ORDER:
+        quality = qualities.get(VARIANT_FORMATS[fmt]['content_type'], 0.0)
+        if quality > best_quality:
+            best, best_quality = fmt, quality
+    if best is None or best_quality < master_quality:
+        return None
+    return best, VARIANT_FORMATS[best]['bitrate']
+
+
+def transcode(master_path: str, output_path: str, fmt: str, bitrate: int):
+    """Encode a variant with FFmpeg, writing it into place atomically."""
+    spec = VARIANT_FORMATS[fmt]
+    partial = f"{output_path}.{uuid.uuid4().hex}.part"
+    try:
+        run_ffmpeg(['-i', str(master_path), '-vn', *spec['codec'], '-b:a', f'{bitrate}k',
+                    '-f', spec['muxer'], partial])
+        os.replace(partial, output_path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+
+
+def cached_variant(master_name: str, fmt: str, bitrate: int) -> str:
+    """Path of a built variant relative to TEMP_AUDIO_DIR, or None on a miss."""
+    name = variant_name(master_name, fmt, bitrate)
+    path = os.path.join(variants_dir(), name)
+    if not os.path.exists(path):
+        count_cache('variant', 'miss')
+        return None
+    # Refresh the LRU position
+    os.utime(path)
+    count_cache('variant', 'hit')
+    return f"{VARIANTS_SUBDIR}/{name}"
+
+
+def build_variant(master_name: str, fmt: str, bitrate: int) -> str:
+    """
+    Transcode a variant unless it exists; returns its path relative to TEMP_AUDIO_DIR.
+
+    Blocks for the whole FFmpeg run: call it from the CPU pool, not a request.
+
+    Raises:
+        RuntimeError: FFmpeg failed or the master is missing
+    """
+    name = variant_name(master_name, fmt, bitrate)
+    path = os.path.join(variants_dir(), name)
+    master_path = os.path.join(settings.TEMP_AUDIO_DIR, master_name)
+    if not os.path.exists(path) and not os.path.isfile(master_path):
+        raise RuntimeError(f"Audio file not found: {master_name}")
+
+    def compute():
+        if not os.path.exists(path):
+            os.makedirs(variants_dir(), exist_ok=True)
+            transcode(master_path, path, fmt, bitrate)
+            maybe_prune()
+        return f"{VARIANTS_SUBDIR}/{name}"
+
+    return single_flight('variant', {'name': name}, compute)
+
+
+def eager_variants() -> list:
+    """(format, bitrate) pairs from settings.AUDIO_VARIANTS_EAGER, e.g. "opus:96,mp3"."""
+    variants = []
+    for item in (getattr(settings, 'AUDIO_VARIANTS_EAGER', '') or '').split(','):
+        fmt, _, bitrate = item.strip().partition(':')
+        if fmt:
+            variants.append(parse_variant_request(fmt, bitrate))
+    return [variant for variant in variants if variant]
+
+
+def _pending_key(master_name: str, fmt: str, bitrate: int) -> str:
+    return f"{PENDING_KEY_PREFIX}:{variant_name(master_name, fmt, bitrate)}"
+
+
+def schedule_variant(master_name: str, fmt: str, bitrate: int) -> bool:
+    """
+    Transcode a variant in the background at low priority.
+
+    Returns:
+        False when a transcode of it is already queued or running
+    """
+    from .utils import get_cpu_executor
+
+    if not cache.add(_pending_key(master_name, fmt, bitrate), 1, PENDING_TTL_SECONDS):
+        return False
+    get_cpu_executor().submit_with_priority(LOW, _build_quietly, master_name, fmt, bitrate)
+    return True
+
+
+def schedule_variants(path_or_url: str):
+    """Transcode the eager variants of a master in the background (low priority)."""
+    from .temp_audio import audio_file_name
+
+    master_name = audio_file_name(path_or_url)
+    for fmt, bitrate in eager_variants():
+        schedule_variant(master_name, fmt, bitrate)
+
+
+def _build_quietly(master_name: str, fmt: str, bitrate: int):
+    try:
+        build_variant(master_name, fmt, bitrate)
+    except Exception as e:
+        logger.warning("Could not build %s %sk variant of %s: %s", fmt, bitrate, master_name, e)
+    finally:
+        cache.delete(_pending_key(master_name, fmt, bitrate))
+
+
+def remove_variants(master_name: str):
+    """Delete every variant of a master (called when the master is swept)."""
+    stem = os.path.splitext(master_name)[0]
+    for path in glob.glob(os.path.join(variants_dir(), glob.escape(stem) + '-*')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def prune(max_bytes: int = None) -> dict:
+    """
+    Evict least recently used variants while the directory is over quota.
+
+    Returns:
+        Dict with evicted, freed_bytes and total_bytes (after)
+    """
+    max_bytes = max_bytes if max_bytes is not None else getattr(settings, 'AUDIO_VARIANTS_MAX_BYTES', 2 * 1024 ** 3)
+    entries = []
+    try:
+        with os.scandir(variants_dir()) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith('.part'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+    except FileNotFoundError:
+        return {'evicted': 0, 'freed_bytes': 0, 'total_bytes': 0}
+
+    total = sum(size for _, size, _ in entries)
+    evicted, freed = 0, 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        evicted += 1
+        freed += size
+        total -= size
+    return {'evicted': evicted, 'freed_bytes': freed, 'total_bytes': total}
+
+
+def maybe_prune():
+    """Prune unless a prune ran within TEMP_AUDIO_SWEEP_INTERVAL_SECONDS."""
+    interval = getattr(settings, 'TEMP_AUDIO_SWEEP_INTERVAL_SECONDS', 60)
+    if not cache.add(PRUNE_LOCK_KEY, 1, interval):
+        return
+    try:
+        prune()
+    except Exception as e:
+        logger.warning("Variant cache prune failed: %s", e)
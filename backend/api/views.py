@@ -1,10 +1,19 @@
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework import status
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.core.files.storage import default_storage
 from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import Http404, HttpResponse, StreamingHttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
 import os
 import json
 import uuid
@@ -14,10 +23,36 @@ from .utils import (
     generate_song_lyrics,
     generate_music_track,
     generate_singing_vocals,
+    MIX_MODES,
     mix_audio_tracks,
+    temp_audio_path,
 )
+from .admission import admit, admission_metrics
+from .audio_serving import audio_response, is_authorized, select_variant
+from .audio_store import content_addressed
+from .coalesce import mix_inputs, single_flight
+from .pipeline import run_song_pipeline, save_generated_song
+from .jobs import get_job_queue
+from .library_cache import library_response
+from .metrics import render_metrics
+from .progress import get_progress_reporter, is_valid_channel, sse_events, sse_events_sync
+from .temp_audio import audio_file_name, public_audio_url, touch_audio_file
+from .uploads import UploadRejected, audio_upload
+from .variants import schedule_variants
+from .waveform import waveform_payload
 from .models import Song
-from .serializers import RegisterSerializer, UserSerializer, SongSerializer
+from .pagination import SongCursorPagination
+from .search import mark_up, search_songs
+from .signals import songs_bulk_created
+from .serializers import RegisterSerializer, UserSerializer, SongListSerializer, SongSerializer
+
+# Rows per INSERT for bulk song creation
+BULK_BATCH_SIZE = 200
+# Rows fetched per database round trip when exporting
+EXPORT_CHUNK_SIZE = 500
+EXPORT_FIELDS = ('id', 'title', 'genre', 'lyrics', 'instrumental_url', 'vocals_url', 'mix_url',
+                 'duration_seconds', 'created_at', 'updated_at')
+
 
 @api_view(['GET'])
 def health_check(request):
@@ -50,16 +85,37 @@ def me(request):
     return Response(UserSerializer(request.user).data, status=status.HTTP_200_OK)
 
 
+def _transcribe_upload(audio_file) -> str:
+    """Write a spooled upload to TEMP_AUDIO_DIR and transcribe it."""
+    temp_path = os.path.join(settings.TEMP_AUDIO_DIR, f"{uuid.uuid4()}_{os.path.basename(audio_file.name)}")
+    with open(temp_path, 'wb+') as destination:
+        for chunk in audio_file.chunks():
+            destination.write(chunk)
+
+    # Transcribe (the upload is removed even if transcription fails)
+    try:
+        return transcribe_audio(temp_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+@audio_upload
 @api_view(['POST'])
+@admit('transcribe')
 def transcribe(request):
     """
     Transcribe audio file to text using Whisper.
     
     Expected POST data:
-    - audio_file: Audio file (MP3, WAV, M4A)
+    - audio_file: Audio file (WAV, MP3, M4A, OGG/Opus, FLAC or WebM,
+      up to MAX_AUDIO_SIZE_MB)
     
     Returns:
     - transcribed_text: String of transcribed text
+    
+    The upload is streamed to a spooled file and hashed as it arrives
+    (api.uploads); oversized uploads get 413 and non-audio files 415.
     """
     try:
         if 'audio_file' not in request.FILES:
@@ -69,25 +125,20 @@ def transcribe(request):
             )
 
         audio_file = request.FILES['audio_file']
-        
-        # Save temporary file
-        temp_path = os.path.join(settings.TEMP_AUDIO_DIR, f"{uuid.uuid4()}_{audio_file.name}")
-        with open(temp_path, 'wb+') as destination:
-            for chunk in audio_file.chunks():
-                destination.write(chunk)
-
-        # Transcribe
-        transcribed_text = transcribe_audio(temp_path)
-        
-        # Cleanup
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
+
+        # Identical uploads (same content hash) share one transcription
+        transcribed_text = single_flight(
+            'transcribe', {'sha256': audio_file.sha256},
+            lambda: _transcribe_upload(audio_file),
+        )
 
         return Response({
             'success': True,
             'transcribed_text': transcribed_text,
         }, status=status.HTTP_200_OK)
 
+    except UploadRejected as e:
+        return Response({'error': str(e)}, status=e.status_code)
     except Exception as e:
         return Response(
             {'error': str(e)},
@@ -96,6 +147,7 @@ def transcribe(request):
 
 
 @api_view(['POST'])
+@admit('lyrics')
 def generate_lyrics(request):
     """
     Generate song lyrics from a text prompt using LLM.
@@ -117,8 +169,11 @@ def generate_lyrics(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Generate lyrics
-        lyrics = generate_song_lyrics(input_text, genre)
+        # Generate lyrics (identical in-flight requests share one call)
+        lyrics = single_flight(
+            'lyrics', {'input_text': input_text, 'genre': genre},
+            lambda: generate_song_lyrics(input_text, genre),
+        )
 
         return Response({
             'success': True,
@@ -134,6 +189,7 @@ def generate_lyrics(request):
 
 
 @api_view(['POST'])
+@admit('instrumental')
 def generate_instrumental(request):
     """
     Generate instrumental/backing track using MusicGen.
@@ -141,11 +197,14 @@ def generate_instrumental(request):
     Expected POST data:
     - lyrics: String (song lyrics for context)
     - genre: String (e.g., 'pop', 'rock', 'hip-hop')
+    - progress_id: String (optional, 8-64 chars [A-Za-z0-9_-]; follow it
+      at /api/progress/<progress_id>/)
     
     Returns:
     - url: Path to generated WAV file
     - duration: Duration of generated audio in seconds
     """
+    progress = get_progress_reporter(request.data.get('progress_id', ''))
     try:
         lyrics = request.data.get('lyrics', '')
         genre = request.data.get('genre', 'pop')
@@ -156,21 +215,26 @@ def generate_instrumental(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Generate music
-        audio_path, duration = generate_music_track(lyrics, genre)
+        # Generate music (identical in-flight requests share one render)
+        audio_path, duration = single_flight(
+            'instrumental', {'lyrics': lyrics, 'genre': genre},
+            lambda: content_addressed(generate_music_track(lyrics, genre, progress=progress)),
+        )
         
         # Convert file path to full URL with backend server
-        filename = os.path.basename(audio_path)
-        audio_url = request.build_absolute_uri(f'{settings.TEMP_AUDIO_URL}{filename}')
+        audio_url = request.build_absolute_uri(public_audio_url(audio_path))
 
+        progress.done(url=audio_url, duration=duration)
         return Response({
             'success': True,
             'url': audio_url,
             'duration': duration,
             'format': 'wav',
+            'waveform': waveform_payload(audio_url, request.build_absolute_uri),
         }, status=status.HTTP_200_OK)
 
     except Exception as e:
+        progress.error(str(e))
         return Response(
             {'error': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -178,6 +242,7 @@ def generate_instrumental(request):
 
 
 @api_view(['POST'])
+@admit('vocals')
 def generate_vocals(request):
     """
     Generate singing vocals for lyrics using DiffSinger or voice synthesis.
@@ -185,11 +250,14 @@ def generate_vocals(request):
     Expected POST data:
     - lyrics: String (lyrics to sing)
     - genre: String (genre/style)
+    - progress_id: String (optional, 8-64 chars [A-Za-z0-9_-]; follow it
+      at /api/progress/<progress_id>/)
     
     Returns:
     - url: Path to generated vocal WAV file
     - duration: Duration of generated audio in seconds
     """
+    progress = get_progress_reporter(request.data.get('progress_id', ''))
     try:
         lyrics = request.data.get('lyrics', '')
         genre = request.data.get('genre', 'pop')
@@ -200,21 +268,26 @@ def generate_vocals(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Generate vocals
-        audio_path, duration = generate_singing_vocals(lyrics, genre)
+        # Generate vocals (identical in-flight requests share one render)
+        audio_path, duration = single_flight(
+            'vocals', {'lyrics': lyrics, 'genre': genre},
+            lambda: content_addressed(generate_singing_vocals(lyrics, genre, progress=progress)),
+        )
         
         # Convert file path to full URL with backend server
-        filename = os.path.basename(audio_path)
-        audio_url = request.build_absolute_uri(f'{settings.TEMP_AUDIO_URL}{filename}')
+        audio_url = request.build_absolute_uri(public_audio_url(audio_path))
 
+        progress.done(url=audio_url, duration=duration)
         return Response({
             'success': True,
             'url': audio_url,
             'duration': duration,
             'format': 'wav',
+            'waveform': waveform_payload(audio_url, request.build_absolute_uri),
         }, status=status.HTTP_200_OK)
 
     except Exception as e:
+        progress.error(str(e))
         return Response(
             {'error': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -222,6 +295,7 @@ def generate_vocals(request):
 
 
 @api_view(['POST'])
+@admit('mix')
 def mix_audio(request):
     """
     Mix instrumental and vocal tracks into final song.
@@ -230,43 +304,238 @@ def mix_audio(request):
     - instrumental_url: Path to instrumental WAV
     - vocals_url: Path to vocals WAV
     - genre: String (genre)
+    - mode: String (optional, 'auto', 'pydub', 'stream' or 'master')
+    - format: String (optional, 'wav', 'mp3' or 'opus'; 'master' mode only)
+    - progress_id: String (optional, 8-64 chars [A-Za-z0-9_-]; follow it
+      at /api/progress/<progress_id>/)
     
     Returns:
     - url: Path to final mixed WAV/MP3 file
     - duration: Duration in seconds
+    - format: Container of the returned file
     """
+    progress = get_progress_reporter(request.data.get('progress_id', ''))
     try:
         instrumental_url = request.data.get('instrumental_url')
         vocals_url = request.data.get('vocals_url')
         genre = request.data.get('genre', 'pop')
+        mode = str(request.data.get('mode') or getattr(settings, 'AUDIO_MIX_MODE', 'auto')).lower()
+        output_format = request.data.get('format', 'wav')
 
         if not instrumental_url or not vocals_url:
             return Response(
                 {'error': 'instrumental_url and vocals_url are required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if mode not in MIX_MODES:
+            return Response(
+                {'error': f"mode must be one of: {', '.join(MIX_MODES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         # Mix audio
-        # Extract filenames from URLs (instrumental_url/vocals_url may be
-        # absolute or relative) and convert to local paths
-        instrumental_filename = instrumental_url.rstrip('/').split('/')[-1]
-        vocals_filename = vocals_url.rstrip('/').split('/')[-1]
-        instrumental_path = os.path.join(settings.TEMP_AUDIO_DIR, instrumental_filename)
-        vocals_path = os.path.join(settings.TEMP_AUDIO_DIR, vocals_filename)
+        # instrumental_url/vocals_url may be absolute or relative
+        instrumental_path = temp_audio_path(instrumental_url)
+        vocals_path = temp_audio_path(vocals_url)
         
-        output_path, duration = mix_audio_tracks(instrumental_path, vocals_path, genre)
+        output_path, duration = single_flight(
+            'mix', mix_inputs(instrumental_path, vocals_path, genre, mode, output_format),
+            lambda: content_addressed(mix_audio_tracks(
+                instrumental_path, vocals_path, genre, mode=mode, output_format=output_format,
+                progress=progress,
+            )),
+        )
         
         # Convert file path to full URL with backend server
         filename = os.path.basename(output_path)
-        audio_url = request.build_absolute_uri(f'{settings.TEMP_AUDIO_URL}{filename}')
+        audio_url = request.build_absolute_uri(public_audio_url(output_path))
+        schedule_variants(audio_url)
 
+        progress.done(url=audio_url, duration=duration)
         return Response({
             'success': True,
             'url': audio_url,
             'duration': duration,
-            'format': 'wav',
+            'format': os.path.splitext(filename)[1].lstrip('.') or 'wav',
+            'waveform': waveform_payload(audio_url, request.build_absolute_uri),
         }, status=status.HTTP_200_OK)
 
+    except Exception as e:
+        progress.error(str(e))
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['POST'])
+@admit('song')
+def generate_song(request):
+    """
+    Generate a complete song server-side in one request.
+    
+    Stages run as a dependency graph: instrumental and vocals render
+    concurrently once lyrics are ready, and mixing starts as soon as both
+    finish. Stems are mixed in memory. The result is saved as a Song
+    (owned by the user when authenticated).
+    
+    Expected POST data:
+    - input_text: String (theme; required unless lyrics are given)
+    - lyrics: String (optional, skips lyric generation)
+    - genre: String (optional, default 'pop')
+    - title: String (optional)
+    - keep_stems: Boolean (optional, also store instrumental and vocals)
+    - progress_id: String (optional; follow it at /api/progress/<progress_id>/)
+    
+    Returns:
+    - song: Saved Song record
+    - url: Path to final mixed WAV file
+    - duration: Duration in seconds
+    - timings: Seconds spent per stage, plus 'total'
+    """
+    progress = get_progress_reporter(request.data.get('progress_id', ''))
+    try:
+        input_text = request.data.get('input_text', '')
+        lyrics = request.data.get('lyrics', '')
+        genre = request.data.get('genre', 'pop')
+        keep_stems = str(request.data.get('keep_stems', '')).lower() in ('1', 'true', 'yes')
+
+        if not input_text and not lyrics:
+            return Response(
+                {'error': 'input_text or lyrics is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        result = run_song_pipeline(
+            input_text, genre, lyrics=lyrics or None, keep_stems=keep_stems, progress=progress
+        )
+
+        song = save_generated_song(
+            result,
+            user=request.user,
+            genre=genre,
+            title=request.data.get('title') or input_text,
+            build_url=request.build_absolute_uri,
+        )
+
+        progress.done(song_id=song.id, url=song.mix_url, duration=result['duration'])
+        return Response({
+            'success': True,
+            'song': SongSerializer(song).data,
+            'lyrics': result['lyrics'],
+            'url': song.mix_url,
+            'duration': result['duration'],
+            'format': 'wav',
+            'waveform': waveform_payload(song.mix_url, request.build_absolute_uri),
+            'timings': result['timings'],
+        }, status=status.HTTP_201_CREATED)
+
+    except Exception as e:
+        progress.error(str(e))
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+async def progress_stream(request, channel):
+    """
+    Server-Sent Events stream of progress events for a channel.
+    
+    The channel is the progress_id sent to a generation endpoint, or a job
+    ID (only its owner may follow it; others get 404). Events:
+    stage_started, stage_finished, progress (percent), provider_wait, then
+    done or error, after which the stream ends.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    if not is_valid_channel(channel):
+        return JsonResponse({'error': 'Invalid progress channel'}, status=400)
+    try:
+        hidden = await sync_to_async(_is_other_users_job)(request, channel)
+    except AuthenticationFailed as e:
+        return JsonResponse({'error': str(e.detail)}, status=401)
+    # Job events carry the result: same rule as job_detail
+    if hidden:
+        return JsonResponse({'error': 'Job not found or expired'}, status=404)
+
+    # Under WSGI an async iterator would be buffered until the stream ends
+    last_event_id = request.headers.get('Last-Event-ID')
+    if isinstance(request, ASGIRequest):
+        events = sse_events(channel, last_event_id=last_event_id)
+    else:
+        events = sse_events_sync(channel, last_event_id=last_event_id)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _job_payload(request, job):
+    """Public view of a job record (params and internals left out)."""
+    return {
+        'job_id': job['id'],
+        'task': job['task'],
+        'priority': job.get('priority'),
+        'status': job['status'],
+        'attempts': job['attempts'],
+        'result': job['result'],
+        'error': job['error'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+        'status_url': request.build_absolute_uri(f"/api/jobs/{job['id']}/"),
+        'progress_url': request.build_absolute_uri(f"/api/progress/{job['id']}/"),
+    }
+
+
+def _job_owner(request):
+    """User ID recorded on jobs submitted by this request (None when anonymous)."""
+    return request.user.id if request.user.is_authenticated else None
+
+
+def _is_other_users_job(request, channel) -> bool:
+    """
+    Whether a progress channel is a job submitted by someone else.
+
+    progress_stream is a plain Django view, so the request is authenticated
+    here the way @api_view would (JWT).
+    """
+    job = get_job_queue().get(channel)
+    if job is None:
+        return False
+    authenticators = [authenticator() for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    return job.get('user_id') != _job_owner(Request(request, authenticators=authenticators))
+
+
+@api_view(['POST'])
+def submit_job(request):
+    """
+    Queue a generation job and return its ID immediately.
+    
+    Expected POST data:
+    - task: 'lyrics', 'instrumental', 'vocals', 'mix' or 'song'
+    - priority: 'high', 'normal' or 'low' (optional, defaults by task)
+    - the same fields the matching endpoint takes (e.g. lyrics, genre)
+    
+    Returns (202):
+    - job_id: ID to poll at status_url
+    - status: 'queued'
+    """
+    try:
+        params = {key: value for key, value in request.data.items() if key not in ('task', 'priority')}
+        job = get_job_queue().submit(
+            request.data.get('task', ''),
+            params,
+            user_id=_job_owner(request),
+            base_url=request.build_absolute_uri('/'),
+            priority=request.data.get('priority') or None,
+        )
+        return Response(_job_payload(request, job), status=status.HTTP_202_ACCEPTED)
+
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response(
             {'error': str(e)},
@@ -274,19 +543,129 @@ def mix_audio(request):
         )
 
 
+@api_view(['GET', 'DELETE'])
+def job_detail(request, job_id):
+    """
+    GET: job status and result. Pass ?wait=<seconds> (max 30) to long-poll
+    until the job finishes.
+    DELETE: cancel the job (running jobs stop at the next stage boundary).
+    """
+    queue = get_job_queue()
+    job = queue.get(job_id)
+    # Other users' jobs look the same as missing ones
+    if job is None or job.get('user_id') != _job_owner(request):
+        return Response({'error': 'Job not found or expired'}, status=status.HTTP_404_NOT_FOUND)
+
+    if request.method == 'DELETE':
+        job = queue.cancel(job_id)
+    else:
+        try:
+            wait = min(float(request.query_params.get('wait', 0)), 30.0)
+        except ValueError:
+            wait = 0
+        if wait > 0:
+            job = queue.wait(job_id, wait)
+
+    if job is None:
+        return Response({'error': 'Job not found or expired'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(_job_payload(request, job), status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def job_metrics(request):
+    """Queue depth, running jobs and lifecycle counters (staff only)."""
+    return Response(get_job_queue().metrics(), status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def admission_status(request):
+    """
+    Per-stage admission gauges and counters.
+    
+    running/queued are node-wide; admitted, rejected (429), timed_out (503)
+    and wait_seconds count requests handled by this worker process. Staff only.
+    """
+    return Response(admission_metrics(), status=status.HTTP_200_OK)
+
+
+def prometheus_metrics(request):
+    """
+    Prometheus scrape endpoint (text exposition format, see api.metrics).
+    
+    With METRICS_TOKEN set the scraper must send it as a bearer token.
+    """
+    if request.method != 'GET':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return JsonResponse({'error': 'Invalid or missing metrics token'}, status=403)
+    try:
+        body, content_type = render_metrics()
+    except RuntimeError as e:
+        return JsonResponse({'error': str(e)}, status=503)
+    return HttpResponse(body, content_type=content_type)
+
+
+def serve_audio(request, name):
+    """
+    Serve a generated file from TEMP_AUDIO_DIR.
+    
+    Content-addressed files (api.audio_store) never change, so they carry
+    the hash as a strong ETag and a one-year immutable Cache-Control; a
+    matching If-None-Match gets 304 without opening the file. Range
+    requests get 206, and the bytes are sent by nginx (X-Accel-Redirect)
+    or sendfile, not Python (see api.audio_serving).
+    
+    Query parameters (optional):
+    - format: 'wav' (master), 'opus', 'mp3' or 'aac'; without it the
+      Accept header decides. A variant not built yet is transcoded in
+      the background and the master is sent meanwhile
+    - bitrate: kbps for a compressed format (see api.variants)
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    name = audio_file_name(name)
+    if not is_authorized(request, name):
+        return JsonResponse({'error': 'Invalid or missing signature'}, status=403)
+    path = os.path.join(settings.TEMP_AUDIO_DIR, name)
+    if not name or not os.path.isfile(path):
+        raise Http404('Audio file not found')
+
+    touch_audio_file(name)
+    try:
+        served, negotiated, final = select_variant(request, name)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return audio_response(request, served, os.path.join(settings.TEMP_AUDIO_DIR, served), negotiated, final)
+
+
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
 def list_create_songs(request):
     """
     List or create songs for the authenticated user.
 
-    GET: return the current user's songs.
+    GET: one page of the current user's songs, newest first. Follow
+    ``next`` for more; ``?page_size=`` (max 100) and ``?include=lyrics``
+    are optional. Pages carry ETag/Last-Modified; an unchanged page is 304.
     POST: create a new Song record after a successful generation.
     """
     if request.method == 'GET':
-        songs = Song.objects.filter(user=request.user)
-        serializer = SongSerializer(songs, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        include = {part.strip() for part in request.query_params.get('include', '').split(',')}
+        include_lyrics = 'lyrics' in include
+
+        def build():
+            songs = Song.objects.filter(user=request.user)
+            if not include_lyrics:
+                songs = songs.defer('lyrics')
+            paginator = SongCursorPagination()
+            page = paginator.paginate_queryset(songs, request)
+            serializer = SongListSerializer(page, many=True, context={'include_lyrics': include_lyrics})
+            return paginator.get_paginated_response(serializer.data).data
+
+        return library_response(request, build)
 
     # POST
     serializer = SongSerializer(data=request.data)
@@ -294,3 +673,85 @@ def list_create_songs(request):
         song = serializer.save(user=request.user)
         return Response(SongSerializer(song).data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_create_songs(request):
+    """
+    Create many songs at once (library import, syncing local history).
+
+    Body: a JSON list of songs with the fields of POST /api/songs/, or
+    {"songs": [...]}. Every song is validated first; then all are written
+    in batches in one transaction, or none are (400 with per-item errors).
+    """
+    items = request.data.get('songs') if isinstance(request.data, dict) else request.data
+    if not isinstance(items, list) or not items:
+        return Response({'error': 'Expected a non-empty list of songs'}, status=status.HTTP_400_BAD_REQUEST)
+    max_items = getattr(settings, 'SONG_BULK_MAX_ITEMS', 500)
+    if len(items) > max_items:
+        return Response({'error': f'At most {max_items} songs per request'},
+                        status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    serializer = SongSerializer(data=items, many=True)
+    if not serializer.is_valid():
+        return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    songs = [Song(user=request.user, **fields) for fields in serializer.validated_data]
+    for song in songs:
+        # bulk_create skips save()
+        song.sync_audio_files()
+    with transaction.atomic():
+        Song.objects.bulk_create(songs, batch_size=BULK_BATCH_SIZE)
+        songs_bulk_created(songs)
+    return Response({'created': len(songs), 'ids': [song.pk for song in songs]},
+                    status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_songs(request):
+    """
+    Stream every song of the current user as NDJSON (one JSON object per
+    line, oldest first). Rows are read with a chunked iterator, so memory
+    stays flat however large the library is.
+    """
+    rows = Song.objects.filter(user=request.user).order_by('created_at', 'id') \
+        .values(*EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    def lines():
+        for row in rows:
+            yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+    response = StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+    response['Content-Disposition'] = 'attachment; filename="songs.ndjson"'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search_library(request):
+    """
+    Full-text search over the current user's songs (title and lyrics).
+
+    GET ?q=<words>&limit=20&offset=0: best matches first, each with its
+    rank, the highlighted title and a lyrics snippet (HTML, matches in <mark>).
+    """
+    query = request.query_params.get('q', '').strip()
+    if not query:
+        return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = int(request.query_params.get('limit', 20))
+        offset = int(request.query_params.get('offset', 0))
+    except ValueError:
+        return Response({'error': 'limit and offset must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+    hits = search_songs(request.user.id, query, limit=limit, offset=offset)
+    songs = Song.objects.filter(user=request.user, id__in=[hit.song_id for hit in hits]).defer('lyrics')
+    songs = {song.id: SongListSerializer(song).data for song in songs}
+    results = [
+        {**songs[hit.song_id], 'rank': hit.rank, 'title_highlight': mark_up(hit.title),
+         'snippet': mark_up(hit.snippet)}
+        for hit in hits if hit.song_id in songs
+    ]
+    return Response({'query': query, 'offset': offset, 'results': results}, status=status.HTTP_200_OK)
@@ -0,0 +1,227 @@
+"""
+Waveform peaks for generated audio.
+
+Every file the generation stages write gets a ``<stem>.peaks.json``
+sidecar, so players can draw a waveform without downloading and decoding
+the WAV. The sidecar holds min/max pairs at several resolutions, 8-bit
+quantized (the layout of BBC audiowaveform's JSON output):
+
+    {"version": 1, "sample_rate": 44100, "bits": 8, "duration": 30.0,
+     "overview": {"samples_per_peak": ..., "length": 512, "data": [min, max, ...]},
+     "levels": [{"samples_per_peak": 256, "length": ..., "data": [...]}, ...]}
+
+PeakAccumulator reduces audio block by block with NumPy, so the streaming
+mixer computes peaks while it renders at negligible extra cost; other
+stages feed their rendered samples once, or the file is read back in
+blocks. The sidecar moves with the audio when it is content-addressed
+(api.audio_store), and responses carry its URL plus the overview.
+
+NumPy is imported when audio is first reduced rather than with the module:
+views import waveform_payload, which only reads sidecars.
+"""
+
+import json
+import logging
+import os
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+
+from .audio_store import WAVEFORM_SUFFIX, sidecar_path
+
+if TYPE_CHECKING:
+    import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+BASE_SAMPLES_PER_PEAK = 256
+# Each coarser level merges this many peaks of the level below
+LEVEL_FACTOR = 4
+DEFAULT_OVERVIEW_POINTS = 512
+
+
+class PeakAccumulator:
+    """
+    Min/max per bucket of ``samples_per_peak`` frames, fed block by block.
+
+    Channels are folded together (the min and max over all channels), and
+    a partial bucket is carried over to the next block.
+    """
+
+    def __init__(self, sample_rate: int, samples_per_peak: int = BASE_SAMPLES_PER_PEAK):
+        import numpy as np
+        self.sample_rate = int(sample_rate)
+        self.samples_per_peak = samples_per_peak
+        self.frames = 0
+        self._mins = []
+        self._maxs = []
+        self._carry_min = np.zeros(0, dtype=np.float32)
+        self._carry_max = np.zeros(0, dtype=np.float32)
+
+    def add(self, block: 'np.ndarray'):
+        """Add float frames in [-1, 1], shaped (frames,) or (frames, channels)."""
+        import numpy as np
+        block = np.asarray(block, dtype=np.float32)
+        if len(block) == 0:
+            return
+        self.frames += len(block)
+        if block.ndim == 1:
+            lows, highs = block, block
+        else:
+            lows, highs = block.min(axis=1), block.max(axis=1)
+        if len(self._carry_min):
+            lows = np.concatenate([self._carry_min, lows])
+            highs = np.concatenate([self._carry_max, highs])
+
+        size = self.samples_per_peak
+        full = len(lows) // size * size
+        if full:
+            self._mins.append(lows[:full].reshape(-1, size).min(axis=1))
+            self._maxs.append(highs[:full].reshape(-1, size).max(axis=1))
+        self._carry_min = lows[full:].copy()
+        self._carry_max = highs[full:].copy()
+
+    def peaks(self) -> tuple:
+        """(mins, maxs) at the base resolution, including the partial bucket."""
+        import numpy as np
+        mins, maxs = list(self._mins), list(self._maxs)
+        if len(self._carry_min):
+            mins.append(self._carry_min.min(keepdims=True))
+            maxs.append(self._carry_max.max(keepdims=True))
+        if not mins:
+            empty = np.zeros(0, dtype=np.float32)
+            return empty, empty
+        return np.concatenate(mins), np.concatenate(maxs)
+
+    def finish(self, overview_points: int = None) -> dict:
+        """The sidecar document."""
+        overview_points = overview_points or getattr(settings, 'WAVEFORM_OVERVIEW_POINTS', DEFAULT_OVERVIEW_POINTS)
+        base_mins, base_maxs = self.peaks()
+        mins, maxs = base_mins, base_maxs
+        levels = [_level(self.samples_per_peak, mins, maxs)]
+        samples_per_peak = self.samples_per_peak
+        while len(mins) > overview_points:
+            mins, maxs = _merge(mins, maxs, LEVEL_FACTOR)
+            samples_per_peak *= LEVEL_FACTOR
+            levels.append(_level(samples_per_peak, mins, maxs))
+
+        return {
+            'version': 1,
+            'sample_rate': self.sample_rate,
+            'bits': 8,
+            'duration': round(self.frames / float(self.sample_rate or 1), 3),
+            'overview': _overview(base_mins, base_maxs, overview_points, self.samples_per_peak),
+            'levels': levels,
+        }
+
+
+def _merge(mins: 'np.ndarray', maxs: 'np.ndarray', factor: int) -> tuple:
+    """Merge every ``factor`` neighbouring peaks (the last group may be short)."""
+    import numpy as np
+    starts = np.arange(0, len(mins), factor)
+    return np.minimum.reduceat(mins, starts), np.maximum.reduceat(maxs, starts)
+
+
+def _quantize(mins: 'np.ndarray', maxs: 'np.ndarray') -> list:
+    """Interleave min/max pairs as int8 values."""
+    import numpy as np
+    pairs = np.empty(len(mins) * 2, dtype=np.float32)
+    pairs[0::2] = mins
+    pairs[1::2] = maxs
+    return np.clip(np.round(pairs * 127.0), -128, 127).astype(np.int8).tolist()
+
+
+def _level(samples_per_peak: int, mins: 'np.ndarray', maxs: 'np.ndarray') -> dict:
+    return {'samples_per_peak': samples_per_peak, 'length': len(mins), 'data': _quantize(mins, maxs)}
+
+
+def _overview(mins: 'np.ndarray', maxs: 'np.ndarray', points: int, samples_per_peak: int) -> dict:
+    """At most ``points`` peaks spanning the whole file (buckets of near-equal width)."""
+    if len(mins) > points:
+        import numpy as np
+        starts = np.linspace(0, len(mins), points, endpoint=False).astype(np.int64)
+        samples_per_peak = int(round(samples_per_peak * len(mins) / float(points)))
+        mins, maxs = np.minimum.reduceat(mins, starts), np.maximum.reduceat(maxs, starts)
+    return _level(samples_per_peak, mins, maxs)
+
+
+def waveform_enabled() -> bool:
+    return getattr(settings, 'WAVEFORM_ENABLED', True)
+
+
+def save_waveform(audio_path: str, accumulator: PeakAccumulator) -> str:
+    """Write the sidecar for an audio file; returns its path (None on failure)."""
+    if not waveform_enabled():
+        return None
+    path = sidecar_path(str(audio_path), WAVEFORM_SUFFIX)
+    try:
+        with open(path, 'w') as f:
+            json.dump(accumulator.finish(), f, separators=(',', ':'))
+    except (OSError, ValueError) as e:
+        logger.warning("Could not write waveform for %s: %s", os.path.basename(str(audio_path)), e)
+        return None
+    return path
+
+
+def waveform_from_samples(audio_path: str, samples: 'np.ndarray', sample_rate: int) -> str:
+    """Sidecar for audio rendered in memory (int16 or float samples)."""
+    if not waveform_enabled():
+        return None
+    import numpy as np
+    samples = np.asarray(samples)
+    if samples.dtype == np.int16:
+        samples = samples.astype(np.float32) / 32768.0
+    accumulator = PeakAccumulator(sample_rate)
+    accumulator.add(samples)
+    return save_waveform(audio_path, accumulator)
+
+
+def waveform_from_file(audio_path: str) -> str:
+    """Sidecar for a file on disk, read block by block (non-WAV through FFmpeg)."""
+    if not waveform_enabled():
+        return None
+    from .audio_stream import DEFAULT_BLOCK_FRAMES, open_block_reader
+    try:
+        reader = open_block_reader(str(audio_path))
+        try:
+            accumulator = PeakAccumulator(getattr(reader, 'sample_rate', 44100))
+            while True:
+                block = reader.read(DEFAULT_BLOCK_FRAMES)
+                if len(block) == 0:
+                    break
+                accumulator.add(block)
+        finally:
+            reader.close()
+    except Exception as e:
+        logger.warning("Could not compute waveform for %s: %s", os.path.basename(str(audio_path)), e)
+        return None
+    return save_waveform(audio_path, accumulator)
+
+
+def waveform_payload(audio_url: str, build_url=None) -> dict:
+    """
+    Waveform fields for a stage response: the sidecar URL and the overview.
+
+    Args:
+        audio_url: URL (or path) of a file in TEMP_AUDIO_DIR
+        build_url: Callable turning a relative URL into an absolute one
+
+    Returns None when the file has no sidecar.
+    """
+    name = os.path.basename(str(audio_url).split('?', 1)[0])
+    path = sidecar_path(os.path.join(settings.TEMP_AUDIO_DIR, name), WAVEFORM_SUFFIX)
+    try:
+        with open(path) as f:
+            document = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    from .audio_serving import signed_query
+    name = os.path.basename(path)
+    url = f'{settings.TEMP_AUDIO_URL}{name}{signed_query(name)}'
+    return {
+        'url': build_url(url) if build_url else url,
+        'duration': document.get('duration'),
+        'overview': document.get('overview'),
+    }
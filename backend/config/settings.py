@@ -36,6 +36,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so every log line and latency sample carries the request ID
+    'api.middleware.RequestIDMiddleware',
+    # Opt-in per-request profiles; removed at startup unless configured
+    'api.middleware.ProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -123,6 +127,16 @@ CORS_ALLOW_HEADERS = ['*']
 # AI Model Configuration
 HUGGINGFACE_API_TOKEN = os.getenv('HUGGINGFACE_API_TOKEN')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+GROQ_API_KEY = os.getenv('GROQ_API_KEY')
+TOGETHER_API_KEY = os.getenv('TOGETHER_API_KEY')
+MUBERT_API_KEY = os.getenv('MUBERT_API_KEY')
+SUNO_API_KEY = os.getenv('SUNO_API_KEY')
+# Provider API base URLs; point them at tools/mock_providers.py for load tests
+OPENAI_API_BASE = os.getenv('OPENAI_API_BASE', 'https://api.openai.com/v1')
+GROQ_API_BASE = os.getenv('GROQ_API_BASE', 'https://api.groq.com/openai/v1')
+TOGETHER_API_BASE = os.getenv('TOGETHER_API_BASE', 'https://api.together.xyz/v1')
+MUBERT_API_BASE = os.getenv('MUBERT_API_BASE', 'https://api-b2b.mubert.com/v2')
+ELEVENLABS_API_BASE = os.getenv('ELEVENLABS_API_BASE', 'https://api.elevenlabs.io/v1')
 
 # Model loading
 MODEL_CACHE_DIR = Path(os.getenv('MODEL_CACHE_DIR', BASE_DIR / 'models'))
@@ -132,6 +146,139 @@ TEMP_AUDIO_DIR = Path(os.getenv('TEMP_AUDIO_DIR', BASE_DIR / 'temp_audio'))
 MAX_AUDIO_SIZE_MB = int(os.getenv('MAX_AUDIO_SIZE_MB', '100'))
 DEFAULT_AUDIO_DURATION_SECONDS = int(os.getenv('DEFAULT_AUDIO_DURATION_SECONDS', '180'))
 FFMPEG_PATH = os.getenv('FFMPEG_PATH', 'ffmpeg')
+# Mixing: 'auto' (pydub, then streaming, then FFmpeg), 'pydub' or 'stream'
+AUDIO_MIX_MODE = os.getenv('AUDIO_MIX_MODE', 'auto')
+# Frames per block for the constant-memory streaming mixer
+AUDIO_STREAM_BLOCK_FRAMES = int(os.getenv('AUDIO_STREAM_BLOCK_FRAMES', '65536'))
+# Single-pass FFmpeg mastering (mix -> loudnorm -> limiter -> encode)
+FFMPEG_TIMEOUT_SECONDS = int(os.getenv('FFMPEG_TIMEOUT_SECONDS', '240'))
+MASTER_TARGET_LUFS = float(os.getenv('MASTER_TARGET_LUFS', '-14'))
+MASTER_TRUE_PEAK_DB = float(os.getenv('MASTER_TRUE_PEAK_DB', '-1.5'))
+
+# Generated audio lifecycle: idle files expire after the TTL, and the
+# least recently used are evicted while the directory exceeds the quota.
+# Files referenced by a Song are never removed
+TEMP_AUDIO_TTL_SECONDS = int(os.getenv('TEMP_AUDIO_TTL_SECONDS', '86400'))
+TEMP_AUDIO_MAX_BYTES = int(os.getenv('TEMP_AUDIO_MAX_BYTES', str(5 * 1024 ** 3)))
+TEMP_AUDIO_SWEEP_INTERVAL_SECONDS = int(os.getenv('TEMP_AUDIO_SWEEP_INTERVAL_SECONDS', '60'))
+TEMP_AUDIO_SWEEP_BATCH = int(os.getenv('TEMP_AUDIO_SWEEP_BATCH', '200'))
+
+# Generated audio serving: behind nginx, hand the bytes off with
+# X-Accel-Redirect to this internal location (empty: Django sends the
+# file itself with sendfile). Signed URLs require ?sig= on every request
+AUDIO_ACCEL_REDIRECT_PREFIX = os.getenv('AUDIO_ACCEL_REDIRECT_PREFIX', '')
+AUDIO_SIGNED_URLS = os.getenv('AUDIO_SIGNED_URLS', 'False').lower() == 'true'
+
+# Compressed variants (Opus/MP3/AAC) of generated audio: LRU cache quota
+# for TEMP_AUDIO_DIR/variants, and renditions built right after mixing,
+# e.g. "opus:96,mp3:192" (empty: only on first request)
+AUDIO_VARIANTS_MAX_BYTES = int(os.getenv('AUDIO_VARIANTS_MAX_BYTES', str(2 * 1024 ** 3)))
+AUDIO_VARIANTS_EAGER = os.getenv('AUDIO_VARIANTS_EAGER', '')
+
+# Waveform peaks: a <name>.peaks.json sidecar for every generated file,
+# with an overview of this many min/max pairs returned in responses
+WAVEFORM_ENABLED = os.getenv('WAVEFORM_ENABLED', 'True').lower() == 'true'
+WAVEFORM_OVERVIEW_POINTS = int(os.getenv('WAVEFORM_OVERVIEW_POINTS', '512'))
+
+# Background jobs: 'inprocess' (worker threads in each web process) or
+# 'redis' (shared queue drained by `python manage.py run_job_worker`)
+REDIS_URL = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+JOB_BACKEND = os.getenv('JOB_BACKEND', 'inprocess')
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_MAX_RETRIES = int(os.getenv('JOB_MAX_RETRIES', '2'))
+JOB_RETRY_BACKOFF_SECONDS = float(os.getenv('JOB_RETRY_BACKOFF_SECONDS', '5'))
+JOB_RESULT_TTL_SECONDS = int(os.getenv('JOB_RESULT_TTL_SECONDS', '3600'))
+JOB_REDIS_PREFIX = os.getenv('JOB_REDIS_PREFIX', 'auralynx:jobs')
+
+# Progress events over SSE: 'inprocess' (single process only) or 'redis'
+PROGRESS_BACKEND = os.getenv('PROGRESS_BACKEND', 'inprocess')
+PROGRESS_REDIS_PREFIX = os.getenv('PROGRESS_REDIS_PREFIX', 'auralynx:progress')
+PROGRESS_HISTORY = int(os.getenv('PROGRESS_HISTORY', '50'))
+PROGRESS_TTL_SECONDS = int(os.getenv('PROGRESS_TTL_SECONDS', '3600'))
+PROGRESS_HEARTBEAT_SECONDS = int(os.getenv('PROGRESS_HEARTBEAT_SECONDS', '15'))
+PROGRESS_STREAM_TIMEOUT_SECONDS = int(os.getenv('PROGRESS_STREAM_TIMEOUT_SECONDS', '600'))
+# gunicorn's worker timeout (gunicorn.conf.py); sync-worker streams end
+# WORKER_TIMEOUT_MARGIN_SECONDS before it and the client reconnects
+WORKER_TIMEOUT_SECONDS = int(os.getenv('GUNICORN_TIMEOUT', '300'))
+
+# Cache: 'file' (shared by all workers on one node) or 'redis' (shared
+# across nodes, atomic locks). Defaults to redis with the redis job queue:
+# job workers run in their own containers, and library versions,
+# coalescing locks and pending variants must be visible to the web lanes
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'redis' if JOB_BACKEND == 'redis' else 'file')
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_REDIS_URL', REDIS_URL),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DIR', str(BASE_DIR / 'cache')),
+        }
+    }
+
+# Single-flight coalescing of identical generation requests
+COALESCE_ENABLED = os.getenv('COALESCE_ENABLED', 'True').lower() == 'true'
+COALESCE_CACHE_PREFIX = os.getenv('COALESCE_CACHE_PREFIX', 'auralynx:coalesce')
+COALESCE_LOCK_TTL_SECONDS = int(os.getenv('COALESCE_LOCK_TTL_SECONDS', '300'))
+COALESCE_RESULT_TTL_SECONDS = int(os.getenv('COALESCE_RESULT_TTL_SECONDS', '30'))
+COALESCE_POLL_SECONDS = float(os.getenv('COALESCE_POLL_SECONDS', '0.25'))
+
+# Song library listings: rendered pages are cached per user and
+# invalidated by Song writes (0 disables; ETag/304 still apply)
+SONG_CACHE_TTL_SECONDS = int(os.getenv('SONG_CACHE_TTL_SECONDS', '300'))
+# Songs per POST /api/songs/bulk/ (the body is also capped by
+# DATA_UPLOAD_MAX_MEMORY_SIZE)
+SONG_BULK_MAX_ITEMS = int(os.getenv('SONG_BULK_MAX_ITEMS', '500'))
+
+# Prometheus scrape endpoint /api/metrics/ (api.metrics): optional bearer
+# token. Multiprocess aggregation under gunicorn is enabled by the
+# PROMETHEUS_MULTIPROC_DIR environment variable (see gunicorn.conf.py)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Per-request profiling (api.profiling): requests sending
+# "X-Profile: <PROFILING_TOKEN>", or this fraction of all requests, are
+# profiled into PROFILING_DIR (newest PROFILING_MAX_ARTIFACTS kept). Off
+# when neither is set. Modes: 'sample' (collapsed stacks) or 'cprofile'
+PROFILING_TOKEN = os.getenv('PROFILING_TOKEN', '')
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_MODE = os.getenv('PROFILING_MODE', 'sample')
+PROFILING_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILING_SAMPLE_INTERVAL_MS', '5'))
+PROFILING_DIR = Path(os.getenv('PROFILING_DIR', BASE_DIR / 'profiles'))
+PROFILING_MAX_ARTIFACTS = int(os.getenv('PROFILING_MAX_ARTIFACTS', '50'))
+
+# Cold-start budget: api.tests.StartupTimeTests fails when django.setup() plus
+# importing the URLconf takes longer than this in a fresh interpreter, or
+# when it imports torch, transformers, pydub or numpy
+STARTUP_BUDGET_SECONDS = float(os.getenv('STARTUP_BUDGET_SECONDS', '3'))
+
+# Admission control: per-stage concurrency on this node and a bounded wait
+# queue ("stage=concurrency:queue"). Beyond the queue requests get 429;
+# waiting longer than ADMISSION_WAIT_SECONDS gets 503 (both with Retry-After)
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'True').lower() == 'true'
+ADMISSION_LIMITS = os.getenv(
+    'ADMISSION_LIMITS', 'transcribe=1:4,lyrics=16:64,instrumental=2:8,vocals=2:8,mix=2:8,song=1:4'
+)
+ADMISSION_WAIT_SECONDS = float(os.getenv('ADMISSION_WAIT_SECONDS', '30'))
+ADMISSION_RETRY_AFTER_SECONDS = int(os.getenv('ADMISSION_RETRY_AFTER_SECONDS', '10'))
+ADMISSION_LOCK_DIR = os.getenv('ADMISSION_LOCK_DIR', '')
+
+# Priority classes for heavy work (CPU pool and job queue): weighted
+# round-robin between high/normal/low, and each stage's default class
+PRIORITY_WEIGHTS = os.getenv('PRIORITY_WEIGHTS', 'high=6,normal=3,low=1')
+STAGE_PRIORITIES = os.getenv(
+    'STAGE_PRIORITIES', 'lyrics=high,mix=high,transcribe=normal,instrumental=normal,vocals=normal,song=low'
+)
+
+# ASGI: serve the provider-bound endpoints with async views (set when
+# running config.asgi:application, e.g. under uvicorn workers)
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False').lower() == 'true'
+# Threads for CPU work offloaded from async views (synthesis, decoding, mixing)
+CPU_EXECUTOR_WORKERS = int(os.getenv('CPU_EXECUTOR_WORKERS', '4'))
 
 # Performance settings
 TORCH_DEVICE = os.getenv('TORCH_DEVICE', 'auto')
@@ -167,26 +314,40 @@ if not DEBUG:
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 # Logging Configuration
+# Log records carry the request ID; LOG_FORMAT=json writes one JSON object
+# per line (with the ``extra`` fields, e.g. stage and provider) for log shippers
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'request_id': {
+            '()': 'api.log.RequestIDFilter',
+        },
+    },
     'formatters': {
         'verbose': {
-            'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}',
+            'format': '{levelname} {asctime} {module} {process:d} {thread:d} [{request_id}] {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'api.log.JSONFormatter',
+        },
     },
     'handlers': {
         'file': {
             'level': env('LOG_LEVEL', default='INFO'),
             'class': 'logging.FileHandler',
             'filename': 'auralynx.log',
-            'formatter': 'verbose',
+            'filters': ['request_id'],
+            'formatter': 'json' if LOG_FORMAT == 'json' else 'verbose',
         },
         'console': {
             'level': 'INFO',
             'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
+            'filters': ['request_id'],
+            'formatter': 'json' if LOG_FORMAT == 'json' else 'verbose',
         },
     },
     'root': {
@@ -196,5 +357,8 @@ LOGGING = {
 }
 
 # Performance Settings
-DATA_UPLOAD_MAX_MEMORY_SIZE = MAX_AUDIO_SIZE_MB * 1024 * 1024  # Convert MB to bytes
-FILE_UPLOAD_MAX_MEMORY_SIZE = MAX_AUDIO_SIZE_MB * 1024 * 1024
+# Uploads stay in memory up to this size, then spool to disk; the audio
+# size limit (MAX_AUDIO_SIZE_MB) is enforced while streaming (api.uploads)
+UPLOAD_SPOOL_MAX_BYTES = int(os.getenv('UPLOAD_SPOOL_MAX_BYTES', str(2 * 1024 * 1024)))
+DATA_UPLOAD_MAX_MEMORY_SIZE = UPLOAD_SPOOL_MAX_BYTES
+FILE_UPLOAD_MAX_MEMORY_SIZE = UPLOAD_SPOOL_MAX_BYTES
@@ -3,11 +3,13 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from api.views import serve_audio
+
 urlpatterns = [
     path('api/', include('api.urls')),
+    # Generated audio (content-addressed, served with immutable caching)
+    path(settings.TEMP_AUDIO_URL.strip('/') + '/<str:name>', serve_audio, name='serve_audio'),
 ]
 
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-    # Serve temp audio files during development
-    urlpatterns += static('/temp-audio/', document_root=settings.TEMP_AUDIO_DIR)
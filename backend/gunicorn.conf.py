@@ -11,12 +11,18 @@ bind = "0.0.0.0:8000"
 backlog = 2048
 
 # Worker processes
-workers = multiprocessing.cpu_count() * 2 + 1
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', '1'))
 max_requests = 1000
 max_requests_jitter = 100
-worker_class = "sync"
+# 'sync' serves config.wsgi; 'uvicorn.workers.UvicornWorker' serves
+# config.asgi, where one worker awaits many provider calls at once
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+wsgi_app = os.getenv('GUNICORN_APP', 'config.wsgi:application')
 worker_connections = 1000
-timeout = 300  # 5 minutes for AI processing
+# 5 minutes for AI processing; settings.WORKER_TIMEOUT_SECONDS reads the
+# same variable so sync SSE streams end before it
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '300'))
 keepalive = 2
 
 # Restart workers after this many requests, with up to jitter variance
@@ -43,4 +49,33 @@ tmp_upload_dir = None
 # certfile = "/path/to/certfile"
 
 # Performance
-worker_tmp_dir = "/dev/shm"  # Use memory for better performance on Linux
\ No newline at end of file
+worker_tmp_dir = "/dev/shm"  # Use memory for better performance on Linux
+
+# Lanes: the heavy lane (renders) runs at a lower CPU priority so the
+# interactive lane keeps answering health, auth and song requests while
+# renders saturate the node
+def post_fork(server, worker):
+    niceness = int(os.getenv('GUNICORN_NICE', '0'))
+    if niceness:
+        os.nice(niceness)
+
+
+# Prometheus multiprocess mode: every worker writes its samples to
+# PROMETHEUS_MULTIPROC_DIR and /api/metrics/ aggregates them. The directory
+# is emptied at startup (stale files would resurrect old counters) and the
+# files of exited workers are marked dead so their live gauges drop out
+def on_starting(server):
+    directory = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        import shutil
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        try:
+            from prometheus_client import multiprocess
+        except ImportError:
+            return
+        multiprocess.mark_process_dead(worker.pid)
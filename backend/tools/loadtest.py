@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+"""
+Load test for the generation flow: throughput and latency percentiles.
+
+Each virtual user repeats one flow the way the frontend runs it:
+
+    steps (default): generate-lyrics -> generate-instrumental -> generate-vocals -> mix-audio
+    song:            generate-song (the server-side stage graph)
+
+Usage (backend pointed at tools/mock_providers.py, see that file):
+
+    python tools/loadtest.py --base-url http://127.0.0.1:8000/api --users 8 --duration 60
+    python tools/loadtest.py --mode song --users 4 --flows 100 --json results.json
+
+Every flow uses a distinct theme so request coalescing does not merge them
+(--same-input measures coalescing instead). 429 and 503 answers from
+admission control count as failed steps and appear in the status table.
+
+Only the standard library is needed.
+"""
+
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+GENRES = ('pop', 'rock', 'jazz', 'electronic', 'hip-hop')
+PERCENTILES = (50, 90, 95, 99)
+
+
+class Recorder:
+    """Latencies and statuses per step, shared by all virtual users."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.statuses = {}
+        self.flows_ok = 0
+        self.flows_failed = 0
+        self.errors = {}
+
+    def step(self, name: str, status: int, seconds: float):
+        with self.lock:
+            self.latencies.setdefault(name, []).append((seconds, 200 <= status < 300))
+            counts = self.statuses.setdefault(name, {})
+            counts[status] = counts.get(status, 0) + 1
+
+    def flow(self, ok: bool, seconds: float):
+        with self.lock:
+            self.latencies.setdefault('flow', []).append((seconds, ok))
+            counts = self.statuses.setdefault('flow', {})
+            outcome = 'ok' if ok else 'failed'
+            counts[outcome] = counts.get(outcome, 0) + 1
+            if ok:
+                self.flows_ok += 1
+            else:
+                self.flows_failed += 1
+
+    def error(self, exc: Exception):
+        """Count an exception raised by a flow (an unexpected response body, say)."""
+        key = f'{type(exc).__name__}: {exc}'
+        with self.lock:
+            self.errors[key] = self.errors.get(key, 0) + 1
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+class Client:
+    def __init__(self, base_url: str, token: str = '', timeout: float = 600):
+        self.base_url = base_url.rstrip('/')
+        self.headers = {'Content-Type': 'application/json'}
+        if token:
+            self.headers['Authorization'] = f'Bearer {token}'
+        self.timeout = timeout
+
+    def post(self, path: str, payload: dict) -> tuple:
+        """(status, JSON body or None); status 0 for connection errors."""
+        request = urllib.request.Request(f'{self.base_url}/{path}', data=json.dumps(payload).encode(),
+                                         headers=self.headers, method='POST')
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, json.loads(response.read() or b'null')
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code, None
+        except (urllib.error.URLError, OSError, ValueError):
+            return 0, None
+
+
+def run_flow(client: Client, recorder: Recorder, mode: str, theme: str, genre: str) -> bool:
+    """One flow; returns whether every step succeeded (stops at the first failure)."""
+    def step(name, path, payload):
+        started = time.perf_counter()
+        status, body = client.post(path, payload)
+        recorder.step(name, status, time.perf_counter() - started)
+        return body if 200 <= status < 300 and body else None
+
+    if mode == 'song':
+        return step('song', 'generate-song/', {'input_text': theme, 'genre': genre}) is not None
+
+    lyrics = step('lyrics', 'generate-lyrics/', {'input_text': theme, 'genre': genre})
+    if not lyrics:
+        return False
+    instrumental = step('instrumental', 'generate-instrumental/', {'lyrics': lyrics['lyrics'], 'genre': genre})
+    if not instrumental:
+        return False
+    vocals = step('vocals', 'generate-vocals/', {'lyrics': lyrics['lyrics'], 'genre': genre})
+    if not vocals:
+        return False
+    return step('mix', 'mix-audio/', {'instrumental_url': instrumental['url'],
+                                      'vocals_url': vocals['url'], 'genre': genre}) is not None
+
+
+def virtual_user(index: int, args, client: Client, recorder: Recorder, budget, deadline: float):
+    flow = 0
+    while time.monotonic() < deadline and budget():
+        theme = 'late night drive' if args.same_input else f'late night drive {uuid.uuid4().hex[:8]}'
+        started = time.perf_counter()
+        try:
+            ok = run_flow(client, recorder, args.mode, theme, GENRES[(index + flow) % len(GENRES)])
+        except Exception as e:
+            recorder.error(e)
+            ok = False
+        recorder.flow(ok, time.perf_counter() - started)
+        flow += 1
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+    steps = {}
+    for name, samples in recorder.latencies.items():
+        ok = [seconds for seconds, success in samples if success]
+        entry = {
+            'requests': len(samples),
+            'ok': len(ok),
+            'statuses': {str(status): count for status, count in sorted(recorder.statuses[name].items())},
+            'throughput_per_second': round(len(ok) / elapsed, 3) if elapsed else 0.0,
+        }
+        if ok:
+            entry.update({f'p{pct}': round(percentile(ok, pct), 4) for pct in PERCENTILES})
+            entry.update(mean=round(statistics.fmean(ok), 4), max=round(max(ok), 4))
+        steps[name] = entry
+    return {
+        'elapsed_seconds': round(elapsed, 3),
+        'flows_ok': recorder.flows_ok,
+        'flows_failed': recorder.flows_failed,
+        'flows_per_second': round(recorder.flows_ok / elapsed, 3) if elapsed else 0.0,
+        'errors': dict(recorder.errors),
+        'steps': steps,
+    }
+
+
+def print_report(report: dict):
+    print(f"\n{report['flows_ok']} flow(s) ok, {report['flows_failed']} failed in {report['elapsed_seconds']} s "
+          f"({report['flows_per_second']} flows/s)\n")
+    header = f"{'step':<14}{'ok/req':>12}{'rps':>9}" + ''.join(f"{f'p{pct}':>10}" for pct in PERCENTILES) \
+        + f"{'max':>10}  statuses"
+    print(header)
+    print('-' * len(header))
+    for name, entry in report['steps'].items():
+        latencies = ''.join(f"{entry.get(f'p{pct}', float('nan')):>10.3f}" for pct in PERCENTILES)
+        print(f"{name:<14}{entry['ok']:>6}/{entry['requests']:<5}{entry['throughput_per_second']:>9.2f}"
+              f"{latencies}{entry.get('max', float('nan')):>10.3f}  {entry['statuses']}")
+    print("\nLatencies in seconds over successful requests; status 0 means no response.")
+    if report['errors']:
+        print("\nFlow errors:")
+        for error, count in report['errors'].items():
+            print(f"  {count:>5}  {error}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000/api')
+    parser.add_argument('--mode', choices=('steps', 'song'), default='steps')
+    parser.add_argument('--users', type=int, default=4, help='Concurrent virtual users.')
+    parser.add_argument('--duration', type=float, default=60, help='Stop starting flows after this many seconds.')
+    parser.add_argument('--flows', type=int, default=0, help='Stop after this many flows in total (0: no limit).')
+    parser.add_argument('--token', default='', help='JWT access token sent as a bearer token.')
+    parser.add_argument('--timeout', type=float, default=600, help='Per-request timeout in seconds.')
+    parser.add_argument('--same-input', action='store_true', help='Send identical inputs (measures coalescing).')
+    parser.add_argument('--json', help='Also write the report to this file.')
+    args = parser.parse_args(argv)
+
+    recorder = Recorder()
+    client = Client(args.base_url, args.token, args.timeout)
+    started_flows = [0]
+    lock = threading.Lock()
+
+    def budget() -> bool:
+        with lock:
+            if args.flows and started_flows[0] >= args.flows:
+                return False
+            started_flows[0] += 1
+            return True
+
+    print(f"{args.users} user(s), mode {args.mode}, against {args.base_url}")
+    started = time.perf_counter()
+    deadline = time.monotonic() + args.duration
+    try:
+        with ThreadPoolExecutor(max_workers=args.users) as pool:
+            users = [pool.submit(virtual_user, index, args, client, recorder, budget, deadline)
+                     for index in range(args.users)]
+            # Flow errors are recorded; anything else fails the run here
+            for user in users:
+                user.result()
+    except KeyboardInterrupt:
+        print("Interrupted; reporting what finished.")
+    report = summarize(recorder, time.perf_counter() - started)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
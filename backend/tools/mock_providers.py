@@ -0,0 +1,489 @@
+#!/usr/bin/env python
+"""
+Local stand-in for the AI providers called by api/utils.py, for load tests
+that must not spend provider quota.
+
+Endpoints (same paths and response shapes as the real APIs):
+
+    POST /v1/chat/completions                 OpenAI, Together AI ("stream": true for SSE)
+    POST /openai/v1/chat/completions          Groq
+    POST /v1/text-to-speech/<voice>[/stream]  ElevenLabs (MP3, or WAV with --tts-format wav)
+    POST /v2/RecordTrack                      Mubert; the download link points back here
+    GET  /files/<name>.wav                    Mubert downloads
+
+    GET  /_mock/stats                         requests, statuses and injected delay per route
+    POST /_mock/config                        change faults at runtime (same JSON as --config)
+    POST /_mock/reset                         zero the stats
+
+Faults are set per route group (chat, tts, record, download, or "*" for all):
+
+    --latency chat=lognormal:800:0.5     delay in ms: fixed:MS, uniform:LO:HI,
+                                         normal:MEAN:SD, lognormal:MEDIAN:SIGMA, exp:MEAN
+    --error-rate tts=0.05                fraction answered with 500/502/503
+    --rate-limit chat=20                 requests per second before 429 + Retry-After
+    --throttle-rate record=0.1           fraction answered 429 regardless of rate
+    --stream-interval 20                 ms between streamed chunks
+
+Run it and point the backend at it:
+
+    python tools/mock_providers.py --port 8090 --latency "*=lognormal:600:0.4" --error-rate chat=0.02
+
+    OPENAI_API_BASE=http://127.0.0.1:8090/v1  OPENAI_API_KEY=mock
+    GROQ_API_BASE=http://127.0.0.1:8090/openai/v1  GROQ_API_KEY=mock
+    TOGETHER_API_BASE=http://127.0.0.1:8090/v1  TOGETHER_API_KEY=mock
+    MUBERT_API_BASE=http://127.0.0.1:8090/v2  MUBERT_API_KEY=mock
+    ELEVENLABS_API_BASE=http://127.0.0.1:8090/v1  ELEVENLABS_API_KEY=mock
+
+Only the standard library is needed, so it can run on a separate load
+machine. MP3 encoding uses ffmpeg when it is on PATH (otherwise
+text-to-speech answers with WAV).
+"""
+
+import argparse
+import array
+import io
+import json
+import math
+import random
+import re
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+import wave
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+
+ROUTES = ('chat', 'tts', 'record', 'download')
+SAMPLE_RATE = 44100
+MAX_AUDIO_SECONDS = 300
+SERVER_ERRORS = (500, 502, 503)
+
+
+class Latency:
+    """A delay distribution in milliseconds, parsed from "kind:arg[:arg]"."""
+
+    KINDS = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2, 'exp': 1}
+
+    def __init__(self, spec: str = 'fixed:0'):
+        kind, _, args = spec.partition(':')
+        try:
+            values = [float(value) for value in args.split(':')] if args else []
+        except ValueError:
+            values = None
+        if kind not in self.KINDS or values is None or len(values) != self.KINDS[kind]:
+            raise ValueError(f"Bad latency '{spec}'. Use fixed:MS, uniform:LO:HI, normal:MEAN:SD, "
+                             f"lognormal:MEDIAN:SIGMA or exp:MEAN")
+        self.spec, self.kind, self.values = spec, kind, values
+
+    def sample(self, rng: random.Random) -> float:
+        """One delay in seconds (never negative)."""
+        a = self.values[0]
+        if self.kind == 'fixed':
+            ms = a
+        elif self.kind == 'uniform':
+            ms = rng.uniform(a, self.values[1])
+        elif self.kind == 'normal':
+            ms = rng.gauss(a, self.values[1])
+        elif self.kind == 'lognormal':
+            ms = rng.lognormvariate(math.log(max(a, 1e-3)), self.values[1])
+        else:
+            ms = rng.expovariate(1.0 / a) if a > 0 else 0.0
+        return max(0.0, ms) / 1000.0
+
+
+class TokenBucket:
+    """``rate`` requests per second with a burst of one second's worth."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = max(1.0, rate)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(max(1.0, self.rate), self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class Faults:
+    """Latency, error and rate-limit settings for every route group."""
+
+    def __init__(self, seed: int = None):
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.latency = {route: Latency() for route in ROUTES}
+        self.error_rate = dict.fromkeys(ROUTES, 0.0)
+        self.throttle_rate = dict.fromkeys(ROUTES, 0.0)
+        self.buckets = dict.fromkeys(ROUTES)
+        self.stream_interval = 0.02
+
+    def update(self, config: dict):
+        """Apply ``{"latency": {route: spec}, "error_rate": {...}, "rate_limit": {...}, ...}``."""
+        for route, spec in _expand(config.get('latency', {})):
+            self.latency[route] = Latency(spec)
+        for route, value in _expand(config.get('error_rate', {})):
+            self.error_rate[route] = _fraction(value)
+        for route, value in _expand(config.get('throttle_rate', {})):
+            self.throttle_rate[route] = _fraction(value)
+        for route, value in _expand(config.get('rate_limit', {})):
+            self.buckets[route] = TokenBucket(float(value)) if float(value) > 0 else None
+        if 'stream_interval' in config:
+            self.stream_interval = max(0.0, float(config['stream_interval'])) / 1000.0
+
+    def describe(self) -> dict:
+        return {
+            'latency': {route: latency.spec for route, latency in self.latency.items()},
+            'error_rate': self.error_rate,
+            'throttle_rate': self.throttle_rate,
+            'rate_limit': {route: bucket.rate if bucket else 0 for route, bucket in self.buckets.items()},
+            'stream_interval': self.stream_interval * 1000,
+        }
+
+    def decide(self, route: str) -> tuple:
+        """(delay in seconds, injected status or None) for one request."""
+        with self.lock:
+            delay = self.latency[route].sample(self.rng)
+            roll = self.rng.random()
+            error = self.rng.choice(SERVER_ERRORS)
+        bucket = self.buckets[route]
+        if bucket is not None and not bucket.take():
+            return delay, 429
+        if roll < self.throttle_rate[route]:
+            return delay, 429
+        if roll < self.throttle_rate[route] + self.error_rate[route]:
+            return delay, error
+        return delay, None
+
+
+def _expand(values: dict):
+    for route, value in values.items():
+        if route == '*':
+            for name in ROUTES:
+                yield name, value
+        elif route in ROUTES:
+            yield route, value
+        else:
+            raise ValueError(f"Unknown route '{route}'. Use {', '.join(ROUTES)} or *")
+
+
+def _fraction(value) -> float:
+    value = float(value)
+    if not 0 <= value <= 1:
+        raise ValueError(f"Rates are fractions between 0 and 1, got {value}")
+    return value
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.routes = {route: {'requests': 0, 'statuses': {}, 'delay_seconds': 0.0} for route in ROUTES}
+            self.started = time.time()
+
+    def record(self, route: str, status: int, delay: float):
+        with self.lock:
+            entry = self.routes[route]
+            entry['requests'] += 1
+            entry['statuses'][str(status)] = entry['statuses'].get(str(status), 0) + 1
+            entry['delay_seconds'] += delay
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {'uptime_seconds': round(time.time() - self.started, 3),
+                    'routes': json.loads(json.dumps(self.routes))}
+
+
+class AudioCache:
+    """Tone renders by (seconds, format); encoded once and reused."""
+
+    def __init__(self, tts_format: str):
+        self.lock = threading.Lock()
+        self.cache = {}
+        self.ffmpeg = shutil.which('ffmpeg')
+        self.tts_format = tts_format if tts_format != 'auto' else ('mp3' if self.ffmpeg else 'wav')
+        if self.tts_format == 'mp3' and not self.ffmpeg:
+            raise ValueError("--tts-format mp3 needs ffmpeg on PATH")
+
+    def get(self, seconds: int, fmt: str) -> bytes:
+        seconds = max(1, min(int(seconds), MAX_AUDIO_SECONDS))
+        key = (seconds, fmt)
+        with self.lock:
+            if key not in self.cache:
+                wav = _tone_wav(seconds)
+                self.cache[key] = _encode_mp3(self.ffmpeg, wav) if fmt == 'mp3' else wav
+            return self.cache[key]
+
+
+def _tone_wav(seconds: int) -> bytes:
+    # Whole-hertz tones repeat every second: render one and tile it
+    second = array.array('h', (
+        int(32767 * (0.4 * math.sin(2 * math.pi * 220 * i / SAMPLE_RATE)
+                     + 0.2 * math.sin(2 * math.pi * 330 * i / SAMPLE_RATE)))
+        for i in range(SAMPLE_RATE)
+    ))
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(SAMPLE_RATE)
+        wav_file.writeframes(second.tobytes() * seconds)
+    return buffer.getvalue()
+
+
+def _encode_mp3(ffmpeg: str, wav: bytes) -> bytes:
+    result = subprocess.run([ffmpeg, '-v', 'error', '-f', 'wav', '-i', 'pipe:0', '-b:a', '128k', '-f', 'mp3', 'pipe:1'],
+                            input=wav, capture_output=True, check=True)
+    return result.stdout
+
+
+def _lyrics(topic: str, genre: str) -> str:
+    topic = topic.strip().rstrip('.') or 'the night'
+    return "\n".join([
+        "[Verse 1]", f"I keep thinking about {topic}", "City lights are burning through the rain",
+        "Every step I take still leads me home", "Every word I say still sounds the same", "",
+        "[Chorus]", f"Oh, {topic}, don't let go", f"Sing it loud in {genre} tonight",
+        "Oh, we're running with the radio", "Holding on until the morning light", "",
+        "[Bridge]", "When the echoes fade away", "We will still be here to stay", "",
+        "[Outro]", f"{topic}, {topic}", "Carry me home",
+    ])
+
+
+class MockProviderHandler(BaseHTTPRequestHandler):
+    server_version = 'AuraLynxMockProviders/1.0'
+
+    # -- routing ---------------------------------------------------------------
+
+    def do_POST(self):
+        path = urlparse(self.path).path.rstrip('/')
+        if path in ('/v1/chat/completions', '/openai/v1/chat/completions'):
+            self._faulted('chat', self._chat_completion)
+        elif re.fullmatch(r'/v1/text-to-speech/[\w-]+(/stream)?', path):
+            self._faulted('tts', lambda body: self._speech(body, streaming=path.endswith('/stream')))
+        elif path == '/v2/RecordTrack':
+            self._faulted('record', self._record_track)
+        elif path == '/_mock/config':
+            try:
+                self.server.faults.update(self._json_body())
+            except (ValueError, TypeError, AttributeError) as e:
+                return self._send_json(400, {'error': str(e)})
+            self._send_json(200, self.server.faults.describe())
+        elif path == '/_mock/reset':
+            self.server.stats.reset()
+            self._send_json(200, {'reset': True})
+        else:
+            self._send_json(404, {'error': f'No mock for POST {path}'})
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        match = re.fullmatch(r'/files/track_(\d+)_[0-9a-f]+\.wav', path)
+        if match:
+            self._faulted('download', lambda _: self._send(200, self.server.audio.get(int(match.group(1)), 'wav'),
+                                                             'audio/wav'))
+        elif path.rstrip('/') == '/_mock/stats':
+            self._send_json(200, {**self.server.stats.snapshot(), 'faults': self.server.faults.describe()})
+        else:
+            self._send_json(404, {'error': f'No mock for GET {path}'})
+
+    def _faulted(self, route: str, respond):
+        delay, injected = self.server.faults.decide(route)
+        time.sleep(delay)
+        body = self._json_body() if self.command == 'POST' else None
+        if injected == 429:
+            self._send_json(429, {'error': {'message': 'Rate limit reached (mock)', 'type': 'rate_limit_exceeded'}},
+                            headers={'Retry-After': '1'})
+        elif injected:
+            self._send_json(injected, {'error': {'message': f'Injected {injected} (mock)', 'type': 'server_error'}})
+        else:
+            injected = respond(body)
+        self.server.stats.record(route, injected or 200, delay)
+
+    # -- providers -------------------------------------------------------------
+
+    def _chat_completion(self, body):
+        messages = (body or {}).get('messages') or [{}]
+        prompt = messages[-1].get('content', '')
+        topic = re.search(r'about:\s*(.+)', prompt)
+        genre = re.search(r'\b(pop|rock|jazz|electronic|hip-hop)\b', prompt)
+        text = _lyrics(topic.group(1).split('\n')[0] if topic else prompt[:60], genre.group(1) if genre else 'pop')
+        completion_id = f'chatcmpl-{uuid.uuid4().hex[:24]}'
+        model = (body or {}).get('model', 'mock-model')
+
+        if (body or {}).get('stream'):
+            self._start_stream(200, 'text/event-stream')
+            for word in re.findall(r'\S+\s*', text):
+                chunk = {'id': completion_id, 'object': 'chat.completion.chunk', 'model': model,
+                         'choices': [{'index': 0, 'delta': {'content': word}, 'finish_reason': None}]}
+                self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode())
+                self.wfile.flush()
+                time.sleep(self.server.faults.stream_interval)
+            self.wfile.write(b'data: [DONE]\n\n')
+            return 200
+
+        words = len(text.split())
+        self._send_json(200, {
+            'id': completion_id,
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': len(prompt.split()), 'completion_tokens': words,
+                      'total_tokens': len(prompt.split()) + words},
+        })
+        return 200
+
+    def _speech(self, body, streaming: bool):
+        text = (body or {}).get('text', '')
+        # About as long as the backend's own estimate (0.4 s per word)
+        seconds = max(2, int(len(text.split()) * 0.4))
+        requested = urlparse(self.path).query
+        fmt = 'wav' if 'output_format=pcm' in requested or 'output_format=wav' in requested \
+            else self.server.audio.tts_format
+        audio = self.server.audio.get(seconds, fmt)
+        content_type = 'audio/mpeg' if fmt == 'mp3' else 'audio/wav'
+        if not streaming:
+            self._send(200, audio, content_type)
+            return 200
+        self._start_stream(200, content_type)
+        chunk_size = max(4096, len(audio) // 20)
+        for start in range(0, len(audio), chunk_size):
+            self.wfile.write(audio[start:start + chunk_size])
+            self.wfile.flush()
+            time.sleep(self.server.faults.stream_interval)
+        return 200
+
+    def _record_track(self, body):
+        params = (body or {}).get('params', {})
+        if not params.get('token'):
+            self._send_json(200, {'status': 0, 'error': {'code': 1, 'text': 'token is required'}})
+            return 200
+        seconds = max(1, min(int(params.get('duration', 30)), MAX_AUDIO_SECONDS))
+        host = self.headers.get('Host') or f'{self.server.server_address[0]}:{self.server.server_address[1]}'
+        link = f'http://{host}/files/track_{seconds}_{uuid.uuid4().hex[:8]}.wav'
+        self._send_json(200, {'status': 1, 'data': {'tasks': [{'task_status_code': 2, 'download_link': link}]}})
+        return 200
+
+    # -- plumbing --------------------------------------------------------------
+
+    def _json_body(self) -> dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _send(self, status: int, body: bytes, content_type: str, headers: dict = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload, headers: dict = None):
+        self._send(status, json.dumps(payload).encode(), 'application/json', headers)
+
+    def _start_stream(self, status: int, content_type: str):
+        # No Content-Length: the body ends when the connection closes
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class MockProviderServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, address, faults: Faults, audio: AudioCache, verbose: bool = False):
+        super().__init__(address, MockProviderHandler)
+        self.faults = faults
+        self.audio = audio
+        self.stats = Stats()
+        self.verbose = verbose
+
+
+def _pairs(values: list, option: str) -> dict:
+    result = {}
+    for value in values or []:
+        route, sep, setting = value.partition('=')
+        if not sep:
+            raise SystemExit(f"{option} expects ROUTE=VALUE, got '{value}'")
+        result[route] = setting
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency', action='append', metavar='ROUTE=SPEC',
+                        help='Delay distribution per route (ms), e.g. chat=lognormal:800:0.5 or "*=fixed:200".')
+    parser.add_argument('--error-rate', action='append', metavar='ROUTE=FRACTION',
+                        help='Fraction of requests answered with 500/502/503.')
+    parser.add_argument('--rate-limit', action='append', metavar='ROUTE=RPS',
+                        help='Requests per second before answering 429.')
+    parser.add_argument('--throttle-rate', action='append', metavar='ROUTE=FRACTION',
+                        help='Fraction of requests answered with 429.')
+    parser.add_argument('--stream-interval', type=float, metavar='MS',
+                        help='Delay between streamed chunks (SSE tokens, audio chunks; default 20).')
+    parser.add_argument('--tts-format', choices=('auto', 'mp3', 'wav'), default='auto',
+                        help='Text-to-speech audio format (auto: MP3 when ffmpeg is available).')
+    parser.add_argument('--config', help='JSON file with latency/error_rate/rate_limit/throttle_rate maps.')
+    parser.add_argument('--seed', type=int, help='Seed for reproducible delays and failures.')
+    parser.add_argument('--verbose', action='store_true', help='Log every request.')
+    args = parser.parse_args(argv)
+
+    faults = Faults(seed=args.seed)
+    try:
+        if args.config:
+            with open(args.config) as f:
+                faults.update(json.load(f))
+        options = {
+            'latency': _pairs(args.latency, '--latency'),
+            'error_rate': _pairs(args.error_rate, '--error-rate'),
+            'rate_limit': _pairs(args.rate_limit, '--rate-limit'),
+            'throttle_rate': _pairs(args.throttle_rate, '--throttle-rate'),
+        }
+        # Only an explicit option overrides the config file
+        if args.stream_interval is not None:
+            options['stream_interval'] = args.stream_interval
+        faults.update(options)
+        audio = AudioCache(args.tts_format)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    server = MockProviderServer((args.host, args.port), faults, audio, verbose=args.verbose)
+    print(f"Mock providers on http://{args.host}:{args.port} (text-to-speech as {audio.tts_format})")
+    print(json.dumps(faults.describe(), indent=2))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -37,6 +37,36 @@ export default function MySongsPage({ onBack }: MySongsPageProps) {
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState<string | null>(null)
   const [activeSongId, setActiveSongId] = useState<number | null>(null)
+  const [nextUrl, setNextUrl] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
+
+  const fetchPage = async (url: string) => {
+    const response = await fetch(url, {
+      headers: {
+        Authorization: `Bearer ${accessToken}`,
+      },
+    })
+    if (!response.ok) {
+      throw new Error('Failed to fetch songs')
+    }
+    // { next, previous, results } (cursor pagination)
+    return response.json()
+  }
+
+  const loadMore = async () => {
+    if (!nextUrl) return
+    try {
+      setLoadingMore(true)
+      const data = await fetchPage(nextUrl)
+      setSongs(prev => [...prev, ...data.results])
+      setNextUrl(data.next)
+    } catch (err) {
+      console.error(err)
+      setError(err instanceof Error ? err.message : 'Failed to load songs')
+    } finally {
+      setLoadingMore(false)
+    }
+  }
 
   useEffect(() => {
     if (!accessToken) {
@@ -48,16 +78,9 @@ export default function MySongsPage({ onBack }: MySongsPageProps) {
     const fetchSongs = async () => {
       try {
         setLoading(true)
-        const response = await fetch(buildApiUrl('/songs/'), {
-          headers: {
-            Authorization: `Bearer ${accessToken}`,
-          },
-        })
-        if (!response.ok) {
-          throw new Error('Failed to fetch songs')
-        }
-        const data = await response.json()
-        setSongs(data)
+        const data = await fetchPage(buildApiUrl('/songs/?include=lyrics'))
+        setSongs(data.results)
+        setNextUrl(data.next)
       } catch (err) {
         console.error(err)
         setError(err instanceof Error ? err.message : 'Failed to load songs')
@@ -200,6 +223,18 @@ export default function MySongsPage({ onBack }: MySongsPageProps) {
                 </div>
               </Card>
             ))}
+            {nextUrl && (
+              <div className="text-center">
+                <Button
+                  variant="outline"
+                  className="text-slate-300 border-slate-600"
+                  onClick={loadMore}
+                  disabled={loadingMore}
+                >
+                  {loadingMore ? 'Loading...' : 'Load more'}
+                </Button>
+              </div>
+            )}
           </div>
         )}
       </div>